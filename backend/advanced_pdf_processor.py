@@ -3,12 +3,16 @@ import os
 import json
 import tempfile
 import uuid
+import shutil
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 import logging
 from PIL import Image
 import io
 import base64
+import hashlib
+import threading
+from collections import OrderedDict
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -20,11 +24,26 @@ import numpy as np
 
 logger = logging.getLogger(__name__)
 
+FIELD_TYPES = {
+    'text': fitz.PDF_WIDGET_TYPE_TEXT,
+    'checkbox': fitz.PDF_WIDGET_TYPE_CHECKBOX,
+    'radio': fitz.PDF_WIDGET_TYPE_RADIOBUTTON,
+    'combobox': fitz.PDF_WIDGET_TYPE_COMBOBOX,
+    'listbox': fitz.PDF_WIDGET_TYPE_LISTBOX
+}
+# Standard stamp names, e.g. 'approved', 'draft', 'confidential'
+STAMPS = {name[len('STAMP_'):].lower(): getattr(fitz, name) for name in dir(fitz) if name.startswith('STAMP_')}
+# Decoded signature/stamp images, shared by every processor in the worker
+IMAGE_CACHE_ENTRIES = 64
+_image_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_image_cache_lock = threading.Lock()
+
 class AdvancedPDFProcessor:
     def __init__(self):
         self.temp_dir = tempfile.gettempdir()
-        self.work_dir = os.path.join(self.temp_dir, "smart_pdf_bundler")
-        os.makedirs(self.work_dir, exist_ok=True)
+        # Private directory per processor so cleanup never touches other requests' files; kept
+        # outside the bundle upload directory, whose work-directory sweeper would evict it
+        self.work_dir = tempfile.mkdtemp(prefix="pdfproc-", dir=self.temp_dir)
         
     def create_professional_cover_page(self, cover_info: Dict[str, Any], theme_colors: Dict[str, str]) -> str:
         """Create a professional cover page with full-bleed design"""
@@ -117,27 +136,31 @@ class AdvancedPDFProcessor:
     def add_headers_and_footers(self, pdf_path: str, bundle_info: Dict[str, Any], theme_colors: Dict[str, str]) -> str:
         """Add professional headers and footers to all pages"""
         doc = fitz.open(pdf_path)
-        primary_color = fitz.utils.getColor(theme_colors.get('primary', '#3B82F6'))
+        primary_color = colors.HexColor(theme_colors.get('primary', '#3B82F6')).rgb()
         
         for i, page in enumerate(doc):
+            width, height = page.rect.width, page.rect.height
             # Add top border
-            page.draw_rect(fitz.Rect(0, 0, 595, 4), color=primary_color, fill=primary_color)
+            page.draw_rect(fitz.Rect(0, 0, width, 4), color=primary_color, fill=primary_color)
             
             # Add header text
             current_section = bundle_info.get('current_section', '')
             bundle_title = bundle_info.get('title', 'Document Bundle')
+            header = fitz.Rect(10, 10, width - 10, 24)
             
-            page.insert_text((10, 20), current_section, fontsize=8, color=(0.3, 0.3, 0.3))
-            page.insert_text((250, 20), bundle_title, fontsize=8, color=(0.3, 0.3, 0.3), align=1)
-            page.insert_text((540, 20), f"{i+1}/{doc.page_count}", fontsize=8, color=(0.3, 0.3, 0.3), align=2)
+            page.insert_textbox(header, current_section, fontsize=8, color=(0.3, 0.3, 0.3))
+            page.insert_textbox(header, bundle_title, fontsize=8, color=(0.3, 0.3, 0.3), align=fitz.TEXT_ALIGN_CENTER)
+            page.insert_textbox(header, f"{i+1}/{doc.page_count}", fontsize=8, color=(0.3, 0.3, 0.3),
+                                align=fitz.TEXT_ALIGN_RIGHT)
             
             # Add footer
             year = datetime.now().year
             firm_name = bundle_info.get('firm', 'Smart PDF Bundler')
-            page.insert_text((250, 820), f"© {year} {firm_name}", fontsize=6, color=(0.5, 0.5, 0.5), align=1)
+            page.insert_textbox(fitz.Rect(10, height - 22, width - 10, height - 10), f"© {year} {firm_name}",
+                                fontsize=6, color=(0.5, 0.5, 0.5), align=fitz.TEXT_ALIGN_CENTER)
             
             # Add thin line above footer
-            page.draw_line((50, 810), (545, 810), color=(0.8, 0.8, 0.8), width=0.5)
+            page.draw_line((50, height - 32), (width - 50, height - 32), color=(0.8, 0.8, 0.8), width=0.5)
         
         output_path = os.path.join(self.work_dir, f"with_headers_{uuid.uuid4()}.pdf")
         doc.save(output_path)
@@ -215,32 +238,7 @@ class AdvancedPDFProcessor:
     
     def add_signature(self, pdf_path: str, signature_data: str, position: Dict[str, float]) -> str:
         """Add signature to PDF"""
-        doc = fitz.open(pdf_path)
-        
-        # Decode signature image
-        signature_bytes = base64.b64decode(signature_data.split(',')[1])
-        
-        # Create pixmap from signature
-        img = Image.open(io.BytesIO(signature_bytes))
-        img_bytes = io.BytesIO()
-        img.save(img_bytes, format='PNG')
-        img_bytes.seek(0)
-        
-        # Insert signature
-        page = doc[position.get('page', 0)]
-        rect = fitz.Rect(
-            position['x'],
-            position['y'],
-            position['x'] + position['width'],
-            position['y'] + position['height']
-        )
-        
-        page.insert_image(rect, stream=img_bytes.getvalue())
-        
-        output_path = os.path.join(self.work_dir, f"signed_{uuid.uuid4()}.pdf")
-        doc.save(output_path)
-        doc.close()
-        return output_path
+        return self.apply_annotations(pdf_path, [dict(position, kind='signature', image=signature_data)])
     
     def extract_text_with_ocr(self, pdf_path: str) -> Dict[str, Any]:
         """Extract text from PDF with OCR for scanned pages"""
@@ -274,34 +272,123 @@ class AdvancedPDFProcessor:
     
     def create_form_fields(self, pdf_path: str, form_data: List[Dict[str, Any]]) -> str:
         """Add form fields to PDF"""
+        return self.apply_annotations(pdf_path, [dict(field, kind='field') for field in form_data])
+    
+    def apply_annotations(self, pdf_path: str, annotations: List[Dict[str, Any]], incremental: bool = False,
+                          errors: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Apply signatures, form fields and stamps to a PDF in one open and save
+        
+        Each annotation has a ``kind`` ('signature', 'field' or 'stamp'), a
+        ``page`` and ``x``/``y``/``width``/``height``. Signatures and image
+        stamps carry base64 ``image`` data, which is decoded once per distinct
+        image and embedded once per document however often it is placed.
+        With ``incremental`` the changes are appended to pdf_path in place,
+        leaving the original bytes (and any existing signatures) untouched;
+        otherwise, or if the file cannot be updated incrementally, a new file
+        is written. An annotation that cannot be applied is skipped and
+        logged, and appended to ``errors`` as ``{'index', 'kind', 'error'}``
+        when a list is given.
+        """
         doc = fitz.open(pdf_path)
-        
-        for field in form_data:
-            page = doc[field.get('page', 0)]
-            rect = fitz.Rect(
-                field['x'],
-                field['y'],
-                field['x'] + field['width'],
-                field['y'] + field['height']
-            )
+        try:
+            by_page = {}
+            for index, annotation in enumerate(annotations):
+                by_page.setdefault(annotation.get('page', 0), []).append((index, annotation))
             
-            field_type = field.get('type', 'text')
+            image_xrefs = {}
+            for page_num, items in sorted(by_page.items()):
+                if not 0 <= page_num < len(doc):
+                    logger.warning(f"Skipping {len(items)} annotations for missing page {page_num}")
+                    continue
+                page = doc[page_num]
+                for index, annotation in items:
+                    kind = annotation.get('kind', 'field')
+                    try:
+                        self._apply_annotation(page, annotation, kind, index, image_xrefs)
+                    except Exception as e:
+                        logger.warning(f"Skipping {kind} annotation {index} on page {page_num}: {e}")
+                        if errors is not None:
+                            errors.append({'index': index, 'kind': kind, 'error': str(e)})
             
-            if field_type == 'text':
-                widget = page.add_text_annot(rect)
-                widget.set_text(field.get('default_value', ''))
-            elif field_type == 'checkbox':
-                widget = page.add_checkbox_annot(rect)
-                if field.get('checked', False):
-                    widget.set_checked()
-            elif field_type == 'radio':
-                widget = page.add_radio_annot(rect)
-                widget.set_checked()
-        
-        output_path = os.path.join(self.work_dir, f"form_{uuid.uuid4()}.pdf")
-        doc.save(output_path)
-        doc.close()
-        return output_path
+            if incremental and doc.can_save_incrementally():
+                doc.save(pdf_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+                return pdf_path
+            
+            output_path = os.path.join(self.work_dir, f"annotated_{uuid.uuid4()}.pdf")
+            doc.save(output_path, deflate=True)
+            return output_path
+        finally:
+            doc.close()
+    
+    def _apply_annotation(self, page, annotation: Dict[str, Any], kind: str, index: int,
+                          image_xrefs: Dict[str, int]):
+        rect = fitz.Rect(
+            annotation['x'],
+            annotation['y'],
+            annotation['x'] + annotation['width'],
+            annotation['y'] + annotation['height']
+        )
+        if kind == 'signature' or (kind == 'stamp' and annotation.get('image')):
+            self._place_image(page, rect, annotation['image'], image_xrefs)
+        elif kind == 'stamp':
+            stamp = STAMPS.get(str(annotation.get('stamp', 'approved')).lower(), fitz.STAMP_Approved)
+            page.add_stamp_annot(rect, stamp=stamp)
+        elif kind == 'field':
+            self._add_form_field(page, rect, annotation, index)
+        else:
+            raise ValueError(f"Unknown annotation kind: {kind}")
+    
+    def _place_image(self, page, rect, image_data: str, image_xrefs: Dict[str, int]):
+        """Draw an image, reusing the document's existing image object when it was placed before"""
+        key, image_bytes = self._decode_image(image_data)
+        if key in image_xrefs:
+            page.insert_image(rect, xref=image_xrefs[key])
+        else:
+            image_xrefs[key] = page.insert_image(rect, stream=image_bytes)
+    
+    def _decode_image(self, image_data: str):
+        """Decode base64 (optionally a data: URL) image data, cached by its hash"""
+        key = hashlib.sha256(image_data.encode()).hexdigest()
+        with _image_cache_lock:
+            image_bytes = _image_cache.get(key)
+            if image_bytes is not None:
+                _image_cache.move_to_end(key)
+                return key, image_bytes
+        
+        encoded = image_data.split(',', 1)[1] if image_data.startswith('data:') else image_data
+        image_bytes = base64.b64decode(encoded)
+        # PNG and JPEG embed as-is; anything else is converted once
+        if not image_bytes.startswith((b'\x89PNG', b'\xff\xd8')):
+            img = Image.open(io.BytesIO(image_bytes))
+            img_bytes = io.BytesIO()
+            img.save(img_bytes, format='PNG')
+            image_bytes = img_bytes.getvalue()
+        
+        with _image_cache_lock:
+            _image_cache[key] = image_bytes
+            if len(_image_cache) > IMAGE_CACHE_ENTRIES:
+                _image_cache.popitem(last=False)
+        return key, image_bytes
+    
+    def _add_form_field(self, page, rect, field: Dict[str, Any], index: int):
+        field_type = field.get('type', 'text')
+        widget = fitz.Widget()
+        widget.rect = rect
+        widget.field_type = FIELD_TYPES.get(field_type, fitz.PDF_WIDGET_TYPE_TEXT)
+        widget.field_name = field.get('name') or f"field_{index}"
+        if field_type in ('checkbox', 'radio'):
+            # Setting True before the widget has appearance streams fails for radios,
+            # so buttons are added off and switched to their own on-state
+            widget.field_value = False
+        else:
+            if field_type in ('combobox', 'listbox'):
+                widget.choice_values = field.get('options', [])
+            widget.field_value = field.get('default_value', '')
+        annot = page.add_widget(widget)
+        if field_type in ('checkbox', 'radio') and field.get('checked'):
+            widget = page.load_widget(annot.xref)
+            widget.field_value = widget.on_state()
+            widget.update()
     
     def merge_pdfs_with_styling(self, pdf_files: List[str], bundle_info: Dict[str, Any], theme_colors: Dict[str, str]) -> str:
         """Merge multiple PDFs with professional styling"""
@@ -352,12 +439,9 @@ class AdvancedPDFProcessor:
         return base64.b64encode(svg.encode()).decode()
     
     def cleanup_temp_files(self):
-        """Clean up temporary files"""
+        """Clean up temporary files created by this processor"""
         try:
-            for file in os.listdir(self.work_dir):
-                file_path = os.path.join(self.work_dir, file)
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
+            shutil.rmtree(self.work_dir, ignore_errors=True)
         except Exception as e:
             logger.warning(f"Failed to cleanup temp files: {e}")
 
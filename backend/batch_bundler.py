@@ -0,0 +1,320 @@
+"""Build many bundles from local files without going through the HTTP API.
+
+Input is either a directory with one folder per bundle (its files, sorted
+by path, are the exhibits; an optional ``bundle.json`` in the folder sets
+``cover_info``, ``theme``, ``profile`` and ``dedup_policy``) or a JSON
+manifest listing bundles:
+
+    {"bundles": [{"name": "case-12", "files": ["a.pdf", "b.docx"],
+                  "cover_info": {"title": "Case 12"}, "theme": "Minimal"}]}
+
+Bundles run in parallel across a process pool. Each one goes through the
+same pipeline as the API (per-file AI processing, duplicate handling,
+cover, TOC and compile, then optional AdvancedPDFProcessor headers and
+compression) and is written to ``<output>/<name>.pdf``. Re-running skips
+bundles whose output exists and continues interrupted ones from their
+checkpoints. A JSON report with per-bundle timings and overall throughput
+is written next to the outputs.
+
+Usage (from backend/):
+    python batch_bundler.py ./cases --output ./bundles --workers 8
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any
+
+# One thread per library per worker; the pool provides the parallelism
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+os.environ.setdefault('BUNDLE_CATALOG_URL', 'memory://')
+os.environ.setdefault('SEARCH_INDEX_PATH', ':memory:')
+
+import cv2
+import fitz
+import main
+from main import (AIEnhancedPDFBundler, process_saved_files, run_stage, create_enhanced_cover_page,
+                  create_ai_enhanced_toc, compile_final_bundle, PROCESSING_PROFILES, DEDUP_POLICIES)
+from advanced_pdf_processor import AdvancedPDFProcessor
+from bundle_manifest import BundleManifest, BuildLock
+from document_buffers import DocumentBuffers
+from format_handlers import sniff_mime
+
+BUNDLE_SPEC_FILE = "bundle.json"
+WORK_DIR = ".work"
+REPORT_FILE = "batch_report.json"
+DEFAULT_THEME_COLORS = {"primary": "#3B82F6", "secondary": "#10B981", "accent": "#F59E0B"}
+
+
+def discover_bundles(source: str) -> List[Dict[str, Any]]:
+    """Bundle specs from a manifest file or a directory of bundle folders"""
+    if os.path.isfile(source):
+        with open(source, 'r') as f:
+            data = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(source))
+        bundles = data['bundles'] if isinstance(data, dict) else data
+        for spec in bundles:
+            spec['files'] = [os.path.join(base_dir, path) for path in spec['files']]
+        return bundles
+
+    bundles = []
+    for entry in sorted(os.scandir(source), key=lambda e: e.name):
+        if not entry.is_dir() or entry.name.startswith('.'):
+            continue
+        spec = {'name': entry.name}
+        spec_path = os.path.join(entry.path, BUNDLE_SPEC_FILE)
+        if os.path.exists(spec_path):
+            with open(spec_path, 'r') as f:
+                spec.update(json.load(f))
+        spec['files'] = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(entry.path)
+            for name in names
+            if name != BUNDLE_SPEC_FILE and not name.startswith('.')
+        )
+        bundles.append(spec)
+    return bundles
+
+
+def stage_inputs(files: List[str], work_dir: str, buffers: DocumentBuffers,
+                 force: bool = False) -> List[Dict[str, Any]]:
+    """Link inputs into the work directory so conversions never write next to the originals
+
+    Inputs that fit in buffers are read whole and kept there, so the build
+    does not read them again; larger ones are hashed in chunks and left on disk.
+
+    A staged copy from an earlier run is reused only while it still matches
+    its source; with ``force`` every input is staged again.
+    """
+    common = os.path.commonpath([os.path.dirname(path) for path in files]) if files else ''
+    saved_files = []
+    for path in files:
+        name = os.path.relpath(path, common).replace(os.sep, '__')
+        staged = os.path.join(work_dir, name)
+        if force or is_stale(path, staged):
+            if os.path.lexists(staged):
+                os.remove(staged)
+            link_or_copy(path, staged)
+        with open(staged, 'rb') as f:
+            if buffers.accepts(os.fstat(f.fileno()).st_size):
+                head = f.read()
+                buffers.put(staged, head)
+                digest = hashlib.sha256(head)
+            else:
+                head = f.read(main.UPLOAD_CHUNK_BYTES)
+                digest = hashlib.sha256(head)
+                for chunk in iter(lambda: f.read(main.UPLOAD_CHUNK_BYTES), b''):
+                    digest.update(chunk)
+        saved_files.append({
+            'path': staged,
+            'content_type': sniff_mime(name, head),
+            'content_hash': digest.hexdigest()
+        })
+    return saved_files
+
+
+def is_stale(source: str, staged: str) -> bool:
+    """Whether a staged input is missing or no longer the source (replaced, resized or modified)"""
+    try:
+        staged_stat = os.stat(staged)
+    except FileNotFoundError:
+        return True
+    source_stat = os.stat(source)
+    if os.path.samestat(source_stat, staged_stat):
+        return False
+    return (source_stat.st_size, source_stat.st_mtime_ns) != (staged_stat.st_size, staged_stat.st_mtime_ns)
+
+
+def link_or_copy(source: str, destination: str):
+    """Hard-link, or copy keeping the modification time so is_stale() can compare it"""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+async def build_bundle(spec: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    name = spec['name']
+    output_path = os.path.join(options['output'], f"{name}.pdf")
+    work_dir = os.path.join(options['output'], WORK_DIR, name)
+    os.makedirs(work_dir, exist_ok=True)
+    cover_info = spec.get('cover_info') or {'title': name}
+    theme = spec.get('theme', options['theme'])
+    profile = spec.get('profile', options['profile'])
+    dedup_policy = spec.get('dedup_policy', options['dedup_policy'])
+    stage_timings = {}
+
+    buffers = main.new_document_buffers()
+    saved_files = [dict(saved, profile=profile) for saved in stage_inputs(spec['files'], work_dir, buffers, options['force'])]
+    manifest = BundleManifest.load(work_dir)
+    hashes = [saved['content_hash'] for saved in saved_files]
+    if manifest is None or [saved['content_hash'] for saved in manifest.data['files']] != hashes:
+        manifest = BundleManifest.create(work_dir, name, cover_info, theme, 'batch', 'batch', saved_files,
+                                         dedup_policy)
+    resumed_files = sum(1 for i in range(len(saved_files)) if manifest.file_result(i) is not None)
+
+    bundler = AIEnhancedPDFBundler(work_dir, index_text=False, buffers=buffers)
+    processed_files = await process_saved_files(bundler, 'batch', saved_files, stage_timings, manifest,
+                                                dedup_policy)
+    cover_path = await run_stage(manifest, 'cover', stage_timings, lambda: create_enhanced_cover_page(
+        work_dir, cover_info, theme, processed_files, buffers=buffers
+    ))
+    toc_path = await run_stage(manifest, 'toc', stage_timings, lambda: create_ai_enhanced_toc(
+        work_dir, processed_files, theme, buffers=buffers
+    ))
+    bundle_path = await run_stage(manifest, 'compile', stage_timings, lambda: compile_final_bundle(
+        work_dir, cover_path, toc_path, processed_files, linearize=options['linearize'], buffers=buffers
+    ))
+
+    stage_start = time.perf_counter()
+    processor = AdvancedPDFProcessor()
+    try:
+        final_path = bundle_path
+        if options['headers']:
+            final_path = processor.add_headers_and_footers(final_path, {
+                'title': cover_info.get('title') or name,
+                'firm': cover_info.get('firm', 'Smart PDF Bundler')
+            }, DEFAULT_THEME_COLORS)
+        if options['compress']:
+            final_path = processor.compress_pdf(final_path, options['compress'])
+        tmp_path = f"{output_path}.tmp"
+        link_or_copy(final_path, tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        processor.cleanup_temp_files()
+    stage_timings['finish'] = time.perf_counter() - stage_start
+    manifest.set_status('completed')
+
+    with fitz.open(output_path) as doc:
+        pages = len(doc)
+    if not options['keep_work']:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        'files': len(saved_files),
+        'resumed_files': resumed_files,
+        'pages': pages,
+        'input_bytes': sum(os.path.getsize(path) for path in spec['files']),
+        'output_bytes': os.path.getsize(output_path),
+        'output': output_path,
+        'stage_timings': {stage: round(seconds, 3) for stage, seconds in stage_timings.items()}
+    }
+
+
+def run_bundle(spec: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    """Build one bundle in a pool worker; never raises so one bad bundle cannot stop the batch"""
+    start = time.perf_counter()
+    entry = {'name': spec['name']}
+    output_path = os.path.join(options['output'], f"{spec['name']}.pdf")
+    if os.path.exists(output_path) and not options['force']:
+        return dict(entry, status='skipped', seconds=0.0, output=output_path)
+    if not spec.get('files'):
+        return dict(entry, status='failed', seconds=0.0, error="No input files")
+
+    work_dir = os.path.join(options['output'], WORK_DIR, spec['name'])
+    os.makedirs(work_dir, exist_ok=True)
+    lock = BuildLock(work_dir)
+    if not lock.acquire():
+        return dict(entry, status='locked', seconds=0.0, error="Being built by another run")
+    try:
+        entry.update(asyncio.run(build_bundle(spec, options)), status='built')
+    except Exception as e:
+        entry.update(status='failed', error=f"{type(e).__name__}: {e}")
+    finally:
+        lock.release()
+    entry['seconds'] = round(time.perf_counter() - start, 3)
+    return entry
+
+
+def init_worker():
+    main.reopen_after_fork()
+    cv2.setNumThreads(1)
+
+
+def summarize(results: List[Dict[str, Any]], wall_seconds: float, workers: int) -> Dict[str, Any]:
+    built = [r for r in results if r['status'] == 'built']
+    files = sum(r['files'] for r in built)
+    pages = sum(r['pages'] for r in built)
+    input_bytes = sum(r['input_bytes'] for r in built)
+    return {
+        'workers': workers,
+        'wall_seconds': round(wall_seconds, 3),
+        'bundles': len(results),
+        'built': len(built),
+        'skipped': sum(1 for r in results if r['status'] == 'skipped'),
+        'failed': sum(1 for r in results if r['status'] in ('failed', 'locked')),
+        'files': files,
+        'pages': pages,
+        'input_mb': round(input_bytes / (1024 * 1024), 2),
+        'bundles_per_minute': round(len(built) * 60 / wall_seconds, 2) if wall_seconds else 0.0,
+        'files_per_second': round(files / wall_seconds, 2) if wall_seconds else 0.0,
+        'pages_per_second': round(pages / wall_seconds, 2) if wall_seconds else 0.0
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', help="directory of bundle folders, or a JSON manifest")
+    parser.add_argument('--output', required=True, help="directory for bundle PDFs and the report")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--theme', default="Minimal")
+    parser.add_argument('--profile', choices=PROCESSING_PROFILES, default='full')
+    parser.add_argument('--dedup-policy', choices=DEDUP_POLICIES, default=main.DEDUP_POLICY)
+    parser.add_argument('--headers', action='store_true', help="add running headers and footers")
+    parser.add_argument('--compress', choices=('low', 'medium', 'high'), help="downsample large images")
+    parser.add_argument('--linearize', action='store_true', help="linearize outputs with qpdf")
+    parser.add_argument('--force', action='store_true', help="rebuild bundles whose output exists")
+    parser.add_argument('--keep-work', action='store_true', help="keep work directories of built bundles")
+    parser.add_argument('--report', help=f"report path (default <output>/{REPORT_FILE})")
+    args = parser.parse_args()
+
+    options = {
+        'output': os.path.abspath(args.output),
+        'theme': args.theme,
+        'profile': args.profile,
+        'dedup_policy': args.dedup_policy,
+        'headers': args.headers,
+        'compress': args.compress,
+        'linearize': args.linearize,
+        'force': args.force,
+        'keep_work': args.keep_work
+    }
+    os.makedirs(options['output'], exist_ok=True)
+    bundles = discover_bundles(args.source)
+    workers = max(1, min(args.workers, len(bundles)))
+    print(f"Building {len(bundles)} bundles with {workers} workers into {options['output']}")
+
+    results = []
+    start = time.perf_counter()
+    context = multiprocessing.get_context('fork' if hasattr(os, 'fork') else 'spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker) as pool:
+        futures = [pool.submit(run_bundle, spec, options) for spec in bundles]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results.append(result)
+            if result['status'] == 'skipped':
+                detail = "output exists"
+            else:
+                detail = result.get('error') or f"{result['files']} files, {result['pages']} pages"
+            print(f"[{done}/{len(bundles)}] {result['name']}: {result['status']} in {result['seconds']:.1f}s ({detail})")
+    wall_seconds = time.perf_counter() - start
+
+    report = {
+        'summary': summarize(results, wall_seconds, workers),
+        'bundles': sorted(results, key=lambda r: r['name'])
+    }
+    report_path = args.report or os.path.join(options['output'], REPORT_FILE)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report['summary'], indent=2))
+    print(f"Report written to {report_path}")
+    sys.exit(1 if report['summary']['failed'] else 0)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,101 @@
+"""Measure I/O of building many-small-file bundles with and without the in-memory document path.
+
+Posts bundles of small PDFs, DOCX and text files to /api/bundle in-process
+and reports wall time plus the read/write syscalls and bytes the process
+made (from /proc/self/io, so Linux only) per bundle, first with document
+buffers disabled (DOCUMENT_BUFFER_FILE_BYTES=0, every step reopens files
+from disk) and then enabled. Storage uploads are replaced by a no-op.
+
+Usage (from backend/):
+    python benchmarks/buffer_bench.py --files 200 --bundles 3
+"""
+import os
+import io
+import sys
+import time
+import json
+import shutil
+import tempfile
+import argparse
+import fitz
+from docx import Document
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_DIR = tempfile.mkdtemp(prefix="buffer_bench_")
+os.environ.setdefault('BUNDLE_CATALOG_URL', 'memory://')
+os.environ.setdefault('SEARCH_INDEX_PATH', os.path.join(BENCH_DIR, 'search.db'))
+
+import main
+from fastapi.testclient import TestClient
+
+
+async def skip_upload(file_path: str, bundle_id: str, filename: str = "bundle.pdf", local_url=None) -> str:
+    return local_url or f"/static/{bundle_id}/{filename}"
+
+
+def make_files(count: int):
+    files = []
+    for i in range(count):
+        text = f"Exhibit {i}. The parties agree to the terms herein; invoice {i} amount due is {i * 7}."
+        if i % 5 == 3:
+            document = Document()
+            document.add_paragraph(text)
+            buffer = io.BytesIO()
+            document.save(buffer)
+            files.append((f"note_{i:04d}.docx", buffer.getvalue(),
+                          'application/vnd.openxmlformats-officedocument.wordprocessingml.document'))
+        elif i % 5 == 4:
+            files.append((f"memo_{i:04d}.txt", (text + '\n') * 20, 'text/plain'))
+        else:
+            with fitz.open() as doc:
+                for page in range(3):
+                    doc.new_page().insert_text((72, 72), f"{text} Page {page + 1}.")
+                files.append((f"exhibit_{i:04d}.pdf", doc.tobytes(), 'application/pdf'))
+    return files
+
+
+def process_io():
+    with open('/proc/self/io') as f:
+        return {key: int(value) for key, value in (line.split(': ') for line in f)}
+
+
+def run(client: TestClient, files, bundles: int):
+    before, start = process_io(), time.perf_counter()
+    for b in range(bundles):
+        response = client.post('/api/bundle', data={'coverInfo': json.dumps({'title': f"Bench {b}"}),
+                                                    'client_id': 'bench', 'profile': 'metadata'},
+                               files=[('files', file) for file in files])
+        response.raise_for_status()
+    seconds = (time.perf_counter() - start) / bundles
+    after = process_io()
+    return seconds, {key: (after[key] - before[key]) / bundles for key in after}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--bundles', type=int, default=3)
+    args = parser.parse_args()
+
+    main.upload_to_storage = skip_upload
+    main.UPLOAD_DIR = BENCH_DIR
+    files = make_files(args.files)
+    buffer_bytes = main.DOCUMENT_BUFFER_FILE_BYTES
+    try:
+        with TestClient(main.app) as client:
+            run(client, files[:10], 1)
+            print(f"{args.files} files per bundle, {args.bundles} bundles; per bundle:")
+            print(f"{'path':>8} {'seconds':>8} {'read calls':>11} {'write calls':>12} {'read MB':>8} {'written MB':>11}")
+            for label, limit in (('disk', 0), ('buffers', buffer_bytes)):
+                main.DOCUMENT_BUFFER_FILE_BYTES = limit
+                seconds, io_stats = run(client, files, args.bundles)
+                print(f"{label:>8} {seconds:>8.2f} {io_stats['syscr']:>11.0f} {io_stats['syscw']:>12.0f} "
+                      f"{io_stats['rchar'] / 2 ** 20:>8.1f} {io_stats['wchar'] / 2 ** 20:>11.1f}")
+    finally:
+        main.DOCUMENT_BUFFER_FILE_BYTES = buffer_bytes
+        shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,124 @@
+"""Compare the keyword rules with the trained linear classifier on a synthetic corpus.
+
+Generates documents per category from category-specific phrases mixed with
+shared boilerplate, including words that trip the keyword rules (contracts
+that mention payment, emails that attach a report). Trains on one split and
+reports accuracy on the rest, the model file size and load time, and
+per-document latency for one-at-a-time versus batched inference.
+
+Usage (from backend/):
+    python benchmarks/classifier_bench.py --documents 4000 --batch-sizes 1 32 256
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_classifier import LinearDocumentClassifier, RuleClassifier
+
+PHRASES = {
+    'invoice': ["invoice number {n}", "amount due {m}", "please remit payment by {d}", "bill to account {n}",
+                "net thirty days", "tax {m} subtotal {m}", "late payment fee applies"],
+    'contract': ["this agreement is entered into on {d}", "the parties agree as follows", "terms and conditions",
+                 "governing law and jurisdiction", "termination for convenience", "payment schedule in clause {n}",
+                 "indemnification and limitation of liability"],
+    'legal_brief': ["in the court of appeal", "the appellant submits", "judgment was entered on {d}",
+                    "statement of facts", "argument and authorities", "the respondent contends", "case no {n}"],
+    'email': ["from: {name}@example.com", "sent: {d}", "subject: re: follow up", "hi {name}, thanks for",
+              "best regards", "please see the report attached", "forwarded message"],
+    'report': ["executive summary", "key findings", "methodology and data", "analysis of results",
+               "recommendations for the board", "appendix {n} figures", "quarterly performance review"],
+    'receipt': ["thank you for your purchase", "transaction id {n}", "card ending {n}", "total paid {m}",
+                "store {n} register {n}", "returns within fourteen days", "change given {m}"],
+    'certificate': ["this is to certify that {name}", "has successfully completed", "awarded on {d}",
+                    "certificate of completion", "registrar signature", "accredited programme {n}"],
+    'other': ["meeting notes", "agenda for {d}", "phone {n} extension {n}", "draft for discussion",
+              "miscellaneous correspondence", "see attached schedule"],
+}
+BOILERPLATE = ["the company", "as discussed", "on behalf of", "for the period ending {d}", "reference {n}",
+               "page {n} of {n}", "confidential", "please contact us", "in accordance with", "dated {d}"]
+NAMES = ["alice", "bob", "chen", "dana", "emeka", "farah", "goran", "hana"]
+
+
+def fill(phrase: str, rng: random.Random) -> str:
+    return phrase.format(n=rng.randint(100, 99999), m=f"{rng.randint(10, 90000)}.{rng.randint(0, 99):02d}",
+                         d=f"{rng.randint(1, 28)}/{rng.randint(1, 12)}/20{rng.randint(10, 25)}",
+                         name=rng.choice(NAMES))
+
+
+def make_document(category: str, rng: random.Random, noise: float) -> str:
+    """Category phrases diluted with boilerplate and, at rate noise, another category's phrases"""
+    sentences = []
+    for _ in range(rng.randint(8, 30)):
+        roll = rng.random()
+        if roll < noise:
+            source = PHRASES[rng.choice(list(PHRASES))]
+        elif roll < 0.55:
+            source = PHRASES[category]
+        else:
+            source = BOILERPLATE
+        sentences.append(fill(rng.choice(source), rng))
+    return '. '.join(sentences) + '.'
+
+
+def make_corpus(documents: int, noise: float, seed: int):
+    rng = random.Random(seed)
+    categories = list(PHRASES)
+    labels = [categories[i % len(categories)] for i in range(documents)]
+    rng.shuffle(labels)
+    return [make_document(label, rng, noise) for label in labels], labels
+
+
+def accuracy(predictions, labels) -> float:
+    return sum(1 for (label, _), truth in zip(predictions, labels) if label == truth) / len(labels)
+
+
+def per_document_ms(classify, texts, batch_size: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        classify(texts[i:i + batch_size])
+    return (time.perf_counter() - start) * 1000 / len(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, default=4000)
+    parser.add_argument('--noise', type=float, default=0.15, help="share of sentences from other categories")
+    parser.add_argument('--test-share', type=float, default=0.25)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 32, 256])
+    args = parser.parse_args()
+
+    texts, labels = make_corpus(args.documents, args.noise, seed=1)
+    split = int(len(texts) * (1 - args.test_share))
+    train_texts, test_texts, test_labels = texts[:split], texts[split:], labels[split:]
+
+    model = LinearDocumentClassifier.train(train_texts, labels[:split])
+    model_path = os.path.join(tempfile.mkdtemp(prefix="classifier_bench_"), 'classifier.npz')
+    model.save(model_path)
+    start = time.perf_counter()
+    model = LinearDocumentClassifier.load(model_path)
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"{len(train_texts)} training / {len(test_texts)} test documents, noise {args.noise}; "
+          f"trained in {model.info['train_seconds']}s, model {os.path.getsize(model_path) / (1024 * 1024):.1f} MB, "
+          f"loaded in {load_ms:.1f}ms\n")
+
+    rules = RuleClassifier()
+    print(f"{'classifier':>10} {'accuracy':>9} " + ' '.join(f"{f'batch {size} ms/doc':>17}" for size in args.batch_sizes))
+    for name, classifier in (('rules', rules), ('linear', model)):
+        latencies = [per_document_ms(classifier.predict, test_texts, size) for size in args.batch_sizes]
+        print(f"{name:>10} {accuracy(classifier.predict(test_texts), test_labels):>9.3f} "
+              + ' '.join(f"{ms:>17.4f}" for ms in latencies))
+
+    confidences = sorted(confidence for _, confidence in model.predict(test_texts))
+    wrong = [confidence for (label, confidence), truth in zip(model.predict(test_texts), test_labels) if label != truth]
+    print(f"\nlinear confidence: median {confidences[len(confidences) // 2]:.2f}, "
+          f"median when wrong {sorted(wrong)[len(wrong) // 2] if wrong else float('nan'):.2f}")
+    os.remove(model_path)
+
+
+if __name__ == '__main__':
+    main()
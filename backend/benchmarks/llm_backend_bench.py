@@ -0,0 +1,140 @@
+"""Drive the LLM backend against a stub Ollama server and report model calls and latency.
+
+The stub serves /api/generate with a fixed latency per request plus a
+small cost per document in the prompt; it labels documents with the
+keyword rules and summarizes with their first sentence. A workload of
+concurrent classify and summarize requests, in which a share of the
+documents repeat, is run once with batching and caching disabled and
+once with the configured defaults. A final pass points the backend at a
+closed port to show the fallback.
+
+Usage (from backend/):
+    python benchmarks/llm_backend_bench.py --documents 400 --repeat-share 0.5 --latency-ms 200
+"""
+import os
+import re
+import sys
+import time
+import json
+import random
+import socket
+import asyncio
+import argparse
+import threading
+import uvicorn
+from fastapi import FastAPI, Request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_classifier import CATEGORIES, RuleClassifier
+from llm_backend import OllamaBackend
+from loop_monitor import percentile
+
+DOCUMENT_HEADER = re.compile(r'^Document \d+:\n', re.MULTILINE)
+
+
+def make_stub(latency: float, per_document: float, calls: dict) -> FastAPI:
+    stub = FastAPI()
+    rules = RuleClassifier()
+
+    @stub.post('/api/generate')
+    async def generate(request: Request):
+        payload = await request.json()
+        prompt = payload['prompt']
+        if payload.get('format') == 'json':
+            documents = DOCUMENT_HEADER.split(prompt)[1:]
+            calls['classify'] += 1
+            calls['documents'] += len(documents)
+            await asyncio.sleep(latency + per_document * len(documents))
+            return {'response': json.dumps({'labels': [rules.classify(text) for text in documents]})}
+        calls['summarize'] += 1
+        await asyncio.sleep(latency)
+        body = prompt.split('\n\n', 1)[-1]
+        return {'response': body.split('.')[0].strip() + '.'}
+
+    return stub
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def make_workload(documents: int, repeat_share: float, seed: int = 1):
+    rng = random.Random(seed)
+    phrases = ["Invoice {n}: amount due {n}.", "This agreement is entered into by the parties {n}.",
+               "The court entered judgment in case {n}.", "Quarterly report {n}: key findings and analysis.",
+               "Receipt for purchase {n}, transaction approved.", "Meeting notes {n} for the planning group."]
+    unique = []
+    texts = []
+    for _ in range(documents):
+        if unique and rng.random() < repeat_share:
+            texts.append(rng.choice(unique))
+        else:
+            text = ' '.join(rng.choice(phrases).format(n=rng.randint(1, 10 ** 6)) for _ in range(6))
+            unique.append(text)
+            texts.append(text)
+    return texts
+
+
+async def run(backend: OllamaBackend, texts, clients: int):
+    latencies = []
+    queue = list(enumerate(texts))
+
+    async def client():
+        while queue:
+            _, text = queue.pop()
+            start = time.perf_counter()
+            await asyncio.gather(backend.classify(text), backend.summarize(text))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    await backend.close()
+    return elapsed, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, default=400)
+    parser.add_argument('--repeat-share', type=float, default=0.5)
+    parser.add_argument('--clients', type=int, default=32, help="concurrent callers")
+    parser.add_argument('--latency-ms', type=float, default=200, help="stub latency per request")
+    parser.add_argument('--per-document-ms', type=float, default=10, help="stub cost per batched document")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=8)
+    args = parser.parse_args()
+
+    calls = {}
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(make_stub(args.latency_ms / 1000, args.per_document_ms / 1000, calls),
+                                           host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    texts = make_workload(args.documents, args.repeat_share)
+    print(f"{len(texts)} documents ({len(set(texts))} distinct), {args.clients} callers, "
+          f"stub {args.latency_ms:.0f}ms + {args.per_document_ms:.0f}ms/document, concurrency {args.concurrency}\n")
+    print(f"{'mode':>10} {'seconds':>8} {'p50 ms':>8} {'p99 ms':>8} {'classify calls':>15} {'summarize calls':>16} "
+          f"{'cache hits':>11} {'coalesced':>10}")
+    for mode, batch_size, cache_entries in (('plain', 1, 0), ('batched', args.batch_size, 10000)):
+        calls.update(classify=0, summarize=0, documents=0)
+        backend = OllamaBackend(f"http://127.0.0.1:{port}", 'stub', CATEGORIES, max_concurrency=args.concurrency,
+                                batch_size=batch_size, cache_entries=cache_entries)
+        elapsed, latencies = asyncio.run(run(backend, texts, args.clients))
+        print(f"{mode:>10} {elapsed:>8.2f} {percentile(latencies, 50) * 1000:>8.0f} "
+              f"{percentile(latencies, 99) * 1000:>8.0f} {calls['classify']:>15} {calls['summarize']:>16} "
+              f"{backend.stats['cache_hits']:>11} {backend.stats['coalesced']:>10}")
+
+    backend = OllamaBackend(f"http://127.0.0.1:{free_port()}", 'stub', CATEGORIES, timeout=2)
+    elapsed, _ = asyncio.run(run(backend, texts[:50], args.clients))
+    print(f"\nserver down: 50 documents in {elapsed:.2f}s, {backend.stats['model_calls']} attempted calls, "
+          f"{backend.stats['failures']} failures (callers fall back to local models)")
+    server.should_exit = True
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""Fire concurrent bundle, upload and WebSocket clients at the app and report latency and loop lag.
+
+Starts the app under uvicorn in-process, with a local directory standing in
+for MinIO (uploads are blocking copies, as boto3's are, plus an optional
+simulated network delay) and a dict standing in for Redis. A probe polls
+/api/health throughout, so its latency shows how long requests queue behind
+whatever is blocking the event loop. The server-side lag monitor's stats
+and stalls are reported at the end; WebSocket clients are skipped when the
+``websockets`` package is not installed.
+
+Usage (from backend/):
+    python benchmarks/load_test.py --bundle-clients 4 --upload-clients 4 --requests 5
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import asyncio
+import tempfile
+import argparse
+import threading
+import fitz
+import httpx
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_DIR = tempfile.mkdtemp(prefix="load_test_")
+os.environ.setdefault('BUNDLE_CATALOG_URL', 'memory://')
+os.environ.setdefault('SEARCH_INDEX_PATH', os.path.join(BENCH_DIR, 'search.db'))
+os.environ.setdefault('RESUME_INTERRUPTED_BUILDS', 'false')
+
+import main
+from loop_monitor import percentile
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+
+class LocalObjectStore:
+    """Stand-in for the MinIO client: objects are copied into a local directory"""
+
+    def __init__(self, root: str, latency: float = 0.0):
+        self.root = root
+        self.latency = latency
+
+    def head_bucket(self, Bucket):
+        if not os.path.isdir(os.path.join(self.root, Bucket)):
+            raise KeyError(Bucket)
+
+    def create_bucket(self, Bucket):
+        os.makedirs(os.path.join(self.root, Bucket), exist_ok=True)
+
+    def upload_file(self, path, bucket, key):
+        destination = os.path.join(self.root, bucket, key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        time.sleep(self.latency)
+        shutil.copyfile(path, destination)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"file://{os.path.join(self.root, Params['Bucket'], Params['Key'])}"
+
+
+class LocalRedis:
+    """Stand-in for the Redis client"""
+
+    def __init__(self):
+        self.data = {}
+
+    def ping(self):
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        return True
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+
+def make_pdf(index: int, pages: int) -> bytes:
+    doc = fitz.open()
+    for p in range(pages):
+        doc.new_page().insert_text((72, 72), f"Exhibit {index} page {p + 1}. The defendant signed the agreement "
+                                             f"and the invoice amount of {index * 100} is due.")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, name: str, seconds: float, ok: bool = True):
+        self.latencies.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self):
+        print(f"{'operation':>14} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for name, values in self.latencies.items():
+            values = sorted(values)
+            print(f"{name:>14} {len(values):>6} {self.errors.get(name, 0):>6} {percentile(values, 50) * 1000:>9.1f} "
+                  f"{percentile(values, 99) * 1000:>9.1f} {values[-1] * 1000:>9.1f}")
+
+
+async def timed(recorder: Recorder, name: str, call):
+    start = time.perf_counter()
+    try:
+        response = await call()
+        ok = response.status_code < 400
+    except Exception:
+        response, ok = None, False
+    recorder.add(name, time.perf_counter() - start, ok)
+    return response
+
+
+async def health_probe(client: httpx.AsyncClient, recorder: Recorder, stop: asyncio.Event, interval: float):
+    while not stop.is_set():
+        await timed(recorder, 'health', lambda: client.get('/api/health'))
+        await asyncio.sleep(interval)
+
+
+async def bundle_client(client: httpx.AsyncClient, base_ws: str, recorder: Recorder, n: int, args):
+    client_id = f"load-{n}"
+    ws = None
+    if websockets is not None:
+        start = time.perf_counter()
+        try:
+            ws = await websockets.connect(f"{base_ws}/ws/{client_id}")
+            recorder.add('ws_connect', time.perf_counter() - start)
+        except Exception:
+            recorder.add('ws_connect', time.perf_counter() - start, ok=False)
+    messages = []
+
+    async def read_progress():
+        last = time.perf_counter()
+        try:
+            async for message in ws:
+                now = time.perf_counter()
+                messages.append(json.loads(message)['type'])
+                recorder.add('ws_gap', now - last)
+                last = now
+        except Exception:
+            pass
+
+    reader = asyncio.ensure_future(read_progress()) if ws is not None else None
+    for r in range(args.requests):
+        files = [('files', (f"exhibit_{n}_{r}_{i}.pdf", make_pdf(n * 1000 + r * 100 + i, args.pages), 'application/pdf'))
+                 for i in range(args.files)]
+        await timed(recorder, 'bundle', lambda: client.post('/api/bundle', files=files, data={
+            'coverInfo': json.dumps({'title': f"Load test {n}-{r}"}),
+            'client_id': client_id
+        }))
+    if ws is not None:
+        await ws.close()
+        await reader
+
+
+async def upload_client(client: httpx.AsyncClient, recorder: Recorder, n: int, args):
+    for r in range(args.requests):
+        data = make_pdf(50000 + n * 100 + r, args.pages)
+        await timed(recorder, 'upload', lambda: client.post('/api/upload', files={
+            'file': (f"upload_{n}_{r}.pdf", data, 'application/pdf')
+        }, data={'session_id': f"load-session-{n}"}))
+
+
+async def run(base_url: str, args) -> Recorder:
+    recorder = Recorder()
+    stop = asyncio.Event()
+    limits = httpx.Limits(max_connections=args.bundle_clients + args.upload_clients + 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=600, limits=limits) as client:
+        probe = asyncio.ensure_future(health_probe(client, recorder, stop, args.probe_interval))
+        base_ws = base_url.replace('http://', 'ws://')
+        await asyncio.gather(
+            *(bundle_client(client, base_ws, recorder, n, args) for n in range(args.bundle_clients)),
+            *(upload_client(client, recorder, n, args) for n in range(args.upload_clients))
+        )
+        stop.set()
+        await probe
+        loop_stats = (await client.get('/api/admin/event-loop')).json()
+    recorder.loop_stats = loop_stats
+    return recorder
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bundle-clients', type=int, default=4)
+    parser.add_argument('--upload-clients', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=3, help="requests per client")
+    parser.add_argument('--files', type=int, default=5, help="files per bundle")
+    parser.add_argument('--pages', type=int, default=3, help="pages per file")
+    parser.add_argument('--storage-latency-ms', type=float, default=50.0,
+                        help="simulated MinIO round trip per upload")
+    parser.add_argument('--probe-interval', type=float, default=0.05)
+    args = parser.parse_args()
+
+    main.s3_client = LocalObjectStore(os.path.join(BENCH_DIR, 'objects'), args.storage_latency_ms / 1000)
+    main.redis_client = LocalRedis()
+    main.build_scheduler.max_queued_per_tenant = max(main.build_scheduler.max_queued_per_tenant,
+                                                     args.bundle_clients * args.requests)
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    try:
+        while not server.started:
+            time.sleep(0.05)
+        start = time.perf_counter()
+        recorder = asyncio.run(run(f"http://127.0.0.1:{port}", args))
+        elapsed = time.perf_counter() - start
+
+        print(f"{args.bundle_clients} bundle clients x {args.requests} bundles of {args.files} files, "
+              f"{args.upload_clients} upload clients x {args.requests} uploads, {elapsed:.1f}s"
+              + ("" if websockets else " (websockets not installed: no WebSocket clients)"))
+        recorder.report()
+        stats = recorder.loop_stats
+        print(f"\nevent loop lag: p50 {stats['lag_p50_ms']}ms, p99 {stats['lag_p99_ms']}ms, "
+              f"max {stats['lag_max_ms']}ms, {stats['stalls']} stalls over {stats['threshold_ms']:.0f}ms")
+        for stall in stats['recent_stalls'][-3:]:
+            print(f"\nstall of {stall['blocked_ms']}ms at:\n{stall['stack'].strip().splitlines()[-2].strip()}")
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+        shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,92 @@
+"""Compare bundling throughput of the processing profiles against raw PyMuPDF merging.
+
+Generates text PDFs, then times a plain ``insert_pdf`` merge and the bundler
+pipeline (per-file processing plus compile_final_bundle) under the merge,
+metadata and full profiles. Cover and TOC rendering are excluded so the
+numbers isolate per-file overhead.
+
+Usage (from backend/):
+    python benchmarks/merge_passthrough_bench.py --files 200 --pages 5
+"""
+import os
+import sys
+import time
+import shutil
+import asyncio
+import tempfile
+import argparse
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_DIR = tempfile.mkdtemp(prefix="merge_bench_")
+os.environ.setdefault('BUNDLE_CATALOG_URL', 'memory://')
+os.environ.setdefault('SEARCH_INDEX_PATH', os.path.join(BENCH_DIR, 'search.db'))
+
+from main import AIEnhancedPDFBundler, compile_final_bundle
+from file_records import FileBatch
+
+
+def make_inputs(directory: str, files: int, pages: int):
+    paths = []
+    for i in range(files):
+        doc = fitz.open()
+        for p in range(pages):
+            doc.new_page().insert_text((72, 72), f"Exhibit {i} page {p + 1}. The parties agree to the terms herein.")
+        path = os.path.join(directory, f"exhibit_{i:05d}.pdf")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+def raw_merge(paths, output_path: str):
+    merger = fitz.open()
+    for path in paths:
+        with fitz.open(path) as doc:
+            merger.insert_pdf(doc)
+    merger.save(output_path)
+    merger.close()
+
+
+async def bundle(paths, work_dir: str, profile: str):
+    bundler = AIEnhancedPDFBundler(work_dir, index_text=False)
+    batch = FileBatch()
+    for path in paths:
+        batch.add(await bundler.process_file_with_ai(path, 'application/pdf', 'bench', profile=profile))
+    await compile_final_bundle(work_dir, '', '', batch, linearize=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--profiles', nargs='+', default=['merge', 'metadata', 'full'])
+    args = parser.parse_args()
+
+    try:
+        input_dir = os.path.join(BENCH_DIR, 'inputs')
+        os.makedirs(input_dir)
+        paths = make_inputs(input_dir, args.files, args.pages)
+        total_pages = args.files * args.pages
+
+        start = time.perf_counter()
+        raw_merge(paths, os.path.join(BENCH_DIR, 'raw.pdf'))
+        raw_seconds = time.perf_counter() - start
+
+        print(f"{'path':>10} {'seconds':>9} {'files/s':>9} {'pages/s':>9} {'vs raw':>8}")
+        print(f"{'raw':>10} {raw_seconds:>9.3f} {args.files / raw_seconds:>9.0f} {total_pages / raw_seconds:>9.0f} {1.0:>8.2f}")
+        for profile in args.profiles:
+            work_dir = os.path.join(BENCH_DIR, profile)
+            os.makedirs(work_dir)
+            start = time.perf_counter()
+            asyncio.run(bundle(paths, work_dir, profile))
+            seconds = time.perf_counter() - start
+            print(f"{profile:>10} {seconds:>9.3f} {args.files / seconds:>9.0f} "
+                  f"{total_pages / seconds:>9.0f} {seconds / raw_seconds:>8.2f}")
+    finally:
+        shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
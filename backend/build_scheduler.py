@@ -0,0 +1,223 @@
+import time
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Relative cost weights; one unit is roughly one small text file
+COST_PER_FILE = 1.0
+COST_PER_MB = 0.5
+COST_PER_PAGE = 0.2
+# Used to guess page counts before any PDF has been opened
+ESTIMATED_BYTES_PER_PAGE = 100 * 1024
+
+
+def estimate_cost(file_count: int, total_bytes: int, page_count: Optional[int] = None) -> float:
+    """Estimate build cost from file count, input size and page count"""
+    if page_count is None:
+        page_count = max(file_count, total_bytes // ESTIMATED_BYTES_PER_PAGE)
+    return (
+        COST_PER_FILE * file_count
+        + COST_PER_MB * total_bytes / (1024 * 1024)
+        + COST_PER_PAGE * page_count
+    )
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse "tenant-a=3,tenant-b=0.5" into a weight map"""
+    weights = {}
+    for item in spec.split(','):
+        if '=' in item:
+            tenant, weight = item.split('=', 1)
+            try:
+                weights[tenant.strip()] = float(weight)
+            except ValueError:
+                logger.warning(f"Ignoring invalid tenant weight: {item}")
+    return weights
+
+
+class SchedulerSaturated(Exception):
+    """Raised when a build cannot be admitted; carries a Retry-After hint in seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BuildTicket:
+    __slots__ = ('tenant', 'cost', 'small', 'start_tag', 'finish_tag', 'enqueued_at',
+                 'started_at', 'future', 'reserved_slot')
+
+    def __init__(self, tenant: str, cost: float, small: bool, start_tag: float, finish_tag: float):
+        self.tenant = tenant
+        self.cost = cost
+        self.small = small
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.future: Optional[asyncio.Future] = None
+        self.reserved_slot = False
+
+    @property
+    def dispatched(self) -> bool:
+        return self.future.done()
+
+
+class BuildScheduler:
+    """Weighted fair queuing of bundle builds across tenants.
+
+    Each tenant has its own FIFO queue. Jobs are tagged with a virtual finish
+    time (start + cost / weight) and the eligible queue head with the
+    smallest tag runs next, so a tenant submitting huge batches cannot starve
+    others and small jobs overtake big ones. A few slots are reserved for
+    small jobs so interactive bundles keep low latency under batch load.
+    """
+
+    def __init__(self, max_concurrent: int = 2, reserved_small_slots: int = 1,
+                 per_tenant_concurrency: int = 2, small_job_cost: float = 20.0,
+                 max_queued_per_tenant: int = 50, max_queued_cost: float = 20000.0,
+                 weights: Optional[Dict[str, float]] = None):
+        self.max_concurrent = max_concurrent
+        self.reserved_small_slots = reserved_small_slots
+        self.per_tenant_concurrency = per_tenant_concurrency
+        self.small_job_cost = small_job_cost
+        self.max_queued_per_tenant = max_queued_per_tenant
+        self.max_queued_cost = max_queued_cost
+        self.weights = weights or {}
+
+        self._queues: Dict[str, List[BuildTicket]] = {}
+        self._running: Dict[str, int] = {}
+        self._general_running = 0
+        self._reserved_running = 0
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._queued_cost = 0.0
+        # Seconds per cost unit, smoothed; seeds the Retry-After estimate
+        self._seconds_per_cost = 0.5
+        self._avg_wait = 0.0
+        self.admitted = 0
+        self.rejected = 0
+
+    def submit(self, tenant: str, cost: float) -> BuildTicket:
+        """Admit a build or raise SchedulerSaturated; the ticket may start immediately"""
+        queue = self._queues.setdefault(tenant, [])
+        # A job costlier than the whole cap is still admitted once nothing is queued
+        over_cost = self._queued_cost + cost > self.max_queued_cost and any(self._queues.values())
+        if len(queue) >= self.max_queued_per_tenant or over_cost:
+            self.rejected += 1
+            raise SchedulerSaturated(
+                f"Build queue is full for tenant {tenant}",
+                self._retry_after(cost)
+            )
+
+        weight = self.weights.get(tenant, 1.0)
+        start_tag = max(self._virtual_time, self._last_finish.get(tenant, 0.0))
+        finish_tag = start_tag + cost / weight
+        self._last_finish[tenant] = finish_tag
+
+        ticket = BuildTicket(tenant, cost, cost <= self.small_job_cost, start_tag, finish_tag)
+        ticket.future = asyncio.get_running_loop().create_future()
+        queue.append(ticket)
+        self._queued_cost += cost
+        self.admitted += 1
+        self._dispatch()
+        return ticket
+
+    async def wait(self, ticket: BuildTicket) -> None:
+        """Wait until the ticket is dispatched; callers must release() it afterwards"""
+        await asyncio.shield(ticket.future)
+
+    def release(self, ticket: BuildTicket) -> None:
+        """Free the ticket's slot (or withdraw it if still queued) and start the next build"""
+        if ticket.started_at is None:
+            self._withdraw(ticket)
+            return
+        elapsed = time.monotonic() - ticket.started_at
+        if ticket.cost > 0:
+            self._seconds_per_cost = 0.8 * self._seconds_per_cost + 0.2 * (elapsed / ticket.cost)
+        self._running[ticket.tenant] = self._running.get(ticket.tenant, 1) - 1
+        if ticket.reserved_slot:
+            self._reserved_running -= 1
+        else:
+            self._general_running -= 1
+        ticket.started_at = None
+        self._dispatch()
+
+    def position(self, ticket: BuildTicket) -> int:
+        """Number of queued builds ahead of this one"""
+        return sum(
+            1 for queue in self._queues.values() for other in queue
+            if other.finish_tag < ticket.finish_tag
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        tenants = {}
+        oldest_wait = 0.0
+        for tenant in set(self._queues) | set(self._running):
+            queue = self._queues.get(tenant, [])
+            if queue:
+                oldest_wait = max(oldest_wait, now - queue[0].enqueued_at)
+            if queue or self._running.get(tenant):
+                tenants[tenant] = {
+                    'queued': len(queue),
+                    'queued_cost': round(sum(t.cost for t in queue), 2),
+                    'running': self._running.get(tenant, 0)
+                }
+        return {
+            'running': self._general_running + self._reserved_running,
+            'max_concurrent': self.max_concurrent,
+            'reserved_small_slots': self.reserved_small_slots,
+            'queue_depth': sum(len(q) for q in self._queues.values()),
+            'queued_cost': round(self._queued_cost, 2),
+            'avg_wait_seconds': round(self._avg_wait, 3),
+            'oldest_wait_seconds': round(oldest_wait, 3),
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'tenants': tenants
+        }
+
+    def _dispatch(self) -> None:
+        while True:
+            general_free = self._general_running < self.max_concurrent
+            reserved_free = self._reserved_running < self.reserved_small_slots
+            if not general_free and not reserved_free:
+                return
+
+            best = None
+            for tenant, queue in self._queues.items():
+                if not queue or self._running.get(tenant, 0) >= self.per_tenant_concurrency:
+                    continue
+                head = queue[0]
+                if not general_free and not head.small:
+                    continue
+                if best is None or head.finish_tag < best.finish_tag:
+                    best = head
+            if best is None:
+                return
+
+            self._queues[best.tenant].pop(0)
+            self._queued_cost -= best.cost
+            self._running[best.tenant] = self._running.get(best.tenant, 0) + 1
+            best.reserved_slot = not general_free
+            if best.reserved_slot:
+                self._reserved_running += 1
+            else:
+                self._general_running += 1
+            self._virtual_time = max(self._virtual_time, best.start_tag)
+            best.started_at = time.monotonic()
+            self._avg_wait = 0.9 * self._avg_wait + 0.1 * (best.started_at - best.enqueued_at)
+            if not best.future.done():
+                best.future.set_result(None)
+
+    def _withdraw(self, ticket: BuildTicket) -> None:
+        queue = self._queues.get(ticket.tenant, [])
+        if ticket in queue:
+            queue.remove(ticket)
+            self._queued_cost -= ticket.cost
+
+    def _retry_after(self, cost: float) -> int:
+        backlog = (self._queued_cost + cost) * self._seconds_per_cost / max(1, self.max_concurrent)
+        return int(min(600, max(1, backlog)))
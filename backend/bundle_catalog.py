@@ -0,0 +1,291 @@
+import os
+import abc
+import json
+import base64
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at: str, bundle_id: str) -> str:
+    """Encode a keyset position as an opaque URL-safe cursor"""
+    raw = json.dumps([created_at, bundle_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[List[str]]:
+    """Decode a cursor produced by encode_cursor, or None if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, bundle_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return [str(created_at), str(bundle_id)]
+    except Exception:
+        return None
+
+
+class BundleCatalog(abc.ABC):
+    """Storage interface for bundle metadata.
+
+    Implementations persist one row per bundle plus one row per file so that
+    listings never need to walk UPLOAD_DIR.
+    """
+
+    @abc.abstractmethod
+    def record_bundle(self, bundle: Dict[str, Any], files: List[Dict[str, Any]]) -> None:
+        """Insert or replace a bundle and its files"""
+
+    @abc.abstractmethod
+    def update_bundle(self, bundle_id: str, **fields) -> None:
+        """Set some of a bundle's columns"""
+
+    @abc.abstractmethod
+    def get_bundle(self, bundle_id: str) -> Optional[Dict[str, Any]]:
+        """One bundle with its files, or None"""
+
+    @abc.abstractmethod
+    def list_bundles(
+        self,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        client_id: Optional[str] = None,
+        status: Optional[str] = None,
+        classification: Optional[str] = None,
+        query: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """A page of bundles, newest first, with the cursor of the next page"""
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBundleCatalog(BundleCatalog):
+    """SQLite-backed catalog with keyset pagination over (created_at, id)"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS bundles (
+        id TEXT PRIMARY KEY,
+        name TEXT COLLATE NOCASE,
+        client_id TEXT,
+        theme TEXT,
+        status TEXT NOT NULL,
+        file_count INTEGER NOT NULL DEFAULT 0,
+        total_pages INTEGER NOT NULL DEFAULT 0,
+        output_path TEXT,
+        download_url TEXT,
+        cover_info TEXT,
+        stage_timings TEXT,
+        volumes TEXT,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS bundle_files (
+        id TEXT PRIMARY KEY,
+        bundle_id TEXT NOT NULL REFERENCES bundles(id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        filename TEXT NOT NULL,
+        file_type TEXT,
+        content_hash TEXT,
+        size INTEGER,
+        page_count INTEGER,
+        classification TEXT,
+        summary TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_bundles_created ON bundles(created_at DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS idx_bundles_client ON bundles(client_id, created_at DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS idx_bundles_status ON bundles(status, created_at DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS idx_bundles_name ON bundles(name COLLATE NOCASE);
+    CREATE INDEX IF NOT EXISTS idx_files_bundle ON bundle_files(bundle_id, position);
+    CREATE INDEX IF NOT EXISTS idx_files_classification ON bundle_files(classification, bundle_id);
+    """
+
+    BUNDLE_FIELDS = (
+        'name', 'client_id', 'theme', 'status', 'file_count', 'total_pages',
+        'output_path', 'download_url', 'cover_info', 'stage_timings', 'volumes'
+    )
+    # JSON columns and the empty value each decodes to when unset
+    JSON_FIELDS = {'cover_info': dict, 'stage_timings': dict, 'volumes': list}
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(self.SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """Add columns introduced after a database was created"""
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(bundles)")}
+        if 'volumes' not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE bundles ADD COLUMN volumes TEXT")
+
+    def record_bundle(self, bundle: Dict[str, Any], files: List[Dict[str, Any]]) -> None:
+        """Insert or update a bundle and replace its file rows in one transaction
+
+        An existing bundle keeps its created_at, so re-recording it (e.g. on
+        completion) never moves it between keyset pages.
+        """
+        now = datetime.now().isoformat()
+        row = {
+            'id': bundle['id'],
+            'name': bundle.get('name'),
+            'client_id': bundle.get('client_id'),
+            'theme': bundle.get('theme'),
+            'status': bundle.get('status', 'pending'),
+            'file_count': bundle.get('file_count', len(files)),
+            'total_pages': bundle.get('total_pages', 0),
+            'output_path': bundle.get('output_path'),
+            'download_url': bundle.get('download_url'),
+            'cover_info': json.dumps(bundle.get('cover_info') or {}),
+            'stage_timings': json.dumps(bundle.get('stage_timings') or {}),
+            'volumes': json.dumps(bundle.get('volumes') or []),
+            'created_at': bundle.get('created_at') or now,
+            'updated_at': now
+        }
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO bundles ({', '.join(row)}) VALUES ({', '.join('?' for _ in row)}) "
+                f"ON CONFLICT(id) DO UPDATE SET "
+                f"{', '.join(f'{k} = excluded.{k}' for k in row if k not in ('id', 'created_at'))}",
+                list(row.values())
+            )
+            self._conn.execute("DELETE FROM bundle_files WHERE bundle_id = ?", (bundle['id'],))
+            self._conn.executemany(
+                "INSERT INTO bundle_files (id, bundle_id, position, filename, file_type, content_hash, "
+                "size, page_count, classification, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        f.get('id') or f"{bundle['id']}:{i}",
+                        bundle['id'],
+                        i,
+                        f.get('filename', ''),
+                        f.get('file_type'),
+                        f.get('content_hash'),
+                        f.get('size'),
+                        f.get('page_count'),
+                        f.get('classification'),
+                        f.get('summary')
+                    )
+                    for i, f in enumerate(files)
+                ]
+            )
+
+    def update_bundle(self, bundle_id: str, **fields) -> None:
+        """Update selected bundle columns (status, timings, download_url, ...)"""
+        updates = {k: v for k, v in fields.items() if k in self.BUNDLE_FIELDS}
+        if not updates:
+            return
+        for key, empty in self.JSON_FIELDS.items():
+            if key in updates:
+                updates[key] = json.dumps(updates[key] or empty())
+        updates['updated_at'] = datetime.now().isoformat()
+        assignments = ', '.join(f"{k} = ?" for k in updates)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE bundles SET {assignments} WHERE id = ?",
+                list(updates.values()) + [bundle_id]
+            )
+
+    def get_bundle(self, bundle_id: str) -> Optional[Dict[str, Any]]:
+        """Return a bundle with its ordered file list"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM bundles WHERE id = ?", (bundle_id,)).fetchone()
+            if row is None:
+                return None
+            files = self._conn.execute(
+                "SELECT * FROM bundle_files WHERE bundle_id = ? ORDER BY position", (bundle_id,)
+            ).fetchall()
+        bundle = self._bundle_from_row(row)
+        bundle['files'] = [dict(f) for f in files]
+        return bundle
+
+    def list_bundles(
+        self,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        client_id: Optional[str] = None,
+        status: Optional[str] = None,
+        classification: Optional[str] = None,
+        query: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """List bundles newest first using keyset pagination"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses = []
+        params: List[Any] = []
+
+        if cursor:
+            position = decode_cursor(cursor)
+            if position is None:
+                raise ValueError("Invalid cursor")
+            clauses.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params.extend([position[0], position[0], position[1]])
+        if client_id:
+            clauses.append("client_id = ?")
+            params.append(client_id)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if classification:
+            clauses.append(
+                "EXISTS (SELECT 1 FROM bundle_files f "
+                "WHERE f.bundle_id = bundles.id AND f.classification = ?)"
+            )
+            params.append(classification)
+        if query:
+            escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            params.append(f"{escaped}%")
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (
+            "SELECT id, name, client_id, theme, status, file_count, total_pages, "
+            "download_url, stage_timings, created_at, updated_at "
+            f"FROM bundles {where} ORDER BY created_at DESC, id DESC LIMIT ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit + 1]).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        bundles = [self._bundle_from_row(r) for r in rows]
+        next_cursor = None
+        if has_more and rows:
+            next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+        return {"bundles": bundles, "next_cursor": next_cursor}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _bundle_from_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        bundle = dict(row)
+        for key, empty in self.JSON_FIELDS.items():
+            if key in bundle:
+                bundle[key] = json.loads(bundle[key]) if bundle[key] else empty()
+        return bundle
+
+
+def create_catalog(url: Optional[str] = None, default_dir: Optional[str] = None) -> BundleCatalog:
+    """Create a catalog from a URL such as ``sqlite:///path/catalog.db`` or ``memory://``"""
+    url = url or os.environ.get('BUNDLE_CATALOG_URL')
+    if not url:
+        base_dir = default_dir or os.getcwd()
+        return SQLiteBundleCatalog(os.path.join(base_dir, "catalog.db"))
+    if url.startswith('memory://'):
+        return SQLiteBundleCatalog(':memory:')
+    if url.startswith('sqlite:///'):
+        return SQLiteBundleCatalog(url[len('sqlite:///'):])
+    raise ValueError(f"Unsupported catalog URL: {url}")
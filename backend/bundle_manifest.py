@@ -0,0 +1,243 @@
+import os
+import json
+import threading
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process only, builds are not locked
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+CHECKPOINT_FILE = "checkpoints.jsonl"
+LOCK_FILE = "build.lock"
+# Finishing stages in build order; redoing one invalidates those after it
+STAGES = ('cover', 'toc', 'compile', 'volumes', 'upload')
+# Stages whose checkpoint output is a file in the work directory
+FILE_STAGES = ('cover', 'toc', 'compile')
+# Stages whose output is a list of entries naming files ('filename', 'cover', 'toc') in the work directory
+FILE_LIST_STAGES = ('volumes',)
+VOLUME_FILE_KEYS = ('filename', 'cover', 'toc')
+
+
+class BundleManifest:
+    """Stage-level checkpoints for a bundle build, kept in its work directory.
+
+    ``manifest.json`` holds the build inputs (cover info, theme, saved files)
+    and is rewritten only when the status changes. Completed files and stages
+    are appended to ``checkpoints.jsonl`` one line at a time, so recording a
+    checkpoint costs the same for the first file as for the 3,000th. A
+    restarted build replays the journal and skips everything whose outputs
+    are still on disk; a torn final line from a crash is ignored. Recording a
+    file or stage drops the checkpoints of the stages that depend on it.
+    """
+
+    def __init__(self, work_dir: str, data: Dict[str, Any]):
+        self.work_dir = work_dir
+        self.data = data
+        self.files: Dict[int, Dict[str, Any]] = {}
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, work_dir: str, bundle_id: str, cover_info: dict, theme: str, client_id: str,
+               tenant: str, saved_files: List[Dict[str, Any]], dedup_policy: str = 'keep',
+               profiled: bool = False, volume_max_bytes: int = 0) -> 'BundleManifest':
+        """Start a new manifest, discarding any previous checkpoints"""
+        manifest = cls(work_dir, {
+            'bundle_id': bundle_id,
+            'status': 'processing',
+            'cover_info': cover_info,
+            'theme': theme,
+            'client_id': client_id,
+            'tenant': tenant,
+            'dedup_policy': dedup_policy,
+            'profiling': profiled,
+            'volume_max_bytes': volume_max_bytes,
+            'files': [dict(saved, path=manifest_path(work_dir, saved['path'])) for saved in saved_files],
+            'created_at': datetime.now().isoformat()
+        })
+        manifest.save()
+        try:
+            os.remove(os.path.join(work_dir, CHECKPOINT_FILE))
+        except FileNotFoundError:
+            pass
+        return manifest
+
+    @classmethod
+    def load(cls, work_dir: str) -> Optional['BundleManifest']:
+        """Load a manifest and replay its checkpoints, or None if there is none"""
+        try:
+            with open(os.path.join(work_dir, MANIFEST_FILE), 'r') as f:
+                manifest = cls(work_dir, json.load(f))
+        except (OSError, ValueError):
+            return None
+
+        try:
+            with open(os.path.join(work_dir, CHECKPOINT_FILE), 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Ignoring torn checkpoint line in {work_dir}")
+                        continue
+                    manifest._apply(entry)
+        except FileNotFoundError:
+            pass
+        return manifest
+
+    @property
+    def saved_files(self) -> List[Dict[str, Any]]:
+        """Build inputs with absolute paths"""
+        return [dict(saved, path=self.resolve(saved['path'])) for saved in self.data['files']]
+
+    def resolve(self, path: str) -> str:
+        return path if os.path.isabs(path) else os.path.join(self.work_dir, path)
+
+    def file_result(self, index: int) -> Optional[Dict[str, Any]]:
+        """Checkpointed result for the index-th input if its PDF is still on disk"""
+        entry = self.files.get(index)
+        if entry is None:
+            return None
+        pdf_path = self.resolve(entry['pdf_path'])
+        if not os.path.exists(pdf_path):
+            return None
+        text_path = entry.get('text_path')
+        return {
+            'metadata': entry['metadata'],
+            'pdf_path': pdf_path,
+            'text_path': self.resolve(text_path) if text_path else None
+        }
+
+    def record_file(self, index: int, result: Dict[str, Any]) -> None:
+        """Checkpoint a processed input: metadata, converted PDF and where its text was spilled"""
+        text_path = result.get('text_path')
+        entry = {
+            'stage': 'file',
+            'index': index,
+            'metadata': result['metadata'],
+            'pdf_path': manifest_path(self.work_dir, result['pdf_path']),
+            'text_path': manifest_path(self.work_dir, text_path) if text_path else None
+        }
+        self._append(entry)
+        self._apply(entry)
+
+    def stage_output(self, name: str) -> Optional[Any]:
+        """Output of a completed stage, or None if it must run (again)"""
+        entry = self.stages.get(name)
+        if entry is None:
+            return None
+        if name in FILE_STAGES:
+            path = self.resolve(entry['output'])
+            return path if os.path.exists(path) else None
+        if name in FILE_LIST_STAGES:
+            names = [item[key] for item in entry['output'] for key in VOLUME_FILE_KEYS if item.get(key)]
+            if not all(os.path.exists(os.path.join(self.work_dir, name)) for name in names):
+                return None
+        return entry['output']
+
+    def stage_seconds(self, name: str) -> float:
+        return self.stages.get(name, {}).get('seconds', 0.0)
+
+    def record_stage(self, name: str, output: Any, seconds: float) -> None:
+        if name in FILE_STAGES:
+            output = manifest_path(self.work_dir, output)
+        entry = {'stage': name, 'output': output, 'seconds': seconds}
+        self._append(entry)
+        self._apply(entry)
+
+    def set_status(self, status: str) -> None:
+        self.data['status'] = status
+        self.data['updated_at'] = datetime.now().isoformat()
+        self.save()
+
+    def save(self) -> None:
+        path = os.path.join(self.work_dir, MANIFEST_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, default=str)
+        os.replace(tmp_path, path)
+
+    def _apply(self, entry: Dict[str, Any]) -> None:
+        if entry['stage'] == 'file':
+            self.files[entry['index']] = entry
+            self.stages.clear()
+            return
+        position = STAGES.index(entry['stage'])
+        for later in STAGES[position:]:
+            self.stages.pop(later, None)
+        self.stages[entry['stage']] = entry
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, default=str) + '\n'
+        with self._lock:
+            with open(os.path.join(self.work_dir, CHECKPOINT_FILE), 'a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class BuildLock:
+    """Exclusive claim on building a bundle, shared by every worker process on the host.
+
+    An flock on ``build.lock`` in the work directory; the kernel drops it
+    when the holder exits, so a crashed worker never leaves a bundle claimed.
+    """
+
+    def __init__(self, work_dir: str):
+        self.path = os.path.join(work_dir, LOCK_FILE)
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> bool:
+        """Take the lock without waiting; False if another process holds it"""
+        if fcntl is None:
+            return True
+        fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def build_locked(work_dir: str) -> bool:
+    """Whether some process is building the bundle in work_dir right now"""
+    if fcntl is None or not os.path.exists(os.path.join(work_dir, LOCK_FILE)):
+        return False
+    lock = BuildLock(work_dir)
+    if not lock.acquire():
+        return True
+    lock.release()
+    return False
+
+
+def manifest_path(work_dir: str, path: str) -> str:
+    """Store paths inside the work directory relative to it so it can be moved"""
+    relative = os.path.relpath(path, work_dir)
+    return path if relative.startswith('..') else relative
+
+
+def find_interrupted(root: str) -> List[BundleManifest]:
+    """Manifests under root whose build never finished"""
+    interrupted = []
+    try:
+        with os.scandir(root) as children:
+            for child in children:
+                if child.is_dir(follow_symlinks=False):
+                    manifest = BundleManifest.load(child.path)
+                    if manifest is not None and manifest.data.get('status') == 'processing':
+                        interrupted.append(manifest)
+    except FileNotFoundError:
+        pass
+    return interrupted
@@ -0,0 +1,131 @@
+import io
+import re
+import zlib
+import logging
+from typing import List, Dict, Any, Optional
+import numpy as np
+from docx import Document
+from document_buffers import open_pdf
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ('keep', 'reference', 'collapse')
+
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_WORDS = 3
+MIN_WORDS = 20
+SAMPLE_PAGES = 6
+SAMPLE_CHARS = 20000
+# Minimum estimated Jaccard similarity of shingle sets for a near-duplicate
+DEFAULT_THRESHOLD = 0.85
+
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32; a * h stays below 2**64
+_rng = np.random.default_rng(0x5EED)
+_PERM_A = _rng.integers(1, int(_PRIME), NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, int(_PRIME), NUM_PERM, dtype=np.uint64)
+_WORD = re.compile(r'\w+')
+
+
+def sample_text(path: str, content_type: str, data: Optional[bytes] = None) -> str:
+    """Cheap text sample without OCR: PDF text layer of a few pages, DOCX or plain text
+
+    ``data`` is the file's content when it is already in memory.
+    """
+    try:
+        if content_type == 'application/pdf':
+            with open_pdf(path, data) as doc:
+                count = len(doc)
+                step = max(1, count // SAMPLE_PAGES)
+                return '\n'.join(doc[i].get_text() for i in range(0, count, step)[:SAMPLE_PAGES])[:SAMPLE_CHARS]
+        if content_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
+            source = io.BytesIO(data) if data is not None else path
+            return '\n'.join(p.text for p in Document(source).paragraphs)[:SAMPLE_CHARS]
+        if content_type == 'text/plain':
+            if data is not None:
+                return data[:SAMPLE_CHARS * 4].decode('utf-8', errors='ignore')[:SAMPLE_CHARS]
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                return f.read(SAMPLE_CHARS)
+    except Exception as e:
+        logger.warning(f"Could not sample text from {path}: {e}")
+    return ""
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """MinHash signature of a text's word shingles, or None if it is too short to compare"""
+    words = _WORD.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None
+    shingles = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME).min(axis=1)
+
+
+class DuplicateDetector:
+    """Incremental exact and near-duplicate matching over a bundle's inputs.
+
+    Files are checked in order and matched against earlier ones. Exact copies
+    share a content hash. Near-duplicates are found through MinHash LSH
+    buckets and confirmed by estimated Jaccard similarity. Inputs with a text
+    layer are compared on sampled text before any processing; inputs without
+    one (scans) can only be compared once their text has been extracted, via
+    check_text(). Matches are ``{'index', 'match', 'similarity'}`` dicts that
+    name the canonical copy.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, near: bool = True):
+        self.threshold = threshold
+        self.near = near
+        self._rows = NUM_PERM // BANDS
+        self._by_hash: Dict[str, tuple] = {}
+        self._buckets: Dict[tuple, List[int]] = {}
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._pending_text: set = set()
+
+    def check(self, index: int, path: str, content_type: str, content_hash: str,
+              data: Optional[bytes] = None) -> Optional[Dict[str, Any]]:
+        """Match a file before processing; without near matching no file is read"""
+        seen = self._by_hash.get(content_hash)
+        if seen is not None:
+            first, first_match = seen
+            # A copy of a near-duplicate points at the same canonical copy
+            return first_match or {'index': first, 'match': 'exact', 'similarity': 1.0}
+
+        match = None
+        if self.near:
+            signature = minhash(sample_text(path, content_type, data))
+            if signature is None:
+                self._pending_text.add(index)
+            else:
+                match = self._match_signature(index, signature)
+        self._by_hash[content_hash] = (index, match)
+        return match
+
+    def needs_text(self, index: int) -> bool:
+        """Whether a file had no usable text before processing"""
+        return index in self._pending_text
+
+    def check_text(self, index: int, text: str, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Match a file on its extracted text, e.g. OCR output of a scan"""
+        self._pending_text.discard(index)
+        signature = minhash(text)
+        if signature is None:
+            return None
+        match = self._match_signature(index, signature)
+        if match is not None:
+            self._by_hash[content_hash] = (index, match)
+        return match
+
+    def _match_signature(self, index: int, signature: np.ndarray) -> Optional[Dict[str, Any]]:
+        rows = self._rows
+        keys = [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(BANDS)]
+        match = None
+        for j in sorted({j for key in keys for j in self._buckets.get(key, [])}):
+            similarity = float(np.mean(signature == self._signatures[j]))
+            if similarity >= self.threshold and (match is None or similarity > match['similarity']):
+                match = {'index': j, 'match': 'near', 'similarity': round(similarity, 3)}
+        if match is None:
+            self._signatures[index] = signature
+            for key in keys:
+                self._buckets.setdefault(key, []).append(index)
+        return match
@@ -0,0 +1,92 @@
+import os
+import hashlib
+from typing import Dict, Optional
+import fitz  # PyMuPDF
+
+
+def open_pdf(path: str, data: Optional[bytes] = None) -> fitz.Document:
+    """Open a PDF from its bytes when they are in memory, else from disk"""
+    if data is not None:
+        return fitz.open(stream=data, filetype='pdf')
+    return fitz.open(path)
+
+
+class DocumentBuffers:
+    """In-memory copies of one bundle's small documents, keyed by work-directory path.
+
+    Small uploads, converted documents and the generated cover and TOC are
+    kept here while the bundle is built, so sampling, extraction, page
+    counting and the merge open them with ``fitz.open(stream=...)`` instead
+    of rereading the file each time. Generated PDFs are built in memory and
+    ``write()`` saves them once without reading them back: page previews,
+    volume compilers and resumed builds open parts from the work directory.
+    Intermediate files only the build reads, such as OCR text layers, are
+    ``put()`` here without touching disk. Documents over ``max_file_bytes``,
+    or past the bundle's ``max_total_bytes``, are only on disk.
+    """
+
+    def __init__(self, max_file_bytes: int, max_total_bytes: int):
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.total_bytes = 0
+        self._data: Dict[str, bytes] = {}
+        self._page_counts: Dict[str, int] = {}
+
+    def accepts(self, size: int) -> bool:
+        return size <= self.max_file_bytes and self.total_bytes + size <= self.max_total_bytes
+
+    @property
+    def file_limit(self) -> int:
+        """Largest document that would still be kept"""
+        return max(0, min(self.max_file_bytes, self.max_total_bytes - self.total_bytes))
+
+    def put(self, path: str, data: bytes) -> bool:
+        """Keep a document's bytes if they fit; returns whether they were kept"""
+        if path in self._data or not self.accepts(len(data)):
+            return path in self._data
+        self._data[path] = data
+        self.total_bytes += len(data)
+        return True
+
+    def write(self, path: str, data: bytes) -> str:
+        """Save a generated document to path and keep its bytes if they fit"""
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.put(path, data)
+        return path
+
+    def discard(self, path: str) -> None:
+        """Forget a document once nothing will read it again"""
+        data = self._data.pop(path, None)
+        if data is not None:
+            self.total_bytes -= len(data)
+        self._page_counts.pop(path, None)
+
+    def get(self, path: str) -> Optional[bytes]:
+        return self._data.get(path)
+
+    def open_pdf(self, path: str) -> fitz.Document:
+        return open_pdf(path, self._data.get(path))
+
+    def exists(self, path: str) -> bool:
+        return path in self._data or os.path.exists(path)
+
+    def size(self, path: str) -> int:
+        data = self._data.get(path)
+        return len(data) if data is not None else os.path.getsize(path)
+
+    def page_count(self, path: str) -> int:
+        """Page count of a PDF, counted once per path"""
+        count = self._page_counts.get(path)
+        if count is None:
+            with self.open_pdf(path) as doc:
+                count = self._page_counts[path] = len(doc)
+        return count
+
+    def content_hash(self, path: str) -> Optional[str]:
+        """SHA-256 of a kept document, or None when it is only on disk"""
+        data = self._data.get(path)
+        return hashlib.sha256(data).hexdigest() if data is not None else None
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._data
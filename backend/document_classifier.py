@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import normalize
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ('invoice', 'contract', 'legal_brief', 'email', 'report', 'receipt', 'certificate', 'other')
+
+# Only the start of a document is vectorized, so inference cost does not grow with document size
+MAX_CLASSIFY_CHARS = 20000
+DEFAULT_FEATURES = 2 ** 18
+
+# Keyword rules in priority order; the first category with a matching word wins
+KEYWORD_RULES = (
+    ('invoice', ('invoice', 'bill', 'payment', 'amount due')),
+    ('contract', ('contract', 'agreement', 'terms', 'conditions')),
+    ('legal_brief', ('legal', 'court', 'judgment', 'brief')),
+    ('email', ('email', 'sent', 'received', '@')),
+    ('report', ('report', 'analysis', 'findings')),
+    ('receipt', ('receipt', 'purchase', 'transaction')),
+    ('certificate', ('certificate', 'certified', 'award')),
+)
+
+Prediction = Tuple[str, Optional[float]]
+
+
+class RuleClassifier:
+    """Keyword rules; used when no trained model is available. Reports no confidence."""
+
+    name = 'rules'
+
+    def predict(self, texts: Sequence[str]) -> List[Prediction]:
+        return [(self.classify(text), None) for text in texts]
+
+    @staticmethod
+    def classify(text: str) -> str:
+        text_lower = text.lower()
+        for category, words in KEYWORD_RULES:
+            if any(word in text_lower for word in words):
+                return category
+        return 'other'
+
+
+class LinearDocumentClassifier:
+    """Multinomial logistic regression over hashed word and bigram features.
+
+    Feature hashing needs no stored vocabulary, so the model file is just the
+    IDF weights and the coefficient matrix, saved as plain numpy arrays (no
+    pickle) that load in milliseconds. Inference vectorizes a whole batch into
+    one sparse matrix and scores it with a single matrix product.
+    """
+
+    name = 'linear'
+
+    def __init__(self, coef: np.ndarray, intercept: np.ndarray, classes: Sequence[str], idf: np.ndarray,
+                 ngram_max: int = 2, info: Optional[Dict[str, Any]] = None):
+        self.coef = coef.astype(np.float32)
+        self.intercept = intercept.astype(np.float32)
+        self.classes = [str(c) for c in classes]
+        self.idf = idf.astype(np.float32)
+        self.ngram_max = ngram_max
+        self.info = info or {}
+        self.vectorizer = make_vectorizer(len(idf), ngram_max)
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], n_features: int = DEFAULT_FEATURES,
+              ngram_max: int = 2, c: float = 10.0) -> 'LinearDocumentClassifier':
+        """Fit on labelled texts; needs at least two distinct labels"""
+        start = time.perf_counter()
+        vectorizer = make_vectorizer(n_features, ngram_max)
+        counts = vectorizer.transform([text[:MAX_CLASSIFY_CHARS] for text in texts]).tocsc()
+        doc_freq = np.diff(counts.indptr)
+        idf = (np.log((1 + len(texts)) / (1 + doc_freq)) + 1).astype(np.float32)
+        features = weight_features(counts.tocsr(), idf)
+
+        model = LogisticRegression(C=c, max_iter=1000)
+        model.fit(features, list(labels))
+        coef, intercept = model.coef_, model.intercept_
+        if len(model.classes_) == 2:
+            # Binary models have one row; split it so softmax over both rows gives the same sigmoid
+            coef = np.vstack([-coef[0], coef[0]]) / 2
+            intercept = np.array([-intercept[0], intercept[0]]) / 2
+        info = {
+            'trained_at': datetime.now().isoformat(),
+            'documents': len(texts),
+            'n_features': n_features,
+            'train_seconds': round(time.perf_counter() - start, 2)
+        }
+        return cls(coef, intercept, model.classes_, idf, ngram_max, info)
+
+    @classmethod
+    def load(cls, path: str) -> 'LinearDocumentClassifier':
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['coef'], data['intercept'], data['classes'], data['idf'],
+                       int(data['ngram_max']), json.loads(str(data['info'])))
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, coef=self.coef, intercept=self.intercept, classes=np.array(self.classes),
+                 idf=self.idf, ngram_max=np.array(self.ngram_max), info=np.array(json.dumps(self.info)))
+        os.replace(tmp_path, path)
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """Class probabilities, one row per text, columns in self.classes order"""
+        counts = self.vectorizer.transform([text[:MAX_CLASSIFY_CHARS] for text in texts])
+        scores = np.asarray(weight_features(counts, self.idf) @ self.coef.T) + self.intercept
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        scores /= scores.sum(axis=1, keepdims=True)
+        return scores
+
+    def predict(self, texts: Sequence[str]) -> List[Prediction]:
+        if not texts:
+            return []
+        probabilities = self.predict_proba(texts)
+        best = probabilities.argmax(axis=1)
+        return [(self.classes[i], float(probabilities[row, i])) for row, i in enumerate(best)]
+
+
+def make_vectorizer(n_features: int, ngram_max: int) -> HashingVectorizer:
+    return HashingVectorizer(n_features=n_features, ngram_range=(1, ngram_max), alternate_sign=False,
+                             norm=None, dtype=np.float32)
+
+
+def weight_features(counts, idf: np.ndarray):
+    """Sublinear TF-IDF with L2 row normalisation, kept sparse"""
+    counts = counts.tocsr(copy=True)
+    np.log1p(counts.data, out=counts.data)
+    counts.data *= idf[counts.indices]
+    return normalize(counts, copy=False)
+
+
+def load_classifier(path: str) -> Optional[LinearDocumentClassifier]:
+    """Load a trained model, or None (with a log line) when it is missing or unreadable"""
+    if not path or not os.path.exists(path):
+        logger.info(f"No classifier model at {path}; using keyword rules")
+        return None
+    try:
+        start = time.perf_counter()
+        model = LinearDocumentClassifier.load(path)
+        logger.info(f"Loaded classifier model {path} ({len(model.classes)} classes) "
+                    f"in {(time.perf_counter() - start) * 1000:.0f}ms")
+        return model
+    except Exception as e:
+        logger.error(f"Could not load classifier model {path}: {e}; using keyword rules")
+        return None
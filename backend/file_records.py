@@ -0,0 +1,91 @@
+import os
+import logging
+from typing import Iterator, List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+TEXT_DIR = "text"
+
+
+class FileRecord:
+    """Compact result of processing one file for a bundle.
+
+    Holds the document metadata as slots rather than a dict per file and
+    keeps the extracted text on disk, loading it only when ``text`` is read,
+    so a batch of thousands of files does not keep every document's text
+    alive until the bundle is finished.
+    """
+
+    __slots__ = ('id', 'filename', 'file_type', 'classification', 'summary', 'citations',
+                 'sensitive_data', 'page_count', 'content_hash', 'size', 'uploaded_at',
+                 'duplicate_of', 'pdf_path', 'text_path')
+
+    FIELDS = ('id', 'filename', 'file_type', 'classification', 'summary', 'citations',
+              'sensitive_data', 'page_count', 'content_hash', 'size', 'uploaded_at', 'duplicate_of')
+
+    def __init__(self, pdf_path: str, text_path: Optional[str] = None, **metadata):
+        for field in self.FIELDS:
+            setattr(self, field, metadata.get(field))
+        self.pdf_path = pdf_path
+        self.text_path = text_path
+
+    @classmethod
+    def from_result(cls, result: Dict[str, Any], text_path: Optional[str] = None) -> 'FileRecord':
+        """Build a record from a stored ``{'metadata', 'pdf_path'}`` result"""
+        return cls(result['pdf_path'], text_path, **result['metadata'])
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata as a DocumentMetadata-shaped dict"""
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def to_result(self) -> Dict[str, Any]:
+        return {'metadata': self.metadata, 'pdf_path': self.pdf_path}
+
+    @property
+    def text(self) -> str:
+        """Extracted text, read from disk on demand"""
+        if not self.text_path:
+            return ""
+        try:
+            with open(self.text_path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return ""
+
+
+def spill_text(work_dir: str, file_id: str, text_content: str) -> str:
+    """Write extracted text below the work directory and return its path"""
+    text_dir = os.path.join(work_dir, TEXT_DIR)
+    os.makedirs(text_dir, exist_ok=True)
+    text_path = os.path.join(text_dir, f"{file_id}.txt")
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write(text_content)
+    return text_path
+
+
+class FileBatch:
+    """Ordered file records of one bundle with totals maintained as records are added"""
+
+    def __init__(self, records: Optional[List[FileRecord]] = None):
+        self.records: List[FileRecord] = []
+        self.total_pages = 0
+        self.classification_counts: Dict[str, int] = {}
+        for record in records or []:
+            self.add(record)
+
+    def add(self, record: FileRecord) -> None:
+        self.records.append(record)
+        self.total_pages += record.page_count or 0
+        self.classification_counts[record.classification] = self.classification_counts.get(record.classification, 0) + 1
+
+    def most_common_classification(self) -> Optional[str]:
+        if not self.classification_counts:
+            return None
+        return max(self.classification_counts, key=self.classification_counts.get)
+
+    def __iter__(self) -> Iterator[FileRecord]:
+        return iter(self.records)
+
+    def __len__(self) -> int:
+        return len(self.records)
@@ -0,0 +1,159 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import threading
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+RECORD_FILE = "record.json"
+RESULT_FILE = "result.json"
+TEXT_FILE = "text.txt"
+
+
+class FileStore:
+    """Session-scoped store for uploaded files and their processed results.
+
+    Each file lives in its own directory ``<base_dir>/<file_id>/`` holding the
+    original upload, any converted PDF and JSON sidecars, so a file is
+    uploaded and analysed once and then referenced by id from bundle builds.
+    """
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        os.makedirs(base_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._sessions: Dict[str, List[str]] = {}
+
+    def file_dir(self, file_id: str) -> str:
+        """Directory for a file id; rejects ids that are not UUIDs"""
+        try:
+            uuid.UUID(file_id)
+        except (ValueError, TypeError):
+            raise KeyError(file_id)
+        return os.path.join(self.base_dir, file_id)
+
+    def save_upload(self, session_id: str, filename: str, content_type: str, content: bytes) -> Dict[str, Any]:
+        """Persist an upload and return its record"""
+        upload = self.new_upload(filename)
+        with open(upload['path'], 'wb') as f:
+            f.write(content)
+        return self.add_upload(session_id, upload, content_type, len(content), hashlib.sha256(content).hexdigest())
+
+    def new_upload(self, filename: str) -> Dict[str, str]:
+        """Create the directory for a new file; the caller writes it to the returned path"""
+        file_id = str(uuid.uuid4())
+        file_dir = self.file_dir(file_id)
+        os.makedirs(file_dir, exist_ok=True)
+        safe_name = os.path.basename(filename or "") or f"{file_id}.pdf"
+        return {'file_id': file_id, 'filename': safe_name, 'path': os.path.join(file_dir, safe_name)}
+
+    def add_upload(self, session_id: str, upload: Dict[str, str], content_type: str, size: int,
+                   content_hash: str) -> Dict[str, Any]:
+        """Record a file written to the path from new_upload() and return its record"""
+        file_id = upload['file_id']
+        record = {
+            'file_id': file_id,
+            'session_id': session_id,
+            'filename': upload['filename'],
+            'content_type': content_type,
+            'path': upload['path'],
+            'size': size,
+            'content_hash': content_hash,
+            'uploaded_at': datetime.now().isoformat()
+        }
+        self._write_json(file_id, RECORD_FILE, record)
+        with self._lock:
+            self._records[file_id] = record
+            self._sessions.setdefault(session_id, []).append(file_id)
+        return record
+
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Return a file record, loading it from disk after a restart"""
+        with self._lock:
+            record = self._records.get(file_id)
+        if record is not None and not os.path.exists(record['path']):
+            # Evicted by the work directory sweeper, which may run in another worker
+            self._forget(file_id, record)
+            return None
+        if record is None:
+            record = self._read_json(file_id, RECORD_FILE)
+            if record is not None:
+                with self._lock:
+                    self._records[file_id] = record
+        return record
+
+    def set_result(self, file_id: str, result: Dict[str, Any], text_content: Optional[str] = None) -> None:
+        """Store the processed result (metadata and pdf_path) and extracted text"""
+        self._write_json(file_id, RESULT_FILE, result)
+        if text_content is not None:
+            with open(os.path.join(self.file_dir(file_id), TEXT_FILE), 'w', encoding='utf-8') as f:
+                f.write(text_content)
+        with self._lock:
+            self._results[file_id] = result
+
+    def get_result(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Return the processed result for a file, or None if not processed"""
+        with self._lock:
+            result = self._results.get(file_id)
+        if result is None:
+            result = self._read_json(file_id, RESULT_FILE)
+            if result is not None:
+                with self._lock:
+                    self._results[file_id] = result
+        return result
+
+    def text_path(self, file_id: str) -> str:
+        """Path of the extracted text saved alongside the result"""
+        return os.path.join(self.file_dir(file_id), TEXT_FILE)
+
+    def get_text(self, file_id: str) -> str:
+        """Return the extracted text saved alongside the result"""
+        try:
+            with open(self.text_path(file_id), 'r', encoding='utf-8') as f:
+                return f.read()
+        except (OSError, KeyError):
+            return ""
+
+    def session_files(self, session_id: str) -> List[Dict[str, Any]]:
+        """Records for every file uploaded in a session during this process lifetime"""
+        with self._lock:
+            file_ids = list(self._sessions.get(session_id, []))
+        return [r for r in (self.get(fid) for fid in file_ids) if r is not None]
+
+    def delete(self, file_id: str) -> bool:
+        """Remove a file and its derived artefacts"""
+        record = self.get(file_id)
+        if record is None:
+            return False
+        self._forget(file_id, record)
+        shutil.rmtree(self.file_dir(file_id), ignore_errors=True)
+        return True
+
+    def _forget(self, file_id: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._records.pop(file_id, None)
+            self._results.pop(file_id, None)
+            session = self._sessions.get(record.get('session_id'), [])
+            if file_id in session:
+                session.remove(file_id)
+
+    def _write_json(self, file_id: str, name: str, data: Dict[str, Any]) -> None:
+        path = os.path.join(self.file_dir(file_id), name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, path)
+
+    def _read_json(self, file_id: str, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.file_dir(file_id), name), 'r') as f:
+                return json.load(f)
+        except (OSError, KeyError, ValueError):
+            return None
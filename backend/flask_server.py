@@ -5,6 +5,7 @@ import uuid
 import tempfile
 import json
 from datetime import datetime
+from bundle_catalog import create_catalog
 
 app = Flask(__name__)
 CORS(app)
@@ -14,6 +15,9 @@ TMP = tempfile.gettempdir()
 UPLOAD_DIR = os.path.join(TMP, "smart_pdf_bundler")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Persistent bundle catalog (SQLite by default, see BUNDLE_CATALOG_URL)
+catalog = create_catalog(default_dir=UPLOAD_DIR)
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -110,6 +114,22 @@ def create_bundle():
             "status": "completed"
         }
         
+        catalog.record_bundle({
+            "id": bundle_id,
+            "name": cover_data.get("title") or None,
+            "theme": theme,
+            "status": "completed",
+            "cover_info": cover_data,
+            "created_at": bundle_info["created_at"]
+        }, [
+            {
+                "id": f["id"],
+                "filename": f["original_name"] or f["filename"],
+                "size": f["size"]
+            }
+            for f in processed_files
+        ])
+        
         return jsonify({
             "success": True,
             "bundle_id": bundle_id,
@@ -122,21 +142,19 @@ def create_bundle():
 
 @app.route('/api/bundles', methods=['GET'])
 def list_bundles():
-    """List all created bundles"""
+    """List created bundles, newest first, with cursor pagination"""
     try:
-        # This would normally query a database
-        # For now, return a sample response
-        return jsonify({
-            "bundles": [
-                {
-                    "id": "sample-bundle-1",
-                    "name": "Sample Bundle",
-                    "file_count": 3,
-                    "created_at": datetime.now().isoformat(),
-                    "status": "completed"
-                }
-            ]
-        })
+        limit = request.args.get('limit', 50, type=int)
+        try:
+            page = catalog.list_bundles(
+                limit=limit,
+                cursor=request.args.get('cursor'),
+                status=request.args.get('status'),
+                query=request.args.get('q')
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(page)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -0,0 +1,305 @@
+import io
+import abc
+import os
+import logging
+import mimetypes
+from typing import Dict, List, Optional, Tuple
+import fitz  # PyMuPDF
+import magic
+import numpy as np
+import pytesseract
+from PIL import Image, ImageSequence
+from docx import Document
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from xml.sax.saxutils import escape
+from ocr_preprocess import preprocess_for_ocr, infer_dpi
+from document_buffers import DocumentBuffers, open_pdf
+from search_index import PAGE_SEPARATOR
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+    HEIF_SUPPORTED = True
+except ImportError:
+    HEIF_SUPPORTED = False
+
+PDF = 'application/pdf'
+DOCX = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+TEXT = 'text/plain'
+# Sniffed types too vague to act on; the declared type or extension decides instead
+GENERIC_TYPES = ('application/octet-stream', 'application/zip', 'application/x-empty', 'inode/x-empty')
+SNIFF_BYTES = 8192
+# Image formats PDF can embed without re-encoding
+EMBEDDABLE_FORMATS = ('JPEG', 'PNG')
+# Metadata DPI giving a page wider than this is ignored (phone photos say 72)
+MAX_PAGE_INCHES = 17.0
+
+
+def sniff_mime(filename: str, content: bytes, declared: Optional[str] = None) -> str:
+    """Content type from the file's leading bytes, falling back to the declared type or extension"""
+    try:
+        sniffed = magic.from_buffer(content[:SNIFF_BYTES], mime=True)
+    except Exception as e:
+        logger.warning(f"Could not sniff type of {filename}: {e}")
+        sniffed = None
+    if sniffed and sniffed not in GENERIC_TYPES:
+        return sniffed
+    guessed, _ = mimetypes.guess_type(filename)
+    if sniffed == 'application/zip' and DOCX in (declared, guessed):
+        return DOCX
+    return declared or guessed or sniffed or 'application/octet-stream'
+
+
+def output_path(path: str, suffix: str, file_id: Optional[str] = None) -> str:
+    """Path of a file derived from an input, next to it and named by file_id when given
+
+    The full input name is used otherwise, so inputs sharing a stem (scan.png
+    and scan.tiff) never write to the same file.
+    """
+    return os.path.join(os.path.dirname(path), f"{file_id or os.path.basename(path)}{suffix}")
+
+
+def converted_path(path: str, file_id: Optional[str] = None) -> str:
+    return output_path(path, '_converted.pdf', file_id)
+
+
+def save_pdf(path: str, data: bytes, buffers: Optional[DocumentBuffers] = None) -> str:
+    """Write a generated PDF, keeping its bytes in buffers when given"""
+    return (buffers if buffers is not None else DocumentBuffers(0, 0)).write(path, data)
+
+
+class FormatHandler(abc.ABC):
+    """Text extraction and PDF conversion for one family of content types
+
+    ``data``, when given, is the file's content already in memory and is
+    read instead of ``path``. Converted PDFs are built in memory and written
+    next to it, named by ``file_id``; with ``buffers`` their bytes are kept
+    there so the build never reads them back from disk.
+    """
+
+    mime_types: Tuple[str, ...] = ()
+    # Whether to_pdf() needs the extracted text (otherwise it may be skipped)
+    text_required_for_pdf = True
+
+    def extract_text(self, path: str, data: Optional[bytes] = None, file_id: Optional[str] = None,
+                     buffers: Optional[DocumentBuffers] = None) -> str:
+        return ""
+
+    @abc.abstractmethod
+    def to_pdf(self, path: str, text_content: str, data: Optional[bytes] = None,
+               file_id: Optional[str] = None, buffers: Optional[DocumentBuffers] = None) -> str:
+        """Convert to PDF and return its path"""
+
+
+class PDFHandler(FormatHandler):
+    mime_types = (PDF,)
+    text_required_for_pdf = False
+
+    def extract_text(self, path: str, data: Optional[bytes] = None, file_id: Optional[str] = None,
+                     buffers: Optional[DocumentBuffers] = None) -> str:
+        try:
+            with open_pdf(path, data) as doc:
+                return PAGE_SEPARATOR.join(page.get_text() for page in doc)
+        except Exception as e:
+            logger.error(f"PDF extraction failed: {e}")
+            return ""
+
+    def to_pdf(self, path: str, text_content: str, data: Optional[bytes] = None,
+               file_id: Optional[str] = None, buffers: Optional[DocumentBuffers] = None) -> str:
+        return path
+
+
+class TextDocumentHandler(FormatHandler):
+    """Formats with no layout worth keeping, typeset as a plain ReportLab document"""
+
+    def __init__(self):
+        self.styles = getSampleStyleSheet()
+
+    def to_pdf(self, path: str, text_content: str, data: Optional[bytes] = None,
+               file_id: Optional[str] = None, buffers: Optional[DocumentBuffers] = None) -> str:
+        output = io.BytesIO()
+        doc = SimpleDocTemplate(output, pagesize=A4)
+        story = [
+            Paragraph(escape(f"Document: {os.path.basename(path)}"), self.styles['Heading1']),
+            Spacer(1, 20)
+        ]
+        if text_content.strip():
+            for paragraph in text_content.split('\n\n'):
+                if paragraph.strip():
+                    story.append(Paragraph(escape(paragraph).replace('\n', '<br/>'), self.styles['Normal']))
+        else:
+            story.append(Paragraph("No text content extracted.", self.styles['Normal']))
+        doc.build(story)
+        return save_pdf(converted_path(path, file_id), output.getvalue(), buffers)
+
+
+class DocxHandler(TextDocumentHandler):
+    mime_types = (DOCX,)
+
+    def extract_text(self, path: str, data: Optional[bytes] = None, file_id: Optional[str] = None,
+                     buffers: Optional[DocumentBuffers] = None) -> str:
+        try:
+            source = io.BytesIO(data) if data is not None else path
+            return '\n'.join(paragraph.text for paragraph in Document(source).paragraphs)
+        except Exception as e:
+            logger.error(f"DOCX extraction failed: {e}")
+            return ""
+
+
+class PlainTextHandler(TextDocumentHandler):
+    mime_types = (TEXT,)
+
+    def extract_text(self, path: str, data: Optional[bytes] = None, file_id: Optional[str] = None,
+                     buffers: Optional[DocumentBuffers] = None) -> str:
+        try:
+            if data is not None:
+                return data.decode('utf-8')
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except Exception as e:
+            logger.error(f"TXT extraction failed: {e}")
+            return ""
+
+
+class ImageHandler(FormatHandler):
+    """Images become PDF pages that embed the original pixels.
+
+    Every frame (multi-page TIFF, HEIC sequences) becomes one page sized from
+    its DPI. OCR asks Tesseract for a text-only PDF per frame, which is kept
+    in buffers (or next to the image when it does not fit) and laid over the
+    pages as an invisible text layer, so the bundle stays searchable without
+    re-rendering the image as text.
+    JPEG and PNG files are embedded byte for byte; other formats are
+    re-encoded losslessly as PNG.
+    """
+
+    mime_types = ('image/jpeg', 'image/png', 'image/tiff', 'image/heic', 'image/heif', 'image/bmp',
+                  'image/gif', 'image/webp')
+    text_required_for_pdf = False
+
+    def __init__(self, ocr_mode: str = 'auto'):
+        self.ocr_mode = ocr_mode
+
+    @staticmethod
+    def text_layer_path(path: str, file_id: Optional[str] = None) -> str:
+        return output_path(path, '_ocr.pdf', file_id)
+
+    def extract_text(self, path: str, data: Optional[bytes] = None, file_id: Optional[str] = None,
+                     buffers: Optional[DocumentBuffers] = None) -> str:
+        """OCR every frame, keeping the text-only PDF Tesseract produces as the text layer"""
+        texts = []
+        try:
+            with Image.open(io.BytesIO(data) if data is not None else path) as img, fitz.open() as layer:
+                for frame in ImageSequence.Iterator(img):
+                    dpi = self._frame_dpi(frame, img.info.get('dpi'))
+                    layer_pdf = self._ocr_frame(frame, dpi, path)
+                    with fitz.open('pdf', layer_pdf) as frame_layer:
+                        texts.append(''.join(page.get_text() for page in frame_layer))
+                        layer.insert_pdf(frame_layer, to_page=0)
+                layer_data = layer.tobytes(garbage=3, deflate=True)
+            layer_path = self.text_layer_path(path, file_id)
+            # Only to_pdf() reads the layer, so it need not reach disk when it fits in memory
+            if buffers is None or not buffers.put(layer_path, layer_data):
+                with open(layer_path, 'wb') as f:
+                    f.write(layer_data)
+        except Exception as e:
+            logger.error(f"OCR failed for {path}: {e}")
+            return ""
+        return PAGE_SEPARATOR.join(texts)
+
+    def _ocr_frame(self, frame: Image.Image, dpi: float, path: str) -> bytes:
+        gray = np.asarray(frame.convert('L'))
+        processed, info = preprocess_for_ocr(gray, self.ocr_mode, dpi)
+        logger.debug(f"OCR preprocessing for {path}: {info}")
+        layer_pdf = b''
+        # Retry with automatic page segmentation when a single block finds nothing
+        for psm in (6, 3):
+            layer_pdf = pytesseract.image_to_pdf_or_hocr(
+                processed, extension='pdf', config=f"--psm {psm} --dpi {info['dpi']} -c textonly_pdf=1"
+            )
+            with fitz.open('pdf', layer_pdf) as frame_layer:
+                if any(page.get_text().strip() for page in frame_layer):
+                    break
+        return layer_pdf
+
+    def to_pdf(self, path: str, text_content: str, data: Optional[bytes] = None,
+               file_id: Optional[str] = None, buffers: Optional[DocumentBuffers] = None) -> str:
+        layer_path = self.text_layer_path(path, file_id)
+        layer_data = buffers.get(layer_path) if buffers is not None else None
+        layer = open_pdf(layer_path, layer_data) if layer_data is not None or os.path.exists(layer_path) else None
+        try:
+            with fitz.open() as doc:
+                for index, (frame_data, width, height, dpi) in enumerate(self._frames(path, data)):
+                    page = doc.new_page(width=width * 72 / dpi, height=height * 72 / dpi)
+                    page.insert_image(page.rect, stream=frame_data)
+                    if layer is not None and index < len(layer):
+                        page.show_pdf_page(page.rect, layer, index)
+                pdf_data = doc.tobytes(garbage=3, deflate=True)
+        finally:
+            if layer is not None:
+                layer.close()
+        if buffers is not None:
+            buffers.discard(layer_path)
+        return save_pdf(converted_path(path, file_id), pdf_data, buffers)
+
+    def _frames(self, path: str, data: Optional[bytes] = None) -> List[Tuple[bytes, int, int, float]]:
+        with Image.open(io.BytesIO(data) if data is not None else path) as img:
+            if img.format in EMBEDDABLE_FORMATS and getattr(img, 'n_frames', 1) == 1:
+                if data is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                return [(data, img.width, img.height, self._frame_dpi(img, img.info.get('dpi')))]
+            frames = []
+            for frame in ImageSequence.Iterator(img):
+                if frame.mode not in ('1', 'L', 'RGB', 'RGBA'):
+                    frame = frame.convert('RGBA' if 'A' in frame.mode else 'RGB')
+                buffer = io.BytesIO()
+                frame.save(buffer, 'PNG')
+                frames.append((buffer.getvalue(), frame.width, frame.height,
+                               self._frame_dpi(frame, img.info.get('dpi'))))
+            return frames
+
+    @staticmethod
+    def _frame_dpi(frame: Image.Image, image_dpi) -> float:
+        dpi_info = frame.info.get('dpi') or image_dpi
+        dpi = infer_dpi(frame.width, float(dpi_info[0]) if dpi_info else None)
+        if frame.width / dpi > MAX_PAGE_INCHES:
+            dpi = infer_dpi(frame.width)
+        return dpi
+
+
+class UnsupportedHandler(TextDocumentHandler):
+    """Anything else: a placeholder page naming the file"""
+
+    def to_pdf(self, path: str, text_content: str, data: Optional[bytes] = None,
+               file_id: Optional[str] = None, buffers: Optional[DocumentBuffers] = None) -> str:
+        return super().to_pdf(path, "", file_id=file_id, buffers=buffers)
+
+
+class FormatRegistry:
+    """Maps sniffed content types to handlers; ``image/*`` falls back to the image handler"""
+
+    def __init__(self, fallback: FormatHandler):
+        self.fallback = fallback
+        self._handlers: Dict[str, FormatHandler] = {}
+
+    def register(self, handler: FormatHandler) -> None:
+        for mime_type in handler.mime_types:
+            self._handlers[mime_type] = handler
+
+    def handler_for(self, mime_type: str) -> FormatHandler:
+        handler = self._handlers.get(mime_type)
+        if handler is None and mime_type.startswith('image/'):
+            handler = self._handlers.get('image/png')
+        return handler or self.fallback
+
+    @classmethod
+    def default(cls, ocr_mode: str = 'auto') -> 'FormatRegistry':
+        registry = cls(UnsupportedHandler())
+        for handler in (PDFHandler(), DocxHandler(), PlainTextHandler(), ImageHandler(ocr_mode)):
+            registry.register(handler)
+        return registry
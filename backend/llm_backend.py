@@ -0,0 +1,236 @@
+import abc
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Seconds to skip the model server after a failed request, so a dead server costs one timeout, not one per document
+RETRY_AFTER_SECONDS = 30.0
+
+CLASSIFY_PROMPT = """Classify each numbered document into exactly one of these categories: {categories}.
+Reply with a JSON object {{"labels": [...]}} holding one category per document, in order.
+
+{documents}"""
+
+SUMMARIZE_PROMPT = """Summarize the following document in at most two sentences. Reply with the summary only.
+
+{text}"""
+
+
+class LLMBackend(abc.ABC):
+    """Classification and summaries from a model server, shared by every request of a worker.
+
+    Requests go through one pooled ``httpx.AsyncClient`` with at most
+    ``max_concurrency`` in flight. Classifications arriving within
+    ``batch_wait_ms`` of each other are sent as one prompt of up to
+    ``batch_size`` documents. Answers are cached by a hash of the task,
+    model and truncated text, and concurrent requests for the same text
+    share one call, so repeated documents cost nothing after the first.
+    Failures, timeouts and unusable answers return None for the caller to
+    fall back on; subclasses only implement ``generate``.
+    """
+
+    name = 'llm'
+
+    def __init__(self, base_url: str, model: str, categories: Sequence[str], max_concurrency: int = 4,
+                 batch_size: int = 8, batch_wait_ms: float = 20, timeout: float = 30.0,
+                 cache_entries: int = 10000, max_chars: int = 4000):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.categories = tuple(categories)
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait_ms / 1000
+        self.timeout = timeout
+        self.cache_entries = cache_entries
+        self.max_chars = max_chars
+        self._cache: 'OrderedDict[str, str]' = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._down_until = 0.0
+        self.stats = {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'model_calls': 0, 'failures': 0}
+
+    @abc.abstractmethod
+    async def generate(self, client: httpx.AsyncClient, prompt: str, json_output: bool) -> str:
+        """Send one prompt and return the model's text"""
+
+    async def classify(self, text: str) -> Optional[str]:
+        return (await self.classify_many([text]))[0]
+
+    async def classify_many(self, texts: Sequence[str]) -> List[Optional[str]]:
+        """Category per text, or None where the model gave no usable answer"""
+        self._session()
+        futures = []
+        for text in texts:
+            key, hit, future = self._lookup('classify', text)
+            if hit is not None or future is not None:
+                futures.append(hit if future is None else future)
+                continue
+            future = self._inflight[key] = asyncio.get_running_loop().create_future()
+            self._pending.append((key, text[:self.max_chars], future))
+            futures.append(future)
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+            elif self._flush_timer is None:
+                self._flush_timer = asyncio.get_running_loop().call_later(self.batch_wait, self._flush)
+        return [item if not isinstance(item, asyncio.Future) else await asyncio.shield(item) for item in futures]
+
+    async def summarize(self, text: str) -> Optional[str]:
+        self._session()
+        key, hit, future = self._lookup('summarize', text)
+        if hit is not None:
+            return hit
+        if future is not None:
+            return await asyncio.shield(future)
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        task = asyncio.ensure_future(self._summarize(key, text[:self.max_chars], future))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return await asyncio.shield(future)
+
+    async def close(self):
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = self._loop = None
+
+    def _session(self) -> httpx.AsyncClient:
+        """The pooled client of the running loop; a new loop (forked worker, batch run) gets its own"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=min(5.0, self.timeout)),
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._inflight: Dict[str, asyncio.Future] = {}
+            self._pending: List[Tuple[str, str, asyncio.Future]] = []
+            self._flush_timer: Optional[asyncio.TimerHandle] = None
+            self._tasks: set = set()
+        return self._client
+
+    def _key(self, task: str, text: str) -> str:
+        return hashlib.sha256(f"{task}\0{self.model}\0{text[:self.max_chars]}".encode('utf-8', 'replace')).hexdigest()
+
+    def _lookup(self, task: str, text: str) -> Tuple[str, Optional[str], Optional[asyncio.Future]]:
+        """(cache key, cached answer, future of an identical request in flight)"""
+        self.stats['requests'] += 1
+        key = self._key(task, text)
+        hit = self._cache.get(key)
+        if hit is not None:
+            self._cache.move_to_end(key)
+            self.stats['cache_hits'] += 1
+            return key, hit, None
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+        return key, None, future
+
+    def _remember(self, key: str, answer: str):
+        self._cache[key] = answer
+        if len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+
+    def _resolve(self, key: str, future: asyncio.Future, answer: Optional[str]):
+        if answer is not None:
+            self._remember(key, answer)
+        self._inflight.pop(key, None)
+        if not future.done():
+            future.set_result(answer)
+
+    def _flush(self):
+        """Send pending classifications as prompts of up to batch_size documents"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self.batch_size):
+            task = asyncio.ensure_future(self._classify_batch(pending[start:start + self.batch_size]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _classify_batch(self, batch: List[Tuple[str, str, asyncio.Future]]):
+        labels: List[Optional[str]] = [None] * len(batch)
+        documents = '\n\n'.join(f"Document {i + 1}:\n{text}" for i, (_, text, _) in enumerate(batch))
+        prompt = CLASSIFY_PROMPT.format(categories=', '.join(self.categories), documents=documents)
+        response = await self._call(prompt, json_output=True)
+        if response is not None:
+            labels = self._parse_labels(response, len(batch))
+        for (key, _, future), label in zip(batch, labels):
+            self._resolve(key, future, label)
+
+    async def _summarize(self, key: str, text: str, future: asyncio.Future):
+        summary = await self._call(SUMMARIZE_PROMPT.format(text=text), json_output=False)
+        self._resolve(key, future, (summary or '').strip() or None)
+
+    async def _call(self, prompt: str, json_output: bool) -> Optional[str]:
+        """One model request under the concurrency limit; None on failure or while the server is down"""
+        if time.monotonic() < self._down_until:
+            return None
+        async with self._semaphore:
+            # Callers queued behind a failure skip the server too
+            if time.monotonic() < self._down_until:
+                return None
+            try:
+                self.stats['model_calls'] += 1
+                return await self.generate(self._client, prompt, json_output)
+            except Exception as e:
+                self.stats['failures'] += 1
+                self._down_until = time.monotonic() + RETRY_AFTER_SECONDS
+                logger.warning(f"Model server request failed ({type(e).__name__}: {e}); "
+                               f"falling back for {RETRY_AFTER_SECONDS:.0f}s")
+                return None
+
+    def _parse_labels(self, response: str, count: int) -> List[Optional[str]]:
+        try:
+            labels = json.loads(response)
+            if isinstance(labels, dict):
+                labels = labels.get('labels')
+            if not isinstance(labels, list):
+                raise ValueError("no label list")
+        except ValueError as e:
+            logger.warning(f"Unusable classification from {self.model}: {e}")
+            return [None] * count
+        normalized = [str(label).strip().lower().replace(' ', '_') for label in labels[:count]]
+        normalized += [None] * (count - len(normalized))
+        return [label if label in self.categories else None for label in normalized]
+
+
+class OllamaBackend(LLMBackend):
+    """Ollama's /api/generate, non-streaming, at temperature 0"""
+
+    async def generate(self, client: httpx.AsyncClient, prompt: str, json_output: bool) -> str:
+        payload: Dict[str, Any] = {
+            'model': self.model,
+            'prompt': prompt,
+            'stream': False,
+            'options': {'temperature': 0}
+        }
+        if json_output:
+            payload['format'] = 'json'
+        response = await client.post('/api/generate', json=payload)
+        response.raise_for_status()
+        return response.json()['response']
+
+
+BACKENDS = {'ollama': OllamaBackend}
+
+
+def create_llm_backend(kind: str, base_url: str, model: str, categories: Sequence[str],
+                       **options) -> Optional[LLMBackend]:
+    """Backend for a model server URL, or None when no URL is configured"""
+    if not base_url:
+        return None
+    backend = BACKENDS.get(kind)
+    if backend is None:
+        raise ValueError(f"Unsupported LLM backend: {kind}")
+    logger.info(f"Using {kind} model {model} at {base_url} for document analysis")
+    return backend(base_url, model, categories, **options)
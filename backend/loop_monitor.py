@@ -0,0 +1,95 @@
+import sys
+import time
+import asyncio
+import threading
+import traceback
+import logging
+from collections import deque
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopMonitor:
+    """Measures event-loop lag and logs what is blocking the loop.
+
+    A heartbeat task sleeps for ``interval`` and records how late it woke up.
+    A watchdog thread checks the heartbeat; when the loop has not come back
+    for longer than ``threshold`` it captures the loop thread's stack while
+    the blocking call is still running and logs it once per stall.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, window: int = 1000, keep_stalls: int = 20):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags = deque(maxlen=window)
+        self.stalls = deque(maxlen=keep_stalls)
+        self.stall_count = 0
+        self.max_lag = 0.0
+        self._beat = time.monotonic()
+        self._reported = False
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start monitoring the running loop; call from a coroutine on that loop"""
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+        if self._watchdog is not None:
+            self._watchdog.join()
+
+    def stats(self) -> Dict[str, Any]:
+        lags = sorted(self.lags)
+        return {
+            'interval_ms': self.interval * 1000,
+            'threshold_ms': self.threshold * 1000,
+            'samples': len(lags),
+            'lag_p50_ms': round(percentile(lags, 50) * 1000, 2),
+            'lag_p99_ms': round(percentile(lags, 99) * 1000, 2),
+            'lag_max_ms': round(self.max_lag * 1000, 2),
+            'stalls': self.stall_count,
+            'recent_stalls': list(self.stalls)
+        }
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if self._reported:
+                self.stalls[-1]['blocked_ms'] = round((now - self._beat) * 1000, 1)
+                self._reported = False
+            self._beat = now
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            blocked = time.monotonic() - self._beat
+            if blocked <= self.threshold + self.interval or self._reported:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame is not None else ''
+            self._reported = True
+            self.stall_count += 1
+            self.stalls.append({'at': time.time(), 'blocked_ms': round(blocked * 1000, 1), 'stack': stack})
+            logger.warning(f"Event loop blocked for {blocked * 1000:.0f}ms; loop thread is at:\n{stack}")
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
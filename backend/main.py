@@ -1,6 +1,6 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.websockets import WebSocketState
 import fitz  # PyMuPDF
@@ -36,6 +36,30 @@ import magic
 import threading
 import queue
 import time
+import hashlib
+import hmac
+import re
+import subprocess
+import sys
+from bundle_catalog import create_catalog
+from search_index import create_search_index
+from summarizer import ExtractiveSummarizer, make_snippet
+from document_classifier import RuleClassifier, load_classifier, CATEGORIES
+from llm_backend import create_llm_backend
+from format_handlers import FormatRegistry, sniff_mime
+from file_store import FileStore
+from page_previews import LRUByteCache, PagePreviewRenderer, DEFAULT_WIDTH, FORMATS
+from workdir_lifecycle import WorkDirManager, is_uuid
+from bundle_manifest import BundleManifest, BuildLock, build_locked, find_interrupted
+from file_records import FileRecord, FileBatch, spill_text
+from document_buffers import DocumentBuffers
+from dedup import DuplicateDetector, POLICIES as DEDUP_POLICIES
+from build_scheduler import BuildScheduler, BuildTicket, SchedulerSaturated, estimate_cost, parse_weights
+from request_profiler import ProfilingControl, load_profile, hottest_frames
+from loop_monitor import EventLoopMonitor
+from volumes import plan_volumes, compile_volume, volume_filename
+from starlette.background import BackgroundTask
+from xml.sax.saxutils import escape
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -57,6 +81,169 @@ TMP = tempfile.gettempdir()
 UPLOAD_DIR = os.path.join(TMP, "smart_pdf_bundler")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Persistent bundle catalog (SQLite by default, see BUNDLE_CATALOG_URL)
+catalog = create_catalog(default_dir=UPLOAD_DIR)
+
+# Full-text index over extracted text (see SEARCH_INDEX_PATH)
+search_index = create_search_index(default_dir=UPLOAD_DIR)
+
+def reopen_after_fork():
+    """Give a freshly forked worker its own SQLite handles; connections must not cross fork"""
+    global catalog, search_index
+    catalog = create_catalog(default_dir=UPLOAD_DIR)
+    search_index = create_search_index(default_dir=UPLOAD_DIR)
+
+# Upload-once store: files are processed on upload and referenced by id
+file_store = FileStore(os.path.join(UPLOAD_DIR, "files"))
+
+# Page thumbnails, cached by part content hash, page and width
+PREVIEW_CACHE_BYTES = int(os.environ.get('PREVIEW_CACHE_BYTES', str(256 * 1024 * 1024)))
+PREVIEW_PRERENDER_PAGES = int(os.environ.get('PREVIEW_PRERENDER_PAGES', '4'))
+preview_renderer = PagePreviewRenderer(LRUByteCache(PREVIEW_CACHE_BYTES))
+
+# Local bundle serving: optional qpdf linearization and nginx X-Accel-Redirect hand-off
+LINEARIZE_BUNDLES = os.environ.get('LINEARIZE_BUNDLES', '').lower() in ('1', 'true', 'yes')
+BUNDLE_ACCEL_REDIRECT_PREFIX = os.environ.get('BUNDLE_ACCEL_REDIRECT_PREFIX', '').rstrip('/')
+
+# Multi-volume output for portals with a size limit: default cap per volume file (0 keeps one file)
+VOLUME_MAX_MB = float(os.environ.get('VOLUME_MAX_MB', '0'))
+VOLUME_COMPILE_WORKERS = int(os.environ.get('VOLUME_COMPILE_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Reserved in each volume's budget for its cover and TOC pages
+VOLUME_FRONT_MATTER_BYTES = 256 * 1024
+# Re-plans with a tighter budget when a compiled volume still exceeds the cap
+VOLUME_PLAN_ATTEMPTS = 3
+VOLUME_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'volumes.py')
+
+# In-memory document path: uploads up to the per-file limit and generated cover/TOC pages are
+# opened from memory while their bundle builds, within a per-bundle total; larger ones stay on disk
+DOCUMENT_BUFFER_FILE_BYTES = int(os.environ.get('DOCUMENT_BUFFER_FILE_BYTES', str(8 * 1024 * 1024)))
+DOCUMENT_BUFFER_BUNDLE_BYTES = int(os.environ.get('DOCUMENT_BUFFER_BUNDLE_BYTES', str(256 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+def new_document_buffers() -> DocumentBuffers:
+    return DocumentBuffers(DOCUMENT_BUFFER_FILE_BYTES, DOCUMENT_BUFFER_BUNDLE_BYTES)
+
+# Work directory lifecycle: leased dirs are kept, idle ones expire or are evicted LRU over quota
+WORKDIR_QUOTA_BYTES = int(os.environ.get('WORKDIR_QUOTA_BYTES', str(10 * 1024 ** 3)))
+WORKDIR_TTL_SECONDS = float(os.environ.get('WORKDIR_TTL_SECONDS', str(24 * 3600)))
+WORKDIR_SWEEP_INTERVAL = float(os.environ.get('WORKDIR_SWEEP_INTERVAL', '60'))
+# Lease files shared by the worker processes, so the one running the sweeper sees every worker's leases
+WORKDIR_LEASE_DIR = os.environ.get('WORKDIR_LEASE_DIR', os.path.join(UPLOAD_DIR, '.leases'))
+workdir_manager = WorkDirManager(WORKDIR_QUOTA_BYTES, WORKDIR_TTL_SECONDS, WORKDIR_SWEEP_INTERVAL,
+                                 lease_dir=WORKDIR_LEASE_DIR)
+
+def evict_bundle_dir(bundle_id: str, path: str):
+    """Remove an idle bundle work directory and forget what pointed into it"""
+    shutil.rmtree(path, ignore_errors=True)
+    preview_renderer.forget_layout(bundle_id)
+    catalog.update_bundle(bundle_id, output_path=None)
+
+workdir_manager.add_root(UPLOAD_DIR, on_evict=evict_bundle_dir, in_use=build_locked)
+workdir_manager.add_root(file_store.base_dir, on_evict=lambda file_id, path: file_store.delete(file_id))
+
+@app.on_event("startup")
+async def start_workdir_sweeper():
+    # Under serve.py only the first worker sweeps; the others would scan the same directories
+    if os.environ.get('WORKER_INDEX', '0') == '0':
+        workdir_manager.start()
+
+@app.on_event("shutdown")
+async def stop_workdir_sweeper():
+    workdir_manager.stop()
+
+# Event-loop lag monitoring: stalls longer than the threshold log the blocking stack (0 disables)
+LOOP_LAG_THRESHOLD_MS = float(os.environ.get('LOOP_LAG_THRESHOLD_MS', '250'))
+LOOP_LAG_INTERVAL_MS = float(os.environ.get('LOOP_LAG_INTERVAL_MS', '100'))
+loop_monitor = EventLoopMonitor(LOOP_LAG_INTERVAL_MS / 1000, LOOP_LAG_THRESHOLD_MS / 1000)
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    if LOOP_LAG_THRESHOLD_MS > 0:
+        loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    loop_monitor.stop()
+
+# Admission control and weighted fair scheduling of bundle builds across tenants
+BUILD_MAX_CONCURRENT = int(os.environ.get('BUILD_MAX_CONCURRENT', '2'))
+BUILD_RESERVED_SMALL_SLOTS = int(os.environ.get('BUILD_RESERVED_SMALL_SLOTS', '1'))
+BUILD_TENANT_CONCURRENCY = int(os.environ.get('BUILD_TENANT_CONCURRENCY', '2'))
+BUILD_SMALL_JOB_COST = float(os.environ.get('BUILD_SMALL_JOB_COST', '20'))
+BUILD_MAX_QUEUED_PER_TENANT = int(os.environ.get('BUILD_MAX_QUEUED_PER_TENANT', '50'))
+BUILD_MAX_QUEUED_COST = float(os.environ.get('BUILD_MAX_QUEUED_COST', '20000'))
+build_scheduler = BuildScheduler(
+    max_concurrent=BUILD_MAX_CONCURRENT,
+    reserved_small_slots=BUILD_RESERVED_SMALL_SLOTS,
+    per_tenant_concurrency=BUILD_TENANT_CONCURRENCY,
+    small_job_cost=BUILD_SMALL_JOB_COST,
+    max_queued_per_tenant=BUILD_MAX_QUEUED_PER_TENANT,
+    max_queued_cost=BUILD_MAX_QUEUED_COST,
+    weights=parse_weights(os.environ.get('BUILD_TENANT_WEIGHTS', ''))
+)
+
+# Restart builds left unfinished by a previous process from their checkpoints
+RESUME_INTERRUPTED_BUILDS = os.environ.get('RESUME_INTERRUPTED_BUILDS', 'true').lower() in ('1', 'true', 'yes')
+
+# Duplicate inputs: keep (exact copies reuse the canonical result), reference or collapse
+DEDUP_POLICY = os.environ.get('DEDUP_POLICY', 'keep')
+DEDUP_THRESHOLD = float(os.environ.get('DEDUP_THRESHOLD', '0.85'))
+
+# Admin endpoints require X-Admin-Token when ADMIN_TOKEN is set
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+# Opt-in build profiling: per request via X-Profile-Build, or a sampled share of builds while enabled
+profiling = ProfilingControl(
+    enabled=os.environ.get('PROFILE_BUILDS', '').lower() in ('1', 'true', 'yes'),
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0.01')),
+    interval_ms=float(os.environ.get('PROFILE_INTERVAL_MS', '10'))
+)
+
+def is_admin(request: Request) -> bool:
+    return not ADMIN_TOKEN or hmac.compare_digest(request.headers.get('x-admin-token', ''), ADMIN_TOKEN)
+
+def require_admin(request: Request):
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def should_profile_build(request: Request) -> bool:
+    """Profile when an admin asks for it with X-Profile-Build, else sample while profiling is enabled"""
+    requested = request.headers.get('x-profile-build', '').lower() in ('1', 'true', 'yes') and is_admin(request)
+    return profiling.should_profile(requested)
+
+# Limits for the batched AI endpoints
+BATCH_MAX_DOCUMENTS = int(os.environ.get('BATCH_MAX_DOCUMENTS', '1000'))
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '16'))
+
+# Per-document time budget for the extractive summarizer
+SUMMARY_COST_LIMIT_MS = float(os.environ.get('SUMMARY_COST_LIMIT_MS', '50'))
+
+# Trained document classifier (see train_classifier.py); keyword rules are used when the file is missing
+CLASSIFIER_MODEL_PATH = os.environ.get('CLASSIFIER_MODEL_PATH',
+                                       os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'classifier.npz'))
+# Model predictions below this probability are reported as 'other'
+CLASSIFIER_MIN_CONFIDENCE = float(os.environ.get('CLASSIFIER_MIN_CONFIDENCE', '0'))
+
+# Optional local model server (Ollama-style) for classification and summaries; empty LLM_URL disables it.
+# Its answers are cached by content, and the trained model or rules and the extractive summarizer are fallbacks.
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'ollama')
+LLM_URL = os.environ.get('LLM_URL', '')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'llama3')
+LLM_TASKS = [task.strip() for task in os.environ.get('LLM_TASKS', 'classify,summarize').split(',') if task.strip()]
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '4'))
+LLM_BATCH_SIZE = int(os.environ.get('LLM_BATCH_SIZE', '8'))
+LLM_BATCH_WAIT_MS = float(os.environ.get('LLM_BATCH_WAIT_MS', '20'))
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', '30'))
+LLM_CACHE_ENTRIES = int(os.environ.get('LLM_CACHE_ENTRIES', '10000'))
+# Only the start of a document is sent to the model, and the cache is keyed by that prefix
+LLM_MAX_CHARS = int(os.environ.get('LLM_MAX_CHARS', '4000'))
+
+# OCR preprocessing mode: auto, fast, full or legacy (see ocr_preprocess.py)
+OCR_PREPROCESS_MODE = os.environ.get('OCR_PREPROCESS_MODE', 'auto')
+
+# Text extraction and PDF conversion, dispatched on content types sniffed at ingest
+format_registry = FormatRegistry.default(OCR_PREPROCESS_MODE)
+
 # Redis for caching and queues
 redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
 
@@ -74,8 +261,51 @@ s3_client = boto3.client(
 
 # WebSocket connection manager
 class ConnectionManager:
-    def __init__(self):
+    """Progress WebSockets by client id
+    
+    With several worker processes a client's WebSocket and its build may
+    live in different workers. Given a Redis URL, progress for clients not
+    connected here is published on a channel that every worker listens to,
+    and the worker holding the connection delivers it.
+    """
+    CHANNEL = "smart_pdf_bundler:progress"
+    
+    def __init__(self, redis_url: str = ''):
         self.active_connections: Dict[str, WebSocket] = {}
+        self.redis_url = redis_url
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+    
+    async def start_fanout(self):
+        if not self.redis_url:
+            return
+        import redis.asyncio as aioredis
+        self._redis = aioredis.from_url(self.redis_url, decode_responses=True)
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self.CHANNEL)
+        self._listener = asyncio.create_task(self._listen(pubsub))
+    
+    async def stop_fanout(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._redis is not None:
+            await self._redis.close()
+    
+    async def _listen(self, pubsub):
+        while True:
+            try:
+                async for event in pubsub.listen():
+                    if event['type'] != 'message':
+                        continue
+                    envelope = json.loads(event['data'])
+                    if envelope['client_id'] in self.active_connections:
+                        await self.send_progress(envelope['client_id'], envelope['message'], publish=False)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Progress fan-out listener failed, retrying: {e}")
+                await asyncio.sleep(1)
+                await pubsub.subscribe(self.CHANNEL)
 
     async def connect(self, websocket: WebSocket, client_id: str):
         await websocket.accept()
@@ -85,15 +315,23 @@ class ConnectionManager:
         if client_id in self.active_connections:
             del self.active_connections[client_id]
 
-    async def send_progress(self, client_id: str, message: Dict[str, Any]):
+    async def send_progress(self, client_id: str, message: Dict[str, Any], publish: bool = True):
         if client_id in self.active_connections:
             try:
                 await self.active_connections[client_id].send_text(json.dumps(message))
             except Exception as e:
                 logger.error(f"Error sending progress to {client_id}: {e}")
                 self.disconnect(client_id)
+        elif publish and self._redis is not None:
+            try:
+                await self._redis.publish(self.CHANNEL, json.dumps({'client_id': client_id, 'message': message},
+                                                                   default=str))
+            except Exception as e:
+                logger.error(f"Error publishing progress for {client_id}: {e}")
 
-manager = ConnectionManager()
+# Progress fan-out across worker processes (see serve.py); unset with a single worker
+PROGRESS_REDIS_URL = os.environ.get('PROGRESS_REDIS_URL', '')
+manager = ConnectionManager(PROGRESS_REDIS_URL)
 
 # Pydantic models
 class DocumentMetadata(BaseModel):
@@ -105,6 +343,8 @@ class DocumentMetadata(BaseModel):
     citations: Optional[List[str]] = None
     sensitive_data: Optional[List[Dict]] = None
     page_count: Optional[int] = None
+    content_hash: Optional[str] = None
+    duplicate_of: Optional[str] = None
     size: int
     uploaded_at: datetime
 
@@ -114,61 +354,120 @@ class BundleRequest(BaseModel):
     theme: str = "Minimal"
     client_id: str
 
+class BuildRequest(BaseModel):
+    file_ids: List[str]
+    cover_info: Dict[str, Any] = {}
+    theme: str = "Minimal"
+    client_id: str
+    volume_max_mb: float = VOLUME_MAX_MB
+
+class ProfilingSettings(BaseModel):
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = None
+    interval_ms: Optional[float] = None
+
+class BatchDocument(BaseModel):
+    id: Optional[str] = None
+    text: str
+
+class BatchRequest(BaseModel):
+    documents: List[BatchDocument]
+
+# Per-file processing profiles for /api/bundle:
+#   full      extract text, classify, summarize and scan for sensitive data
+#   metadata  trust caller-supplied classification/summary; no analysis
+#   merge     bundle the file as-is with no analysis at all
+PROCESSING_PROFILES = ('full', 'metadata', 'merge')
+SUPPLIED_METADATA_FIELDS = ('classification', 'summary', 'citations', 'sensitive_data')
+
+def parse_file_options(profile: str, file_options: Optional[str], file_count: int) -> List[Dict[str, Any]]:
+    """Resolve the processing profile and supplied metadata for each uploaded file"""
+    try:
+        options = json.loads(file_options) if file_options else []
+    except ValueError:
+        raise HTTPException(status_code=400, detail="fileOptions must be a JSON list")
+    if not isinstance(options, list) or len(options) > file_count:
+        raise HTTPException(status_code=400, detail="fileOptions must be a list with at most one entry per file")
+    
+    resolved = []
+    for i in range(file_count):
+        option = options[i] if i < len(options) and isinstance(options[i], dict) else {}
+        file_profile = option.get('profile') or profile
+        if file_profile not in PROCESSING_PROFILES:
+            raise HTTPException(status_code=400, detail=f"Unknown processing profile: {file_profile}")
+        resolved.append({
+            'profile': file_profile,
+            'metadata': {k: option[k] for k in SUPPLIED_METADATA_FIELDS if option.get(k) is not None}
+        })
+    return resolved
+
+# Sensitive data patterns, compiled once and shared by every request
+SSN_PATTERN = re.compile(r'\b\d{3}-\d{2}-\d{4}\b')
+PHONE_PATTERN = re.compile(r'\b\d{3}-\d{3}-\d{4}\b')
+
 # AI Document Classifier
 class AIDocumentClassifier:
-    def __init__(self):
-        self.classification_prompt = """
-        You are a legal-bundle sorter. Classify the document into one of these categories:
-        - invoice
-        - contract
-        - legal_brief
-        - email
-        - report
-        - receipt
-        - certificate
-        - other
-        
-        Document content: {content}
-        
-        Return only the category name.
-        """
+    def __init__(self, model_path: str = CLASSIFIER_MODEL_PATH, min_confidence: float = CLASSIFIER_MIN_CONFIDENCE):
+        self.rules = RuleClassifier()
+        self.model = load_classifier(model_path)
+        self.min_confidence = min_confidence
+        self.summarizer = ExtractiveSummarizer(cost_limit_ms=SUMMARY_COST_LIMIT_MS)
+        self.llm = create_llm_backend(
+            LLM_BACKEND, LLM_URL, LLM_MODEL, CATEGORIES,
+            max_concurrency=LLM_MAX_CONCURRENCY,
+            batch_size=LLM_BATCH_SIZE,
+            batch_wait_ms=LLM_BATCH_WAIT_MS,
+            timeout=LLM_TIMEOUT_SECONDS,
+            cache_entries=LLM_CACHE_ENTRIES,
+            max_chars=LLM_MAX_CHARS
+        )
     
-    async def classify_document(self, text_content: str) -> str:
-        """Classify document using AI"""
+    def classify_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Classify many documents in one vectorized pass, with the trained model when loaded"""
+        backend = self.model or self.rules
+        results = []
+        for label, confidence in backend.predict(texts):
+            if confidence is not None and confidence < self.min_confidence:
+                label = 'other'
+            results.append({'classification': label, 'confidence': confidence, 'model': backend.name})
+        return results
+    
+    async def classify_many(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Classify documents with the model server when configured, else (or where it fails) locally"""
+        labels = [None] * len(texts)
+        if self.llm and 'classify' in LLM_TASKS:
+            labels = await self.llm.classify_many(texts)
+        missing = [i for i, label in enumerate(labels) if label is None]
+        # One document is cheap enough to classify on the loop; batches go to a thread
+        batch = [texts[i] for i in missing]
+        local = self.classify_batch(batch) if len(batch) < 2 else await asyncio.to_thread(self.classify_batch, batch)
+        results = [{'classification': label, 'confidence': None, 'model': self.llm.name} if label else None
+                   for label in labels]
+        for i, result in zip(missing, local):
+            results[i] = result
+        return results
+    
+    async def classify_with_confidence(self, text_content: str) -> Dict[str, Any]:
+        """Classify one document and report the model's confidence (None for the keyword rules and LLM)"""
         try:
-            # For now, use a simple rule-based classifier
-            # In production, this would use llama3 or OpenAI API
-            text_lower = text_content.lower()
-            
-            if any(word in text_lower for word in ['invoice', 'bill', 'payment', 'amount due']):
-                return 'invoice'
-            elif any(word in text_lower for word in ['contract', 'agreement', 'terms', 'conditions']):
-                return 'contract'
-            elif any(word in text_lower for word in ['legal', 'court', 'judgment', 'brief']):
-                return 'legal_brief'
-            elif any(word in text_lower for word in ['email', 'sent', 'received', '@']):
-                return 'email'
-            elif any(word in text_lower for word in ['report', 'analysis', 'findings']):
-                return 'report'
-            elif any(word in text_lower for word in ['receipt', 'purchase', 'transaction']):
-                return 'receipt'
-            elif any(word in text_lower for word in ['certificate', 'certified', 'award']):
-                return 'certificate'
-            else:
-                return 'other'
+            return (await self.classify_many([text_content]))[0]
         except Exception as e:
             logger.error(f"Classification error: {e}")
-            return 'other'
+            return {'classification': 'other', 'confidence': None, 'model': 'rules'}
+    
+    async def classify_document(self, text_content: str) -> str:
+        """Classify document using AI"""
+        return (await self.classify_with_confidence(text_content))['classification']
     
     async def summarize_document(self, text_content: str) -> str:
         """Generate document summary using AI"""
         try:
-            # Simple summary - in production, use llama3
-            words = text_content.split()
-            if len(words) > 50:
-                summary = ' '.join(words[:50]) + '...'
-            else:
-                summary = text_content
+            if self.llm and 'summarize' in LLM_TASKS and text_content.strip():
+                summary = await self.llm.summarize(text_content)
+                if summary:
+                    return summary
+            # Extractive TF-IDF summary over a capped sample of the text
+            summary = self.summarizer.summarize(text_content)
             return summary
         except Exception as e:
             logger.error(f"Summarization error: {e}")
@@ -176,14 +475,10 @@ class AIDocumentClassifier:
     
     async def detect_sensitive_data(self, text_content: str) -> List[Dict]:
         """Detect sensitive data like SSNs, phone numbers"""
-        import re
-        
         sensitive_data = []
         
         # SSN pattern
-        ssn_pattern = r'\b\d{3}-\d{2}-\d{4}\b'
-        ssns = re.findall(ssn_pattern, text_content)
-        for ssn in ssns:
+        for ssn in SSN_PATTERN.findall(text_content):
             sensitive_data.append({
                 'type': 'ssn',
                 'value': ssn,
@@ -191,9 +486,7 @@ class AIDocumentClassifier:
             })
         
         # Phone pattern
-        phone_pattern = r'\b\d{3}-\d{3}-\d{4}\b'
-        phones = re.findall(phone_pattern, text_content)
-        for phone in phones:
+        for phone in PHONE_PATTERN.findall(text_content):
             sensitive_data.append({
                 'type': 'phone',
                 'value': phone,
@@ -202,43 +495,81 @@ class AIDocumentClassifier:
         
         return sensitive_data
 
+# Shared classifier instance used by the bundler and the AI endpoints
+ai_classifier = AIDocumentClassifier()
+
+@app.on_event("shutdown")
+async def close_llm_backend():
+    if ai_classifier.llm:
+        await ai_classifier.llm.close()
+
 # Enhanced PDF Bundler with AI
 class AIEnhancedPDFBundler:
-    def __init__(self, work_dir: str):
+    def __init__(self, work_dir: str, index_text: bool = True, buffers: Optional[DocumentBuffers] = None):
         self.work_dir = work_dir
-        self.styles = getSampleStyleSheet()
-        self.ai_classifier = AIDocumentClassifier()
+        self.bundle_id = os.path.basename(os.path.normpath(work_dir))
+        self.index_text = index_text
+        self.ai_classifier = ai_classifier
+        # Inputs held in memory are read from here rather than from disk
+        self.buffers = buffers if buffers is not None else DocumentBuffers(0, 0)
         
-    async def process_file_with_ai(self, file_path: str, file_type: str, client_id: str) -> Dict[str, Any]:
-        """Process file with AI classification and analysis"""
+    async def process_file_with_ai(self, file_path: str, file_type: str, client_id: str,
+                                   content_hash: Optional[str] = None, profile: str = 'full',
+                                   supplied: Optional[Dict[str, Any]] = None,
+                                   text_content: Optional[str] = None, file_id: Optional[str] = None) -> FileRecord:
+        """Process file with AI classification and analysis; the extracted text is spilled to disk
+        
+        The 'metadata' and 'merge' profiles skip analysis for trusted inputs:
+        PDFs and images are bundled without extracting text (no OCR), other
+        formats only have their text extracted so they can be converted.
+        Text the caller already extracted is passed as text_content, with the
+        file_id it was extracted under.
+        """
         try:
-            # Extract text content
-            text_content = await self.extract_text_content(file_path, file_type)
-            
-            # AI processing
-            classification = await self.ai_classifier.classify_document(text_content)
-            summary = await self.ai_classifier.summarize_document(text_content)
-            sensitive_data = await self.ai_classifier.detect_sensitive_data(text_content)
+            file_id = file_id or str(uuid.uuid4())
+            supplied = supplied if profile == 'metadata' and supplied else {}
+            data = self.buffers.get(file_path)
+            if profile == 'full':
+                # Extract text content
+                if text_content is None:
+                    text_content = await self.extract_text_content(file_path, file_type, data, file_id)
+                
+                # AI processing
+                classification = await self.ai_classifier.classify_document(text_content)
+                summary = await self.ai_classifier.summarize_document(text_content)
+                sensitive_data = await self.ai_classifier.detect_sensitive_data(text_content)
+            else:
+                if text_content is None and self.extracts_text(file_type, profile):
+                    text_content = await self.extract_text_content(file_path, file_type, data, file_id)
+                classification = supplied.get('classification') or 'other'
+                summary = supplied.get('summary') or ''
+                sensitive_data = supplied.get('sensitive_data') or []
             
             # Convert to PDF
-            pdf_path = await self.convert_to_pdf(file_path, file_type, text_content)
+            pdf_path = await self.convert_to_pdf(file_path, file_type, text_content or '', data, file_id)
             
             # Get page count
             page_count = self.get_page_count(pdf_path)
             
             # Store metadata
             metadata = DocumentMetadata(
-                id=str(uuid.uuid4()),
+                id=file_id,
                 filename=os.path.basename(file_path),
                 file_type=file_type,
                 classification=classification,
                 summary=summary,
+                citations=supplied.get('citations'),
                 sensitive_data=sensitive_data,
                 page_count=page_count,
-                size=os.path.getsize(file_path),
+                content_hash=content_hash,
+                size=self.buffers.size(file_path),
                 uploaded_at=datetime.now()
             )
             
+            # Index extracted text so it stays searchable after the request ends
+            if self.index_text and text_content:
+                await index_bundle_text(self.bundle_id, metadata.id, metadata.filename, text_content)
+            
             # Send progress update
             await manager.send_progress(client_id, {
                 'type': 'file_processed',
@@ -248,119 +579,49 @@ class AIEnhancedPDFBundler:
                 'sensitive_data_count': len(sensitive_data)
             })
             
-            return {
-                'metadata': metadata.dict(),
-                'pdf_path': pdf_path,
-                'text_content': text_content
-            }
+            text_path = spill_text(self.work_dir, metadata.id, text_content) if text_content is not None else None
+            return FileRecord(pdf_path, text_path, **metadata.dict())
             
         except Exception as e:
             logger.error(f"Error processing file {file_path}: {e}")
             raise
     
-    async def extract_text_content(self, file_path: str, file_type: str) -> str:
-        """Extract text content from various file types"""
-        if file_type.startswith('image/'):
-            return self.extract_text_from_image(file_path)
-        elif file_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
-            return self.extract_text_from_docx(file_path)
-        elif file_type == 'text/plain':
-            return self.extract_text_from_txt(file_path)
-        elif file_type == 'application/pdf':
-            return self.extract_text_from_pdf(file_path)
-        else:
-            return ""
-    
-    def extract_text_from_image(self, image_path: str) -> str:
-        """Enhanced OCR with image preprocessing"""
-        try:
-            # Load image
-            image = cv2.imread(image_path)
-            
-            # Preprocessing for better OCR
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            denoised = cv2.fastNlMeansDenoising(gray)
-            
-            # OCR with multiple attempts
-            text = pytesseract.image_to_string(denoised, config='--psm 6')
-            
-            if not text.strip():
-                # Try different PSM modes
-                text = pytesseract.image_to_string(denoised, config='--psm 3')
-            
-            return text
-        except Exception as e:
-            logger.error(f"OCR failed for {image_path}: {e}")
-            return ""
-    
-    def extract_text_from_docx(self, docx_path: str) -> str:
-        """Extract text from DOCX"""
-        try:
-            doc = Document(docx_path)
-            text = []
-            for paragraph in doc.paragraphs:
-                text.append(paragraph.text)
-            return '\n'.join(text)
-        except Exception as e:
-            logger.error(f"DOCX extraction failed: {e}")
-            return ""
+    def extracts_text(self, file_type: str, profile: str) -> bool:
+        """Whether processing a file under this profile extracts its text"""
+        return profile == 'full' or format_registry.handler_for(file_type).text_required_for_pdf
     
-    def extract_text_from_txt(self, txt_path: str) -> str:
-        """Extract text from TXT"""
-        try:
-            with open(txt_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            logger.error(f"TXT extraction failed: {e}")
-            return ""
+    async def extract_text_content(self, file_path: str, file_type: str, data: Optional[bytes] = None,
+                                   file_id: Optional[str] = None) -> str:
+        """Extract text content with the handler registered for the file's type"""
+        return format_registry.handler_for(file_type).extract_text(file_path, data, file_id, self.buffers)
     
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
-        """Extract text from PDF"""
-        try:
-            doc = fitz.open(pdf_path)
-            text = []
-            for page in doc:
-                text.append(page.get_text())
-            doc.close()
-            return '\n'.join(text)
-        except Exception as e:
-            logger.error(f"PDF extraction failed: {e}")
-            return ""
-    
-    async def convert_to_pdf(self, file_path: str, file_type: str, text_content: str) -> str:
-        """Convert file to PDF with enhanced formatting"""
-        if file_type == 'application/pdf':
-            return file_path
-        
-        pdf_path = file_path.replace('.docx', '_converted.pdf').replace('.txt', '_converted.pdf')
-        pdf_path = pdf_path.replace('.png', '_converted.pdf').replace('.jpg', '_converted.pdf')
-        
-        doc = SimpleDocTemplate(pdf_path, pagesize=A4)
-        story = []
-        
-        # Add document header
-        story.append(Paragraph(f"Document: {os.path.basename(file_path)}", self.styles['Heading1']))
-        story.append(Spacer(1, 20))
-        
-        # Add content
-        if text_content.strip():
-            story.append(Paragraph(text_content, self.styles['Normal']))
-        else:
-            story.append(Paragraph("No text content extracted.", self.styles['Normal']))
-        
-        doc.build(story)
-        return pdf_path
+    async def convert_to_pdf(self, file_path: str, file_type: str, text_content: str,
+                             data: Optional[bytes] = None, file_id: Optional[str] = None) -> str:
+        """Convert file to PDF; PDFs are used as-is and images embedded as pages"""
+        return format_registry.handler_for(file_type).to_pdf(file_path, text_content, data, file_id, self.buffers)
     
     def get_page_count(self, pdf_path: str) -> int:
         """Get page count of PDF"""
         try:
-            doc = fitz.open(pdf_path)
-            count = len(doc)
-            doc.close()
-            return count
+            return self.buffers.page_count(pdf_path)
         except:
             return 1
 
+async def index_bundle_text(bundle_id: str, file_id: str, filename: str, text_content: str):
+    """Add a document's text to the search index off the event loop, without failing the build"""
+    try:
+        await asyncio.to_thread(search_index.index_document, bundle_id, file_id, filename, text_content)
+    except Exception as e:
+        logger.warning(f"Search indexing failed for {filename}: {e}")
+
+async def mark_bundle_failed(bundle_id: str):
+    """Record a failed build and drop its pages from the search index; a resume indexes them again"""
+    catalog.update_bundle(bundle_id, status='failed')
+    try:
+        await asyncio.to_thread(search_index.remove_bundle, bundle_id)
+    except Exception as e:
+        logger.warning(f"Could not remove search rows of failed bundle {bundle_id}: {e}")
+
 # WebSocket endpoint for real-time progress
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
@@ -372,23 +633,129 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
     except WebSocketDisconnect:
         manager.disconnect(client_id)
 
+# Background bundle builds started in streaming mode; kept referenced until done
+background_builds = set()
+# Bundles currently being built by this process, with their cross-process build locks
+active_builds: Dict[str, BuildLock] = {}
+
+def claim_build(bundle_id: str, work_dir: str) -> bool:
+    """Claim a bundle for this process; False if it is already being built here or by another worker"""
+    lock = BuildLock(work_dir)
+    if bundle_id in active_builds or not lock.acquire():
+        return False
+    active_builds[bundle_id] = lock
+    return True
+
+def release_build(bundle_id: str):
+    lock = active_builds.pop(bundle_id, None)
+    if lock is not None:
+        lock.release()
+
+# Seconds a stopping worker waits for background builds; unfinished ones resume from checkpoints
+BUILD_DRAIN_SECONDS = float(os.environ.get('BUILD_DRAIN_SECONDS', '300'))
+
+@app.on_event("shutdown")
+async def drain_background_builds():
+    """Let background builds finish before the process exits, e.g. when serve.py recycles a worker"""
+    if background_builds:
+        logger.info(f"Waiting up to {BUILD_DRAIN_SECONDS:.0f}s for {len(background_builds)} background builds")
+        await asyncio.wait(list(background_builds), timeout=BUILD_DRAIN_SECONDS)
+
+@app.on_event("startup")
+async def start_progress_fanout():
+    await manager.start_fanout()
+
+@app.on_event("shutdown")
+async def stop_progress_fanout():
+    await manager.stop_fanout()
+
+def admit_build(tenant: str, cost: float) -> BuildTicket:
+    """Queue a build for a tenant, or reject it with 429 when the scheduler is saturated"""
+    try:
+        return build_scheduler.submit(tenant, cost)
+    except SchedulerSaturated as e:
+        logger.warning(f"Rejected build for tenant {tenant} (cost {cost:.1f}): {e}")
+        raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': str(e.retry_after)})
+
+async def wait_for_build_slot(ticket: BuildTicket, client_id: str, bundle_id: str):
+    """Wait for the scheduler to start a build, telling the client its queue position"""
+    if ticket.dispatched:
+        return
+    await manager.send_progress(client_id, {
+        'type': 'queued',
+        'bundle_id': bundle_id,
+        'position': build_scheduler.position(ticket),
+        'queue_depth': build_scheduler.stats()['queue_depth']
+    })
+    await build_scheduler.wait(ticket)
+
 # Enhanced bundle creation endpoint
 @app.post("/api/bundle")
 async def create_ai_enhanced_bundle(
+    request: Request,
     files: List[UploadFile] = File(...),
     coverInfo: str = Form(...),
     theme: str = Form("Minimal"),
-    client_id: str = Form(...)
+    client_id: str = Form(...),
+    stream: bool = Form(False),
+    profile: str = Form("full"),
+    fileOptions: Optional[str] = Form(None),
+    dedupPolicy: str = Form(DEDUP_POLICY),
+    volumeMaxMb: float = Form(VOLUME_MAX_MB)
 ):
-    """Create AI-enhanced PDF bundle with real-time progress"""
+    """Create AI-enhanced PDF bundle with real-time progress
+
+    With ``stream`` set, the response returns as soon as a provisional cover
+    and TOC are previewable; exhibits are processed in the background and
+    completion is reported over the WebSocket progress channel.
+    
+    Builds are admitted per tenant (``X-Tenant-ID`` header, else client_id)
+    and may wait in the fair-share queue; a saturated queue returns 429.
+    
+    ``profile`` (full, metadata or merge) applies to every file unless
+    ``fileOptions``, a JSON list aligned with ``files``, overrides it per file
+    and supplies classification/summary for the metadata profile.
+    
+    Admins can profile a build with the ``X-Profile-Build`` header; see
+    /api/admin/bundles/{bundle_id}/profile.
+    
+    ``dedupPolicy`` decides what happens to inputs that duplicate an earlier
+    one: keep them, reference the canonical copy in the TOC without repeating
+    its pages, or collapse them out of the bundle.
+    
+    ``volumeMaxMb`` splits the output into volumes of at most that size, for
+    filing portals with an upload limit; see compile_bundle_volumes.
+    """
+    options = parse_file_options(profile, fileOptions, len(files))
+    if dedupPolicy not in DEDUP_POLICIES:
+        raise HTTPException(status_code=400, detail=f"Unknown dedup policy: {dedupPolicy}")
+    if volumeMaxMb < 0:
+        raise HTTPException(status_code=400, detail="volumeMaxMb must not be negative")
+    volume_max_bytes = int(volumeMaxMb * 1024 * 1024)
+    tenant = request.headers.get('x-tenant-id') or client_id
+    ticket = admit_build(tenant, estimate_cost(len(files), sum(file.size or 0 for file in files)))
+    bundle_id = None
+    handed_off = False
     try:
         # Parse cover info
         cover_info = json.loads(coverInfo)
         
-        # Create unique work directory
+        # Create unique work directory, leased until the build finishes
         bundle_id = str(uuid.uuid4())
+        workdir_manager.acquire(bundle_id)
         work_dir = os.path.join(UPLOAD_DIR, bundle_id)
         os.makedirs(work_dir, exist_ok=True)
+        claim_build(bundle_id, work_dir)
+        
+        catalog.record_bundle({
+            'id': bundle_id,
+            'name': cover_info.get('title') or None,
+            'client_id': client_id,
+            'theme': theme,
+            'status': 'processing',
+            'file_count': len(files),
+            'cover_info': cover_info
+        }, [])
         
         # Send initial progress
         await manager.send_progress(client_id, {
@@ -397,96 +764,676 @@ async def create_ai_enhanced_bundle(
             'total_files': len(files)
         })
         
-        bundler = AIEnhancedPDFBundler(work_dir)
+        # Save uploaded files; small ones stay in memory for the build
+        buffers = new_document_buffers()
+        saved_files = []
+        for file, option in zip(files, options):
+            saved = await save_upload(file, os.path.join(work_dir, file.filename), buffers)
+            saved_files.append({**saved, **option})
         
-        # Process files with AI
-        processed_files = []
-        for i, file in enumerate(files):
-            # Save uploaded file
-            file_path = os.path.join(work_dir, file.filename)
-            async with aiofiles.open(file_path, 'wb') as f:
-                content = await file.read()
-                await f.write(content)
-            
-            # Send file processing progress
-            await manager.send_progress(client_id, {
-                'type': 'file_processing',
-                'filename': file.filename,
-                'progress': (i / len(files)) * 100
+        manifest = BundleManifest.create(work_dir, bundle_id, cover_info, theme, client_id, tenant, saved_files,
+                                         dedupPolicy, profiled=should_profile_build(request),
+                                         volume_max_bytes=volume_max_bytes)
+        
+        if stream:
+            await publish_provisional_preview(bundle_id, work_dir, cover_info, theme, client_id, saved_files, buffers)
+            start_background_build(manifest, ticket, buffers)
+            handed_off = True
+            return JSONResponse(status_code=202, content={
+                "success": True,
+                "status": "processing",
+                "bundle_id": bundle_id,
+                "preview_url": f"/api/bundle/{bundle_id}/pages/1",
+                "message": f"Bundle preview ready; processing {len(saved_files)} files in the background"
             })
-            
-            # Process with AI
-            result = await bundler.process_file_with_ai(file_path, file.content_type, client_id)
-            processed_files.append(result)
         
-        # Create enhanced cover page
-        await manager.send_progress(client_id, {
-            'type': 'creating_cover',
-            'progress': 80
-        })
+        await wait_for_build_slot(ticket, client_id, bundle_id)
+        with profiling.profile(work_dir, bundle_id, manifest.data['profiling']):
+            download_url = await build_saved_files(bundle_id, work_dir, cover_info, theme, client_id, saved_files,
+                                                   manifest, dedupPolicy, volume_max_bytes, buffers)
         
-        cover_path = await create_enhanced_cover_page(work_dir, cover_info, theme, processed_files)
+        return JSONResponse(content={
+            "success": True,
+            "url": download_url,
+            "bundle_id": bundle_id,
+            "message": f"AI-enhanced PDF bundle created successfully with {len(saved_files)} files"
+        })
         
-        # Create AI-enhanced table of contents
+    except Exception as e:
+        logger.error(f"Error creating AI-enhanced bundle: {e}")
+        if bundle_id:
+            await mark_bundle_failed(bundle_id)
         await manager.send_progress(client_id, {
-            'type': 'creating_toc',
-            'progress': 85
+            'type': 'error',
+            'message': str(e)
         })
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # In streaming mode the background task releases the lease and the build slot
+        if not handed_off:
+            build_scheduler.release(ticket)
+            if bundle_id:
+                release_build(bundle_id)
+                workdir_manager.release(bundle_id)
+
+async def save_upload(file: UploadFile, path: str, buffers: DocumentBuffers) -> Dict[str, Any]:
+    """Write an upload to path, keeping its bytes in buffers when it fits there
+    
+    Larger uploads are copied in chunks and never held whole in memory.
+    Returns the saved-file fields: path, sniffed content type and SHA-256.
+    """
+    limit = buffers.file_limit
+    head = await file.read(limit + 1 if limit else UPLOAD_CHUNK_BYTES)
+    content_type = sniff_mime(file.filename, head, file.content_type)
+    digest = hashlib.sha256(head)
+    async with aiofiles.open(path, 'wb') as f:
+        await f.write(head)
+        if limit and len(head) <= limit:
+            buffers.put(path, head)
+        else:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                await f.write(chunk)
+    return {'path': path, 'content_type': content_type, 'content_hash': digest.hexdigest()}
+
+async def build_saved_files(bundle_id: str, work_dir: str, cover_info: dict, theme: str, client_id: str,
+                            saved_files: List[Dict], manifest: Optional[BundleManifest] = None,
+                            dedup_policy: str = DEDUP_POLICY, volume_max_bytes: int = 0,
+                            buffers: Optional[DocumentBuffers] = None) -> str:
+    """Process saved uploads with AI and finish the bundle; returns the download URL
+    
+    With a manifest, files and stages checkpointed by an earlier attempt are
+    reused and new results are checkpointed as they complete. Duplicates of
+    an earlier input reuse its result according to dedup_policy. Inputs in
+    buffers are read from memory.
+    """
+    bundler = AIEnhancedPDFBundler(work_dir, buffers=buffers if buffers is not None else new_document_buffers())
+    stage_timings = {}
+    
+    try:
+        processed_files = await process_saved_files(bundler, client_id, saved_files, stage_timings, manifest,
+                                                    dedup_policy)
         
-        toc_path = await create_ai_enhanced_toc(work_dir, processed_files, theme)
+        download_url = await finish_bundle(bundle_id, work_dir, cover_info, theme, client_id,
+                                           processed_files, stage_timings, manifest, volume_max_bytes,
+                                           bundler.buffers)
+    except Exception:
+        if manifest:
+            manifest.set_status('failed')
+        raise
+    
+    if manifest:
+        manifest.set_status('completed')
+    return download_url
+
+async def process_saved_files(bundler: AIEnhancedPDFBundler, client_id: str, saved_files: List[Dict],
+                              stage_timings: Dict[str, float], manifest: Optional[BundleManifest] = None,
+                              dedup_policy: str = DEDUP_POLICY) -> FileBatch:
+    """Run saved inputs through the bundler in order, reusing checkpointed and duplicate results"""
+    # Find duplicate inputs before any expensive processing
+    stage_start = time.perf_counter()
+    detector = DuplicateDetector(DEDUP_THRESHOLD, near=dedup_policy != 'keep')
+    duplicates = await asyncio.to_thread(lambda: [
+        detector.check(i, saved['path'], saved['content_type'], saved['content_hash'],
+                       bundler.buffers.get(saved['path']))
+        for i, saved in enumerate(saved_files)
+    ])
+    stage_timings['dedup'] = time.perf_counter() - stage_start
+    
+    # Process files with AI
+    stage_start = time.perf_counter()
+    processed_files = FileBatch()
+    records = {}
+    found = []
+    for i, saved in enumerate(saved_files):
+        duplicate = duplicates[i]
+        if duplicate is None:
+            profile = saved.get('profile', 'full')
+            result = manifest.file_result(i) if manifest else None
+            record = None
+            if result is not None:
+                record = FileRecord.from_result(result, result.get('text_path'))
+                if bundler.index_text:
+                    await index_bundle_text(bundler.bundle_id, record.id, record.filename, record.text)
+            else:
+                # Scans can only be compared once their text has been extracted, so
+                # extract it first and skip classifying, summarizing and indexing copies
+                text_content = None
+                file_id = str(uuid.uuid4())
+                if detector.needs_text(i) and bundler.extracts_text(saved['content_type'], profile):
+                    text_content = await bundler.extract_text_content(
+                        saved['path'], saved['content_type'], bundler.buffers.get(saved['path']), file_id
+                    )
+                    duplicate = detector.check_text(i, text_content, saved['content_hash'])
+                if duplicate is None:
+                    # Send file processing progress
+                    await manager.send_progress(client_id, {
+                        'type': 'file_processing',
+                        'filename': os.path.basename(saved['path']),
+                        'progress': (i / len(saved_files)) * 100
+                    })
+                    
+                    # Process with AI
+                    record = await bundler.process_file_with_ai(
+                        saved['path'], saved['content_type'], client_id, saved['content_hash'],
+                        profile, saved.get('metadata'), text_content, file_id
+                    )
+                    if manifest:
+                        manifest.record_file(i, dict(record.to_result(), text_path=record.text_path))
+            
+            # Resumed results are compared on the text they were processed with
+            if record is not None and detector.needs_text(i):
+                duplicate = detector.check_text(i, record.text, saved['content_hash'])
+                if duplicate is not None and bundler.index_text:
+                    await asyncio.to_thread(search_index.remove_document, record.id)
+            if duplicate is None:
+                records[i] = record
+                processed_files.add(record)
+                continue
+            records[i] = records[duplicate['index']]
         
-        # Compile final bundle
+        found.append({
+            'filename': os.path.basename(saved['path']),
+            'duplicate_of': records[duplicate['index']].filename,
+            'match': duplicate['match'],
+            'similarity': duplicate['similarity']
+        })
+        if dedup_policy != 'collapse':
+            processed_files.add(duplicate_record(records[duplicate['index']], saved,
+                                                 reference=dedup_policy == 'reference'))
+    stage_timings['process_files'] = time.perf_counter() - stage_start
+    
+    if found:
         await manager.send_progress(client_id, {
-            'type': 'compiling_bundle',
-            'progress': 90
+            'type': 'duplicates_found',
+            'policy': dedup_policy,
+            'duplicates': found
         })
-        
-        output_path = await compile_final_bundle(work_dir, cover_path, toc_path, processed_files)
-        
-        # Upload to S3/MinIO
+    
+    return processed_files
+
+def duplicate_record(canonical: FileRecord, saved: Dict, reference: bool) -> FileRecord:
+    """Reuse the canonical copy's result for a duplicate input
+    
+    A reference keeps a TOC entry pointing at the canonical copy but adds no
+    pages; otherwise the canonical PDF is bundled again under the duplicate's name.
+    """
+    metadata = dict(
+        canonical.metadata,
+        id=str(uuid.uuid4()),
+        filename=os.path.basename(saved['path']),
+        content_hash=saved['content_hash'],
+        size=os.path.getsize(saved['path']),
+        duplicate_of=canonical.filename
+    )
+    if reference:
+        metadata.update(page_count=0, summary=f"Duplicate of {canonical.filename}")
+        return FileRecord('', None, **metadata)
+    return FileRecord(canonical.pdf_path, canonical.text_path, **metadata)
+
+def start_background_build(manifest: BundleManifest, ticket: BuildTicket, buffers: Optional[DocumentBuffers] = None):
+    """Run a manifest's build as a background task that owns the ticket and the work dir lease"""
+    data = manifest.data
+    task = asyncio.create_task(build_bundle_in_background(
+        data['bundle_id'], manifest.work_dir, data['cover_info'], data['theme'], data['client_id'],
+        manifest.saved_files, ticket, manifest, data.get('dedup_policy', 'keep'), data.get('volume_max_bytes', 0),
+        buffers
+    ))
+    background_builds.add(task)
+    task.add_done_callback(background_builds.discard)
+
+def resume_build(manifest: BundleManifest) -> BundleManifest:
+    """Re-admit an unfinished build and continue it in the background from its checkpoints
+    
+    The build is claimed first so that two workers never resume the same
+    bundle; the manifest is reloaded under the claim in case another worker
+    finished it in the meantime.
+    """
+    bundle_id = manifest.data['bundle_id']
+    if not claim_build(bundle_id, manifest.work_dir):
+        raise HTTPException(status_code=409, detail="Bundle is already being built")
+    try:
+        manifest = BundleManifest.load(manifest.work_dir)
+        if manifest is None or manifest.data['status'] == 'completed':
+            raise HTTPException(status_code=409, detail="Bundle is already complete")
+        data = manifest.data
+        pending = [saved for i, saved in enumerate(manifest.saved_files) if manifest.file_result(i) is None]
+        ticket = admit_build(data.get('tenant') or data['client_id'], estimate_cost(
+            len(pending), sum(os.path.getsize(saved['path']) for saved in pending if os.path.exists(saved['path']))
+        ))
+    except HTTPException:
+        release_build(bundle_id)
+        raise
+    workdir_manager.acquire(data['bundle_id'])
+    manifest.set_status('processing')
+    catalog.update_bundle(data['bundle_id'], status='processing')
+    logger.info(f"Resuming bundle {data['bundle_id']}: {len(pending)} of {len(data['files'])} files left to process")
+    start_background_build(manifest, ticket)
+    return manifest
+
+@app.on_event("startup")
+async def resume_interrupted_builds():
+    """Continue builds that a previous process left unfinished"""
+    if not RESUME_INTERRUPTED_BUILDS:
+        return
+    for manifest in await asyncio.to_thread(find_interrupted, UPLOAD_DIR):
+        if build_locked(manifest.work_dir):
+            # Already picked up by another worker
+            continue
+        try:
+            resume_build(manifest)
+        except HTTPException as e:
+            logger.warning(f"Could not resume bundle {manifest.data['bundle_id']}: {e.detail}")
+
+@app.post("/api/bundle/{bundle_id}/resume")
+async def resume_bundle(bundle_id: str):
+    """Retry a failed or interrupted build, skipping the stages it already completed"""
+    if not is_uuid(bundle_id):
+        raise HTTPException(status_code=404, detail="Bundle not found")
+    if bundle_id in active_builds:
+        raise HTTPException(status_code=409, detail="Bundle is already being built")
+    manifest = BundleManifest.load(os.path.join(UPLOAD_DIR, bundle_id))
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="No resumable build for this bundle")
+    if manifest.data['status'] == 'completed':
+        raise HTTPException(status_code=409, detail="Bundle is already complete")
+    
+    manifest = resume_build(manifest)
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "status": "processing",
+        "bundle_id": bundle_id,
+        "files_done": sum(1 for i in range(len(manifest.data['files'])) if manifest.file_result(i) is not None),
+        "total_files": len(manifest.data['files'])
+    })
+
+async def build_bundle_in_background(bundle_id: str, work_dir: str, cover_info: dict, theme: str,
+                                     client_id: str, saved_files: List[Dict], ticket: BuildTicket,
+                                     manifest: Optional[BundleManifest] = None, dedup_policy: str = DEDUP_POLICY,
+                                     volume_max_bytes: int = 0, buffers: Optional[DocumentBuffers] = None):
+    """Run build_saved_files after the request has returned, reporting failures over the WebSocket"""
+    try:
+        await wait_for_build_slot(ticket, client_id, bundle_id)
+        with profiling.profile(work_dir, bundle_id, bool(manifest and manifest.data.get('profiling'))):
+            await build_saved_files(bundle_id, work_dir, cover_info, theme, client_id, saved_files, manifest,
+                                    dedup_policy, volume_max_bytes, buffers)
+    except Exception as e:
+        logger.error(f"Background build failed for bundle {bundle_id}: {e}")
+        await mark_bundle_failed(bundle_id)
         await manager.send_progress(client_id, {
-            'type': 'uploading',
-            'progress': 95
+            'type': 'error',
+            'bundle_id': bundle_id,
+            'message': str(e)
         })
+    finally:
+        build_scheduler.release(ticket)
+        release_build(bundle_id)
+        workdir_manager.release(bundle_id)
+
+async def publish_provisional_preview(bundle_id: str, work_dir: str, cover_info: dict, theme: str,
+                                      client_id: str, saved_files: List[Dict],
+                                      buffers: Optional[DocumentBuffers] = None):
+    """Render a cover and provisional TOC from cheap metadata and announce them
+
+    Page counts come from opening PDFs (no text extraction); other inputs are
+    assumed to be one page until they are converted.
+    """
+    bundler = AIEnhancedPDFBundler(work_dir, buffers=buffers)
+    provisional_files = FileBatch()
+    for saved in saved_files:
+        page_count = 1
+        if saved['content_type'] == 'application/pdf':
+            page_count = bundler.get_page_count(saved['path'])
+        provisional_files.add(FileRecord(
+            saved['path'],
+            filename=os.path.basename(saved['path']),
+            file_type=saved['content_type'],
+            classification='pending',
+            summary='',
+            page_count=page_count
+        ))
+    
+    cover_path = await create_enhanced_cover_page(work_dir, cover_info, theme, provisional_files,
+                                                  filename="cover_provisional.pdf")
+    toc_path = await create_ai_enhanced_toc(work_dir, provisional_files, theme,
+                                            filename="toc_provisional.pdf")
+    layout = await asyncio.to_thread(preview_renderer.build_layout, bundle_id, work_dir, [
+        {'pdf_path': cover_path},
+        {'pdf_path': toc_path}
+    ])
+    await asyncio.to_thread(preview_renderer.prerender, layout, PREVIEW_PRERENDER_PAGES)
+    
+    await manager.send_progress(client_id, {
+        'type': 'preview_ready',
+        'bundle_id': bundle_id,
+        'provisional': True,
+        'page_count': sum(part['page_count'] for part in layout),
+        'preview_url': f"/api/bundle/{bundle_id}/pages/1"
+    })
+
+# Upload-once endpoints: files are analysed on upload and bundled by id
+@app.post("/api/upload")
+async def upload_file(
+    file: UploadFile = File(...),
+    session_id: str = Form(...),
+    client_id: Optional[str] = Form(None)
+):
+    """Upload and process a single file so later builds can reference it by id"""
+    try:
+        upload = file_store.new_upload(file.filename)
+        with workdir_manager.lease(upload['file_id']):
+            # Small files stay in memory for processing; larger ones are streamed to disk
+            buffers = new_document_buffers()
+            saved = await save_upload(file, upload['path'], buffers)
+            content_type = saved['content_type']
+            record = file_store.add_upload(session_id, upload, content_type, buffers.size(upload['path']),
+                                           saved['content_hash'])
+            
+            bundler = AIEnhancedPDFBundler(file_store.file_dir(record['file_id']), index_text=False, buffers=buffers)
+            processed = await bundler.process_file_with_ai(
+                record['path'], content_type, client_id or session_id, record['content_hash']
+            )
+            file_store.set_result(record['file_id'], processed.to_result(), processed.text)
+        
+        return {
+            "success": True,
+            "file_id": record['file_id'],
+            "session_id": session_id,
+            "filename": record['filename'],
+            "original_name": file.filename,
+            "size": record['size'],
+            "uploaded_at": record['uploaded_at'],
+            "metadata": processed.metadata
+        }
+    except Exception as e:
+        logger.error(f"Error uploading file: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/sessions/{session_id}/files")
+async def list_session_files(session_id: str):
+    """List files uploaded in a session"""
+    files = []
+    for record in file_store.session_files(session_id):
+        result = file_store.get_result(record['file_id'])
+        files.append({**record, 'processed': result is not None})
+    return {"session_id": session_id, "files": files}
+
+@app.delete("/api/upload/{file_id}")
+async def delete_uploaded_file(file_id: str):
+    """Remove an uploaded file and its processed artefacts"""
+    if not file_store.delete(file_id):
+        raise HTTPException(status_code=404, detail="File not found")
+    return {"success": True, "file_id": file_id}
+
+@app.post("/api/bundle/build")
+async def build_bundle_from_files(build: BuildRequest, request: Request):
+    """Build a bundle from previously uploaded file ids without reprocessing them"""
+    bundle_id = None
+    ticket = None
+    leased = []
+    try:
+        # Pin the referenced uploads so the sweeper cannot evict them mid-build
+        for file_id in build.file_ids:
+            workdir_manager.acquire(file_id)
+            leased.append(file_id)
+        
+        processed_files = []
+        stage_start = time.perf_counter()
+        for file_id in build.file_ids:
+            try:
+                result = file_store.get_result(file_id)
+            except KeyError:
+                result = None
+            if result is None:
+                raise HTTPException(status_code=404, detail=f"Unknown or unprocessed file: {file_id}")
+            processed_files.append(result)
         
-        download_url = await upload_to_storage(output_path, bundle_id)
+        tenant = request.headers.get('x-tenant-id') or build.client_id
+        ticket = admit_build(tenant, estimate_cost(
+            len(processed_files),
+            sum((file_store.get(file_id) or {}).get('size', 0) for file_id in build.file_ids),
+            sum(result['metadata'].get('page_count', 0) for result in processed_files)
+        ))
         
-        # Send completion
-        await manager.send_progress(client_id, {
-            'type': 'bundle_complete',
-            'progress': 100,
-            'download_url': download_url,
-            'bundle_id': bundle_id
+        bundle_id = str(uuid.uuid4())
+        workdir_manager.acquire(bundle_id)
+        leased.append(bundle_id)
+        work_dir = os.path.join(UPLOAD_DIR, bundle_id)
+        os.makedirs(work_dir, exist_ok=True)
+        claim_build(bundle_id, work_dir)
+        
+        catalog.record_bundle({
+            'id': bundle_id,
+            'name': build.cover_info.get('title') or None,
+            'client_id': build.client_id,
+            'theme': build.theme,
+            'status': 'processing',
+            'file_count': len(processed_files),
+            'cover_info': build.cover_info
+        }, [])
+        
+        await manager.send_progress(build.client_id, {
+            'type': 'bundle_started',
+            'bundle_id': bundle_id,
+            'total_files': len(processed_files)
         })
+        await wait_for_build_slot(ticket, build.client_id, bundle_id)
+        
+        # Each bundle gets its own file entries so catalog and search rows stay per-bundle
+        bundle_files = FileBatch()
+        for file_id, result in zip(build.file_ids, processed_files):
+            record = FileRecord.from_result(result, file_store.text_path(file_id))
+            record.id = str(uuid.uuid4())
+            await index_bundle_text(bundle_id, record.id, record.filename, record.text)
+            bundle_files.add(record)
+        stage_timings = {'process_files': time.perf_counter() - stage_start}
+        
+        with profiling.profile(work_dir, bundle_id, should_profile_build(request)):
+            download_url = await finish_bundle(bundle_id, work_dir, build.cover_info, build.theme,
+                                               build.client_id, bundle_files, stage_timings,
+                                               volume_max_bytes=int(build.volume_max_mb * 1024 * 1024))
         
         return JSONResponse(content={
             "success": True,
             "url": download_url,
             "bundle_id": bundle_id,
-            "message": f"AI-enhanced PDF bundle created successfully with {len(processed_files)} files"
+            "message": f"PDF bundle built from {len(bundle_files)} uploaded files"
         })
-        
+    
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error creating AI-enhanced bundle: {e}")
-        await manager.send_progress(client_id, {
+        logger.error(f"Error building bundle from uploaded files: {e}")
+        if bundle_id:
+            await mark_bundle_failed(bundle_id)
+        await manager.send_progress(build.client_id, {
             'type': 'error',
             'message': str(e)
         })
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if ticket is not None:
+            build_scheduler.release(ticket)
+        if bundle_id:
+            release_build(bundle_id)
+        for key in leased:
+            workdir_manager.release(key)
 
-async def create_enhanced_cover_page(work_dir: str, cover_info: dict, theme: str, processed_files: List[Dict]) -> str:
+async def run_stage(manifest: Optional[BundleManifest], name: str, stage_timings: Dict[str, float], produce) -> str:
+    """Run one finishing stage, or reuse its output checkpointed by an earlier attempt"""
+    output = manifest.stage_output(name) if manifest else None
+    if output is not None:
+        stage_timings[name] = manifest.stage_seconds(name)
+        return output
+    stage_start = time.perf_counter()
+    output = await produce()
+    stage_timings[name] = time.perf_counter() - stage_start
+    if manifest:
+        manifest.record_stage(name, output, stage_timings[name])
+    return output
+
+async def finish_bundle(bundle_id: str, work_dir: str, cover_info: dict, theme: str, client_id: str,
+                        processed_files: FileBatch, stage_timings: Dict[str, float],
+                        manifest: Optional[BundleManifest] = None, volume_max_bytes: int = 0,
+                        buffers: Optional[DocumentBuffers] = None) -> str:
+    """Render cover and TOC, compile, upload and catalog a bundle; returns the download URL
+    
+    With volume_max_bytes the bundle is compiled as size-capped volumes
+    instead of one file and the URL is that of the first volume. The cover
+    and TOC are kept in buffers with the inputs held there, and the merge
+    reads them from memory.
+    """
+    buffers = buffers if buffers is not None else new_document_buffers()
+    volumes = None
+    if volume_max_bytes > 0:
+        await manager.send_progress(client_id, {
+            'type': 'compiling_volumes',
+            'progress': 80
+        })
+        volumes = await run_stage(manifest, 'volumes', stage_timings, lambda: compile_bundle_volumes(
+            work_dir, cover_info, theme, processed_files, volume_max_bytes
+        ))
+        cover_path = os.path.join(work_dir, volumes[0]['cover'])
+        toc_path = os.path.join(work_dir, volumes[0]['toc'])
+    else:
+        # Create enhanced cover page
+        await manager.send_progress(client_id, {
+            'type': 'creating_cover',
+            'progress': 80
+        })
+        
+        cover_path = await run_stage(manifest, 'cover', stage_timings, lambda: create_enhanced_cover_page(
+            work_dir, cover_info, theme, processed_files, buffers=buffers
+        ))
+        
+        # Create AI-enhanced table of contents
+        await manager.send_progress(client_id, {
+            'type': 'creating_toc',
+            'progress': 85
+        })
+        
+        toc_path = await run_stage(manifest, 'toc', stage_timings, lambda: create_ai_enhanced_toc(
+            work_dir, processed_files, theme, buffers=buffers
+        ))
+    
+    # Map bundle pages to their source parts (hashing and opening them off the loop)
+    # and warm the preview cache while compiling
+    def layout_parts(front_matter: List[str], documents: List[FileRecord]) -> List[Dict[str, Any]]:
+        return [
+            *(
+                {
+                    'pdf_path': path,
+                    'page_count': buffers.page_count(path) if path in buffers else None,
+                    'content_hash': buffers.content_hash(path)
+                }
+                for path in front_matter
+            ),
+            *(
+                {
+                    'pdf_path': f.pdf_path,
+                    'page_count': f.page_count,
+                    # Original PDFs are bundled as-is, so their upload hash identifies the pages
+                    'content_hash': f.content_hash if f.file_type == 'application/pdf'
+                    else buffers.content_hash(f.pdf_path)
+                }
+                for f in documents
+            )
+        ]
+    
+    if volumes is None:
+        layout = await asyncio.to_thread(preview_renderer.build_layout, bundle_id, work_dir,
+                                         layout_parts([cover_path, toc_path], list(processed_files)))
+    else:
+        # One layout per volume file; the bundle's default layout is volume 1, its download URL
+        files = list(processed_files)
+        start = 0
+        for volume in volumes:
+            documents = files[start:start + volume['file_count']]
+            start += volume['file_count']
+            front_matter = [os.path.join(work_dir, volume['cover']), os.path.join(work_dir, volume['toc'])]
+            volume_layout = await asyncio.to_thread(preview_renderer.build_layout, bundle_id, work_dir,
+                                                    layout_parts(front_matter, documents), volume['volume'])
+            if volume['volume'] == 1:
+                layout = volume_layout
+        preview_renderer.save_layout(bundle_id, work_dir, layout)
+    workdir_manager.acquire(bundle_id)
+    prerender = asyncio.get_running_loop().run_in_executor(
+        None, preview_renderer.prerender, layout, PREVIEW_PRERENDER_PAGES
+    )
+    prerender.add_done_callback(lambda _: workdir_manager.release(bundle_id))
+    
+    if volumes is None:
+        # Compile final bundle
+        await manager.send_progress(client_id, {
+            'type': 'compiling_bundle',
+            'progress': 90
+        })
+        
+        output_path = await run_stage(manifest, 'compile', stage_timings, lambda: compile_final_bundle(
+            work_dir, cover_path, toc_path, processed_files, buffers=buffers
+        ))
+    else:
+        output_path = os.path.join(work_dir, volumes[0]['filename'])
+    
+    # Upload to S3/MinIO
+    await manager.send_progress(client_id, {
+        'type': 'uploading',
+        'progress': 95
+    })
+    
+    if volumes is None:
+        download_url = await run_stage(manifest, 'upload', stage_timings, lambda: upload_to_storage(
+            output_path, bundle_id
+        ))
+    else:
+        urls = await run_stage(manifest, 'upload', stage_timings, lambda: upload_volumes(
+            work_dir, bundle_id, volumes
+        ))
+        volumes = [dict(volume, download_url=url) for volume, url in zip(volumes, urls)]
+        download_url = urls[0]
+    
+    # Record the finished bundle in the catalog
+    catalog.record_bundle({
+        'id': bundle_id,
+        'name': cover_info.get('title') or None,
+        'client_id': client_id,
+        'theme': theme,
+        'status': 'completed',
+        'file_count': len(processed_files),
+        'total_pages': processed_files.total_pages,
+        'output_path': output_path,
+        'download_url': download_url,
+        'cover_info': cover_info,
+        'stage_timings': stage_timings,
+        'volumes': volumes
+    }, [f.metadata for f in processed_files])
+    
+    # Send completion
+    await manager.send_progress(client_id, {
+        'type': 'bundle_complete',
+        'progress': 100,
+        'download_url': download_url,
+        'bundle_id': bundle_id,
+        **({'volumes': volumes} if volumes else {})
+    })
+    
+    return download_url
+
+async def create_enhanced_cover_page(work_dir: str, cover_info: dict, theme: str, processed_files: FileBatch,
+                                     filename: str = "cover.pdf", buffers: Optional[DocumentBuffers] = None) -> str:
     """Create enhanced cover page with AI insights"""
-    cover_path = os.path.join(work_dir, "cover.pdf")
-    doc = SimpleDocTemplate(cover_path, pagesize=A4)
+    cover_path = os.path.join(work_dir, filename)
     story = []
     
     # Enhanced title with AI insights
     title = cover_info.get('title', 'Document Bundle')
     if not title:
         # Auto-generate title based on content
-        classifications = [f['metadata']['classification'] for f in processed_files]
-        if classifications:
-            most_common = max(set(classifications), key=classifications.count)
+        most_common = processed_files.most_common_classification()
+        if most_common:
             title = f"{most_common.title()} Bundle"
     
     story.append(Paragraph(title, getSampleStyleSheet()['Heading1']))
@@ -502,29 +1449,32 @@ async def create_enhanced_cover_page(work_dir: str, cover_info: dict, theme: str
     story.append(Spacer(1, 20))
     story.append(Paragraph("<b>Bundle Summary:</b>", getSampleStyleSheet()['Heading2']))
     
-    total_pages = sum(f['metadata']['page_count'] for f in processed_files)
     story.append(Paragraph(f"Total Documents: {len(processed_files)}", getSampleStyleSheet()['Normal']))
-    story.append(Paragraph(f"Total Pages: {total_pages}", getSampleStyleSheet()['Normal']))
+    story.append(Paragraph(f"Total Pages: {processed_files.total_pages}", getSampleStyleSheet()['Normal']))
     
     # Document types breakdown
-    classifications = {}
-    for f in processed_files:
-        cls = f['metadata']['classification']
-        classifications[cls] = classifications.get(cls, 0) + 1
-    
+    classifications = processed_files.classification_counts
     if classifications:
         story.append(Spacer(1, 10))
         story.append(Paragraph("<b>Document Types:</b>", getSampleStyleSheet()['Normal']))
         for cls, count in classifications.items():
             story.append(Paragraph(f"• {cls.title()}: {count}", getSampleStyleSheet()['Normal']))
     
-    doc.build(story)
-    return cover_path
+    # Bundle overview distilled from the per-document summaries
+    overview = ai_classifier.summarizer.summarize(
+        '\n\n'.join(f.summary or '' for f in processed_files)
+    )
+    if overview:
+        story.append(Spacer(1, 10))
+        story.append(Paragraph("<b>Overview:</b>", getSampleStyleSheet()['Normal']))
+        story.append(Paragraph(escape(overview), getSampleStyleSheet()['Normal']))
+    
+    return write_story_pdf(cover_path, story, buffers)
 
-async def create_ai_enhanced_toc(work_dir: str, processed_files: List[Dict], theme: str) -> str:
+async def create_ai_enhanced_toc(work_dir: str, processed_files: FileBatch, theme: str,
+                                 filename: str = "toc.pdf", buffers: Optional[DocumentBuffers] = None) -> str:
     """Create AI-enhanced table of contents"""
-    toc_path = os.path.join(work_dir, "toc.pdf")
-    doc = SimpleDocTemplate(toc_path, pagesize=A4)
+    toc_path = os.path.join(work_dir, filename)
     story = []
     
     story.append(Paragraph("Table of Contents", getSampleStyleSheet()['Heading1']))
@@ -533,7 +1483,7 @@ async def create_ai_enhanced_toc(work_dir: str, processed_files: List[Dict], the
     # Group by classification
     grouped_files = {}
     for f in processed_files:
-        cls = f['metadata']['classification']
+        cls = f.classification
         if cls not in grouped_files:
             grouped_files[cls] = []
         grouped_files[cls].append(f)
@@ -544,42 +1494,207 @@ async def create_ai_enhanced_toc(work_dir: str, processed_files: List[Dict], the
         story.append(Paragraph(f"<b>{classification.title()}</b>", getSampleStyleSheet()['Heading2']))
         
         for f in files:
-            filename = f['metadata']['filename']
-            summary = f['metadata']['summary'][:50] + "..." if len(f['metadata']['summary']) > 50 else f['metadata']['summary']
+            filename = escape(f.filename)
+            summary = escape(make_snippet(f.summary or '', 80))
             
             story.append(Paragraph(f"• {filename} (p.{page_num}) - {summary}", getSampleStyleSheet()['Normal']))
-            page_num += f['metadata']['page_count']
+            page_num += f.page_count
         
         story.append(Spacer(1, 10))
     
-    doc.build(story)
-    return toc_path
+    return write_story_pdf(toc_path, story, buffers)
+
+def write_story_pdf(path: str, story: list, buffers: Optional[DocumentBuffers] = None) -> str:
+    """Typeset a ReportLab story as an A4 PDF at path, keeping the bytes in buffers for the merge"""
+    output = io.BytesIO()
+    SimpleDocTemplate(output, pagesize=A4).build(story)
+    buffers = buffers if buffers is not None else DocumentBuffers(0, 0)
+    return buffers.write(path, output.getvalue())
 
-async def compile_final_bundle(work_dir: str, cover_path: str, toc_path: str, processed_files: List[Dict]) -> str:
-    """Compile final PDF bundle"""
+async def compile_final_bundle(work_dir: str, cover_path: str, toc_path: str, processed_files: FileBatch,
+                               linearize: bool = LINEARIZE_BUNDLES, buffers: Optional[DocumentBuffers] = None) -> str:
+    """Compile final PDF bundle, optionally linearized for fast web view
+    
+    Cover, TOC and documents held in buffers are merged from memory.
+    """
+    buffers = buffers if buffers is not None else DocumentBuffers(0, 0)
     output_path = os.path.join(work_dir, "bundle.pdf")
     merger = fitz.open()
     
-    # Add cover page
-    if os.path.exists(cover_path):
-        merger.insert_pdf(fitz.open(cover_path))
-    
-    # Add table of contents
-    if os.path.exists(toc_path):
-        merger.insert_pdf(fitz.open(toc_path))
-    
-    # Add processed files
-    for f in processed_files:
-        pdf_path = f['pdf_path']
-        if os.path.exists(pdf_path):
-            merger.insert_pdf(fitz.open(pdf_path))
+    # Cover page, table of contents, then the processed files
+    for pdf_path in (cover_path, toc_path, *(f.pdf_path for f in processed_files)):
+        if pdf_path and buffers.exists(pdf_path):
+            with buffers.open_pdf(pdf_path) as part:
+                merger.insert_pdf(part)
     
     merger.save(output_path)
     merger.close()
     
+    if linearize:
+        linearize_pdf(output_path)
+    
     return output_path
 
-async def upload_to_storage(file_path: str, bundle_id: str) -> str:
+async def compile_bundle_volumes(work_dir: str, cover_info: dict, theme: str, processed_files: FileBatch,
+                                 max_bytes: int, linearize: bool = LINEARIZE_BUNDLES,
+                                 parallel: bool = True) -> List[Dict[str, Any]]:
+    """Compile the bundle as volumes of at most max_bytes each, merged concurrently
+    
+    Split points fall between documents and are planned from the parts'
+    page counts and PDF sizes before anything is merged. Volume 1 has the
+    full cover and a TOC covering every volume; later volumes open with a
+    continuation cover and their own part of the TOC. Document pages are
+    numbered through the whole bundle. Up to VOLUME_COMPILE_WORKERS volumes
+    are merged at once, each in its own process holding only its documents
+    (in-thread, one at a time, without parallel). A volume that still comes out
+    over the cap is re-planned with a tighter budget; a single document
+    larger than the cap gets a volume to itself.
+    """
+    files = list(processed_files)
+    sizes = [os.path.getsize(f.pdf_path) if f.pdf_path and os.path.exists(f.pdf_path) else 0 for f in files]
+    budget = max_bytes - VOLUME_FRONT_MATTER_BYTES
+    slots = asyncio.Semaphore(max(1, VOLUME_COMPILE_WORKERS))
+    
+    async def compile_in_process(task: Dict[str, Any]) -> Dict[str, Any]:
+        async with slots:
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, VOLUME_SCRIPT,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+            stdout, stderr = await process.communicate(json.dumps(task).encode())
+        if process.returncode != 0:
+            raise RuntimeError(f"Compiling {os.path.basename(task['output_path'])} failed: "
+                               f"{stderr.decode(errors='replace')[-500:]}")
+        # The result is the last line; libraries may print notices before it
+        return json.loads(stdout.decode().strip().splitlines()[-1])
+    
+    for attempt in range(VOLUME_PLAN_ATTEMPTS):
+        plan = plan_volumes(sizes, max(budget, 1))
+        volumes = await create_volume_front_matter(work_dir, cover_info, theme, processed_files, plan)
+        tasks = [
+            {
+                'front_matter': [os.path.join(work_dir, volume['cover']), os.path.join(work_dir, volume['toc'])],
+                'parts': [files[i].pdf_path for i in indices],
+                'output_path': os.path.join(work_dir, volume['filename']),
+                'first_page': volume['first_page']
+            }
+            for volume, indices in zip(volumes, plan)
+        ]
+        if parallel and VOLUME_COMPILE_WORKERS > 1 and len(tasks) > 1:
+            results = await asyncio.gather(*(compile_in_process(task) for task in tasks))
+        else:
+            results = [await asyncio.to_thread(compile_volume, **task) for task in tasks]
+        if linearize:
+            await asyncio.gather(*(asyncio.to_thread(linearize_pdf, task['output_path']) for task in tasks))
+        for volume, result, task in zip(volumes, results, tasks):
+            volume.update(result, bytes=os.path.getsize(task['output_path']))
+        
+        oversized = [volume for volume in volumes if volume['bytes'] > max_bytes and volume['file_count'] > 1]
+        if not oversized:
+            break
+        budget = int(budget * max_bytes / max(volume['bytes'] for volume in oversized) * 0.95)
+        logger.info(f"Volume estimate for {work_dir} was {len(oversized)} volume(s) over the cap; re-planning")
+    
+    for volume in volumes:
+        if volume['bytes'] > max_bytes:
+            logger.warning(f"Volume {volume['volume']} of {work_dir} is {volume['bytes']} bytes, "
+                           f"over the {max_bytes} byte cap")
+    return volumes
+
+async def create_volume_front_matter(work_dir: str, cover_info: dict, theme: str, processed_files: FileBatch,
+                                     plan: List[List[int]]) -> List[Dict[str, Any]]:
+    """Number the pages of each planned volume and render its cover and TOC"""
+    files = list(processed_files)
+    volumes = []
+    next_page = 1
+    for number, indices in enumerate(plan, start=1):
+        pages = sum(files[i].page_count or 0 for i in indices)
+        volumes.append({
+            'volume': number,
+            'filename': volume_filename(number),
+            'cover': volume_filename(number, 'cover'),
+            'toc': volume_filename(number, 'toc'),
+            'file_count': len(indices),
+            'first_page': next_page,
+            'last_page': next_page + pages - 1
+        })
+        next_page += pages
+    
+    for volume in volumes:
+        if volume['volume'] == 1:
+            first_cover_info = dict(cover_info, volume=f"1 of {len(volumes)}") if len(volumes) > 1 else cover_info
+            await create_enhanced_cover_page(work_dir, first_cover_info, theme, processed_files,
+                                             filename=volume['cover'])
+        else:
+            await create_volume_cover(work_dir, cover_info, volume, len(volumes))
+        await create_volume_toc(work_dir, files, plan, volumes, volume['volume'])
+    return volumes
+
+def page_range(volume: Dict[str, Any]) -> str:
+    if volume['last_page'] < volume['first_page']:
+        return "no pages"
+    return f"pages {volume['first_page']}-{volume['last_page']}"
+
+async def create_volume_cover(work_dir: str, cover_info: dict, volume: Dict[str, Any], total: int) -> str:
+    """Continuation cover for the second and later volumes"""
+    styles = getSampleStyleSheet()
+    story = [
+        Paragraph(escape(cover_info.get('title') or 'Document Bundle'), styles['Heading1']),
+        Spacer(1, 30),
+        Paragraph(f"Volume {volume['volume']} of {total}", styles['Heading2']),
+        Paragraph(f"Documents: {volume['file_count']} ({page_range(volume)})", styles['Normal']),
+        Spacer(1, 10),
+        Paragraph(f"Continued from Volume {volume['volume'] - 1}. The full table of contents is in Volume 1.",
+                  styles['Normal'])
+    ]
+    return write_story_pdf(os.path.join(work_dir, volume['cover']), story)
+
+async def create_volume_toc(work_dir: str, files: List[FileRecord], plan: List[List[int]],
+                            volumes: List[Dict[str, Any]], number: int) -> str:
+    """TOC of every volume for volume 1, of its own documents for the others, with bundle page numbers"""
+    styles = getSampleStyleSheet()
+    story = [Paragraph("Table of Contents" if number == 1 else "Table of Contents (continued)", styles['Heading1']),
+             Spacer(1, 30)]
+    
+    for volume, indices in zip(volumes, plan):
+        if number != 1 and volume['volume'] != number:
+            continue
+        story.append(Paragraph(f"<b>Volume {volume['volume']}</b> ({page_range(volume)})", styles['Heading2']))
+        page_num = volume['first_page']
+        for i in indices:
+            f = files[i]
+            classification = escape((f.classification or 'other').title())
+            summary = escape(make_snippet(f.summary or '', 80))
+            story.append(Paragraph(f"• {escape(f.filename)} - {classification} (p.{page_num}) - {summary}",
+                                   styles['Normal']))
+            page_num += f.page_count or 0
+        story.append(Spacer(1, 10))
+    
+    return write_story_pdf(os.path.join(work_dir, volumes[number - 1]['toc']), story)
+
+def linearize_pdf(pdf_path: str) -> bool:
+    """Rewrite a PDF in place as linearized ("fast web view") using qpdf
+
+    MuPDF no longer writes linearized files, so this needs the qpdf binary;
+    without it the bundle is left as-is.
+    """
+    qpdf = shutil.which('qpdf')
+    if qpdf is None:
+        logger.warning("Linearization requested but qpdf is not installed")
+        return False
+    linear_path = f"{pdf_path}.linear"
+    # qpdf exits with 3 when it succeeded with warnings
+    result = subprocess.run([qpdf, '--linearize', pdf_path, linear_path], capture_output=True)
+    if result.returncode not in (0, 3):
+        logger.warning(f"qpdf linearization failed: {result.stderr.decode(errors='replace')}")
+        if os.path.exists(linear_path):
+            os.remove(linear_path)
+        return False
+    os.replace(linear_path, pdf_path)
+    return True
+
+async def upload_to_storage(file_path: str, bundle_id: str, filename: str = "bundle.pdf",
+                            local_url: Optional[str] = None) -> str:
     """Upload bundle to S3/MinIO"""
     try:
         bucket_name = "pdf-bundles"
@@ -591,7 +1706,7 @@ async def upload_to_storage(file_path: str, bundle_id: str) -> str:
             s3_client.create_bucket(Bucket=bucket_name)
         
         # Upload file
-        key = f"{bundle_id}/bundle.pdf"
+        key = f"{bundle_id}/{filename}"
         s3_client.upload_file(file_path, bucket_name, key)
         
         # Generate presigned URL
@@ -605,7 +1720,73 @@ async def upload_to_storage(file_path: str, bundle_id: str) -> str:
     except Exception as e:
         logger.error(f"Upload failed: {e}")
         # Fallback to local file
-        return f"/static/{bundle_id}/bundle.pdf"
+        return local_url or f"/static/{bundle_id}/bundle.pdf"
+
+async def upload_volumes(work_dir: str, bundle_id: str, volumes: List[Dict[str, Any]]) -> List[str]:
+    """Upload every volume of a bundle; returns their download URLs in volume order"""
+    return [
+        await upload_to_storage(os.path.join(work_dir, volume['filename']), bundle_id, volume['filename'],
+                                f"/api/bundle/{bundle_id}/volumes/{volume['volume']}/download")
+        for volume in volumes
+    ]
+
+# Local bundle download (the fallback URL returned by upload_to_storage)
+@app.api_route("/static/{bundle_id}/bundle.pdf", methods=["GET", "HEAD"])
+@app.api_route("/api/bundle/{bundle_id}/download", methods=["GET", "HEAD"])
+async def download_bundle(request: Request, bundle_id: str):
+    """Serve a finished bundle from UPLOAD_DIR with ETag and HTTP Range support
+
+    With BUNDLE_ACCEL_REDIRECT_PREFIX set, the transfer is handed to the
+    reverse proxy (nginx X-Accel-Redirect) so it is sent with sendfile.
+    """
+    return await serve_bundle_file(request, bundle_id, "bundle.pdf", f"bundle-{bundle_id}.pdf")
+
+@app.api_route("/api/bundle/{bundle_id}/volumes/{volume}/download", methods=["GET", "HEAD"])
+async def download_bundle_volume(request: Request, bundle_id: str, volume: int):
+    """Serve one volume of a bundle compiled in volumes"""
+    if volume < 1:
+        raise HTTPException(status_code=404, detail="Bundle not found")
+    return await serve_bundle_file(request, bundle_id, volume_filename(volume),
+                                   f"bundle-{bundle_id}-vol{volume:02d}.pdf")
+
+async def serve_bundle_file(request: Request, bundle_id: str, name: str, filename: str):
+    try:
+        uuid.UUID(bundle_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Bundle not found")
+    
+    path = os.path.join(UPLOAD_DIR, bundle_id, name)
+    try:
+        stat_result = await asyncio.to_thread(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Bundle not found")
+    
+    # Bundles are written once, so inode, size and mtime identify the content
+    etag = f'"{stat_result.st_ino:x}-{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+    headers = {'ETag': etag, 'Cache-Control': 'private, max-age=3600'}
+    
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]):
+        return Response(status_code=304, headers=headers)
+    
+    workdir_manager.touch(bundle_id)
+    if BUNDLE_ACCEL_REDIRECT_PREFIX:
+        headers['X-Accel-Redirect'] = f"{BUNDLE_ACCEL_REDIRECT_PREFIX}/{bundle_id}/{name}"
+        headers['Content-Disposition'] = f'inline; filename="{filename}"'
+        return Response(media_type='application/pdf', headers=headers)
+    
+    # FileResponse handles Range/If-Range and uses the server's pathsend extension when offered;
+    # the lease is held until the body has been sent
+    workdir_manager.acquire(bundle_id)
+    return FileResponse(
+        path,
+        media_type='application/pdf',
+        headers=headers,
+        filename=filename,
+        stat_result=stat_result,
+        content_disposition_type='inline',
+        background=BackgroundTask(workdir_manager.release, bundle_id)
+    )
 
 # Health check endpoint
 @app.get("/api/health")
@@ -613,28 +1794,213 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "version": "2.0.0", "features": ["ai", "websocket", "realtime"]}
 
+@app.get("/api/scheduler")
+async def scheduler_stats():
+    """Build queue depth, running builds and wait times per tenant"""
+    return build_scheduler.stats()
+
+# Admin profiling endpoints
+@app.get("/api/admin/event-loop")
+async def event_loop_stats(request: Request):
+    """Event-loop lag percentiles and the stacks of recent stalls"""
+    require_admin(request)
+    return loop_monitor.stats()
+
+@app.get("/api/admin/profiling")
+async def get_profiling_settings(request: Request):
+    require_admin(request)
+    return profiling.settings()
+
+@app.put("/api/admin/profiling")
+async def update_profiling_settings(settings: ProfilingSettings, request: Request):
+    """Turn sampled build profiling on or off and set the share of builds profiled"""
+    require_admin(request)
+    profiling.update(settings.enabled, settings.sample_rate, settings.interval_ms)
+    return profiling.settings()
+
+@app.get("/api/admin/bundles/{bundle_id}/profile")
+async def get_bundle_profile(bundle_id: str, request: Request, format: str = "collapsed"):
+    """Stack samples of a profiled build
+    
+    ``collapsed`` returns one ``frame;frame;frame count`` line per stack, ready
+    for flamegraph.pl or speedscope; ``json`` adds the profile metadata and
+    the functions with the most self samples.
+    """
+    require_admin(request)
+    if not is_uuid(bundle_id):
+        raise HTTPException(status_code=404, detail="Bundle not found")
+    profile = load_profile(os.path.join(UPLOAD_DIR, bundle_id))
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No profile recorded for this bundle")
+    meta, collapsed = profile
+    if format == "collapsed":
+        return Response(content=collapsed, media_type="text/plain")
+    if format == "json":
+        return {**meta, 'bundle_id': bundle_id, 'hottest': hottest_frames(collapsed), 'collapsed': collapsed}
+    raise HTTPException(status_code=400, detail="format must be collapsed or json")
+
+# Bundle catalog endpoints
+@app.get("/api/bundles")
+async def list_bundles(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    client_id: Optional[str] = None,
+    status: Optional[str] = None,
+    classification: Optional[str] = None,
+    q: Optional[str] = None
+):
+    """List catalogued bundles, newest first, with cursor pagination"""
+    try:
+        return catalog.list_bundles(
+            limit=limit,
+            cursor=cursor,
+            client_id=client_id,
+            status=status,
+            classification=classification,
+            query=q
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/bundles/{bundle_id}")
+async def get_bundle(bundle_id: str):
+    """Get a catalogued bundle with its files"""
+    bundle = catalog.get_bundle(bundle_id)
+    if bundle is None:
+        raise HTTPException(status_code=404, detail="Bundle not found")
+    return bundle
+
+# Page preview endpoint
+@app.get("/api/bundle/{bundle_id}/pages/{page_number}")
+async def get_page_preview(bundle_id: str, page_number: int, width: int = DEFAULT_WIDTH, format: str = 'webp',
+                           volume: Optional[int] = None):
+    """Render a low-resolution preview of one bundle page (1-based), or of a page of one volume's file"""
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    try:
+        uuid.UUID(bundle_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Bundle not found")
+    
+    layout = preview_renderer.get_layout(bundle_id, os.path.join(UPLOAD_DIR, bundle_id), volume)
+    if layout is None:
+        raise HTTPException(status_code=404, detail="Bundle not found")
+    try:
+        with workdir_manager.lease(bundle_id):
+            image = await asyncio.to_thread(preview_renderer.render, layout, page_number, width, format)
+    except IndexError:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return Response(
+        content=image,
+        media_type=FORMATS[format],
+        headers={'Cache-Control': 'public, max-age=86400'}
+    )
+
+# Full-text search endpoint
+@app.get("/api/search")
+async def search_bundles(q: str, limit: int = 20, offset: int = 0, bundle_id: Optional[str] = None):
+    """Search extracted text across all bundles"""
+    try:
+        hits = await asyncio.to_thread(search_index.search, q, limit=limit, offset=offset, bundle_id=bundle_id)
+    except Exception as e:
+        logger.error(f"Search failed for {q!r}: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    bundles = list(dict.fromkeys(hit['bundle_id'] for hit in hits))
+    return {"query": q, "bundles": bundles, "results": hits}
+
 # AI endpoints
 @app.post("/api/classify")
 async def classify_document(text: str):
     """Classify document using AI"""
-    classifier = AIDocumentClassifier()
-    classification = await classifier.classify_document(text)
-    return {"classification": classification}
+    return await ai_classifier.classify_with_confidence(text)
 
 @app.post("/api/summarize")
 async def summarize_document(text: str):
     """Summarize document using AI"""
-    classifier = AIDocumentClassifier()
-    summary = await classifier.summarize_document(text)
+    summary = await ai_classifier.summarize_document(text)
     return {"summary": summary}
 
 @app.post("/api/detect-sensitive")
 async def detect_sensitive_data(text: str):
     """Detect sensitive data in document"""
-    classifier = AIDocumentClassifier()
-    sensitive_data = await classifier.detect_sensitive_data(text)
+    sensitive_data = await ai_classifier.detect_sensitive_data(text)
     return {"sensitive_data": sensitive_data}
 
+# Batched AI endpoints
+async def read_batch_documents(request: Request) -> List[BatchDocument]:
+    """Parse a JSON ({"documents": [...]}) or NDJSON (one document per line) body"""
+    body = await request.body()
+    try:
+        if request.headers.get('content-type', '').startswith('application/x-ndjson'):
+            documents = [
+                BatchDocument(**json.loads(line))
+                for line in body.decode('utf-8').splitlines()
+                if line.strip()
+            ]
+        else:
+            documents = BatchRequest(**json.loads(body)).documents
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {e}")
+    if len(documents) > BATCH_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {BATCH_MAX_DOCUMENTS} documents"
+        )
+    return documents
+
+async def run_batch(request: Request, operation, result_key: str):
+    """Apply operation to every document concurrently and return per-item results
+
+    Results are streamed as NDJSON in completion order when the client sends
+    ``Accept: application/x-ndjson``; otherwise a JSON list in input order.
+    """
+    documents = await read_batch_documents(request)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def process(index: int, document: BatchDocument) -> Dict[str, Any]:
+        item = {'index': index, 'id': document.id}
+        async with semaphore:
+            try:
+                item[result_key] = await operation(document.text)
+            except Exception as e:
+                logger.error(f"Batch item {index} failed: {e}")
+                item['error'] = str(e)
+        return item
+
+    tasks = [process(i, doc) for i, doc in enumerate(documents)]
+
+    if 'application/x-ndjson' in request.headers.get('accept', ''):
+        async def stream():
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + '\n'
+        return StreamingResponse(stream(), media_type='application/x-ndjson')
+
+    results = await asyncio.gather(*tasks)
+    return {"count": len(results), "results": results}
+
+@app.post("/api/classify/batch")
+async def classify_documents_batch(request: Request):
+    """Classify many documents in one request: batched model server prompts, else a single vectorized pass"""
+    documents = await read_batch_documents(request)
+    predictions = await ai_classifier.classify_many([document.text for document in documents])
+    results = [
+        dict(prediction, index=i, id=document.id)
+        for i, (document, prediction) in enumerate(zip(documents, predictions))
+    ]
+    if 'application/x-ndjson' in request.headers.get('accept', ''):
+        return StreamingResponse((json.dumps(item) + '\n' for item in results), media_type='application/x-ndjson')
+    return {"count": len(results), "results": results}
+
+@app.post("/api/summarize/batch")
+async def summarize_documents_batch(request: Request):
+    """Summarize many documents in one request"""
+    return await run_batch(request, ai_classifier.summarize_document, 'summary')
+
+@app.post("/api/detect-sensitive/batch")
+async def detect_sensitive_data_batch(request: Request):
+    """Detect sensitive data in many documents in one request"""
+    return await run_batch(request, ai_classifier.detect_sensitive_data, 'sensitive_data')
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,198 @@
+import io
+import os
+import json
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import fitz  # PyMuPDF
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_FILE = "pages.json"
+DEFAULT_WIDTH = 400
+MIN_WIDTH = 50
+MAX_WIDTH = 2000
+FORMATS = {'webp': 'image/webp', 'png': 'image/png'}
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LRUByteCache:
+    """Thread-safe LRU cache bounded by the total size of its byte values"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Tuple, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous)
+            self._items[key] = value
+            self.current_bytes += len(value)
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._items),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+def layout_path(work_dir: str, volume: Optional[int] = None) -> str:
+    if volume is None:
+        return os.path.join(work_dir, LAYOUT_FILE)
+    stem, ext = os.path.splitext(LAYOUT_FILE)
+    return os.path.join(work_dir, f"{stem}-vol{volume:02d}{ext}")
+
+
+class PagePreviewRenderer:
+    """Renders bundle pages to WebP/PNG thumbnails from their source parts.
+
+    A bundle's layout maps bundle page numbers onto the part PDFs it was
+    compiled from (cover, TOC, exhibits). Thumbnails are cached by the part's
+    content hash, so identical exhibits share cache entries across bundles and
+    pages can be rendered before the merged bundle exists.
+    """
+
+    def __init__(self, cache: LRUByteCache):
+        self.cache = cache
+        self._layouts: Dict[Tuple[str, Optional[int]], List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def build_layout(self, bundle_id: str, work_dir: str, parts: List[Dict[str, Any]],
+                     volume: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Record which part PDF backs each bundle page
+
+        ``parts`` is an ordered list of dicts with ``pdf_path`` and optionally
+        ``content_hash`` and ``page_count``; missing values are computed.
+        A bundle compiled as volumes has one layout per volume number.
+        """
+        layout = []
+        start = 1
+        for part in parts:
+            pdf_path = part['pdf_path']
+            if not os.path.exists(pdf_path):
+                continue
+            page_count = part.get('page_count')
+            if not page_count:
+                with fitz.open(pdf_path) as doc:
+                    page_count = len(doc)
+            layout.append({
+                'pdf_path': pdf_path,
+                'content_hash': part.get('content_hash') or hash_file(pdf_path),
+                'first_page': start,
+                'page_count': page_count
+            })
+            start += page_count
+
+        self.save_layout(bundle_id, work_dir, layout, volume)
+        return layout
+
+    def save_layout(self, bundle_id: str, work_dir: str, layout: List[Dict[str, Any]],
+                    volume: Optional[int] = None) -> None:
+        with open(layout_path(work_dir, volume), 'w') as f:
+            json.dump(layout, f)
+        with self._lock:
+            self._layouts[(bundle_id, volume)] = layout
+
+    def get_layout(self, bundle_id: str, work_dir: str,
+                   volume: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """Return the layout for a bundle (or one of its volumes) from memory or its work directory"""
+        with self._lock:
+            layout = self._layouts.get((bundle_id, volume))
+        if layout is not None:
+            return layout
+        try:
+            with open(layout_path(work_dir, volume), 'r') as f:
+                layout = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._layouts[(bundle_id, volume)] = layout
+        return layout
+
+    def forget_layout(self, bundle_id: str) -> None:
+        """Drop a bundle's cached layouts, e.g. after its work directory was evicted"""
+        with self._lock:
+            for key in [key for key in self._layouts if key[0] == bundle_id]:
+                del self._layouts[key]
+
+    def render(self, layout: List[Dict[str, Any]], page_number: int,
+               width: int = DEFAULT_WIDTH, fmt: str = 'webp') -> bytes:
+        """Return a thumbnail of a 1-based bundle page, rendering on cache miss"""
+        part = self._find_part(layout, page_number)
+        if part is None:
+            raise IndexError(page_number)
+        width = max(MIN_WIDTH, min(int(width), MAX_WIDTH))
+        local_page = page_number - part['first_page']
+        key = (part['content_hash'], local_page, width, fmt)
+
+        image = self.cache.get(key)
+        if image is None:
+            image = self._render_page(part['pdf_path'], local_page, width, fmt)
+            self.cache.put(key, image)
+        return image
+
+    def prerender(self, layout: List[Dict[str, Any]], pages: int,
+                  width: int = DEFAULT_WIDTH, fmt: str = 'webp') -> int:
+        """Warm the cache with the first pages of a bundle; returns pages rendered"""
+        total = sum(part['page_count'] for part in layout)
+        rendered = 0
+        for page_number in range(1, min(pages, total) + 1):
+            try:
+                self.render(layout, page_number, width, fmt)
+                rendered += 1
+            except Exception as e:
+                logger.warning(f"Preview prerender failed for page {page_number}: {e}")
+        return rendered
+
+    def _find_part(self, layout: List[Dict[str, Any]], page_number: int) -> Optional[Dict[str, Any]]:
+        for part in layout:
+            if part['first_page'] <= page_number < part['first_page'] + part['page_count']:
+                return part
+        return None
+
+    def _render_page(self, pdf_path: str, page_index: int, width: int, fmt: str) -> bytes:
+        with fitz.open(pdf_path) as doc:
+            page = doc[page_index]
+            zoom = width / page.rect.width
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        if fmt == 'png':
+            return pix.tobytes('png')
+        buffer = io.BytesIO()
+        Image.frombytes('RGB', (pix.width, pix.height), pix.samples).save(buffer, 'WEBP', quality=80, method=2)
+        return buffer.getvalue()
@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import time
+import random
+import threading
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FILE = "profile.collapsed"
+PROFILE_META_FILE = "profile.json"
+MAX_STACK_DEPTH = 128
+# Leaf frames of threads parked waiting for work (idle pool workers, sleepers); their samples are noise
+IDLE_LEAVES = {('thread.py', '_worker'), ('threading.py', 'wait'), ('queue.py', 'get')}
+
+
+class StackSampler:
+    """Samples the stacks of every thread in the process at a fixed interval.
+
+    Runs in its own daemon thread and only exists while a profiled build is
+    running, so there is no cost when profiling is off. Stacks are counted in
+    collapsed form (``thread;file:func;file:func count``), which flamegraph.pl
+    and speedscope read directly. Samples are process-wide: builds running
+    concurrently with a profiled one show up in its profile too, under their
+    own thread names.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.counts: Dict[str, int] = {}
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in
+                       sorted(self.counts.items(), key=lambda item: -item[1]))
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                key = ';'.join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+
+
+class ProfilingControl:
+    """Decides which builds are profiled: on request, or a sampled share while toggled on"""
+
+    def __init__(self, enabled: bool = False, sample_rate: float = 0.0, interval_ms: float = 10.0):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.interval_ms = interval_ms
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def should_profile(self, requested: bool = False) -> bool:
+        if requested:
+            return True
+        return self.enabled and random.random() < self.sample_rate
+
+    def update(self, enabled: Optional[bool] = None, sample_rate: Optional[float] = None,
+               interval_ms: Optional[float] = None) -> None:
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_rate is not None:
+            self.sample_rate = min(1.0, max(0.0, sample_rate))
+        if interval_ms is not None:
+            self.interval_ms = max(1.0, interval_ms)
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'interval_ms': self.interval_ms,
+            'active': self.active
+        }
+
+    @contextmanager
+    def profile(self, work_dir: str, label: str, enabled: bool = True):
+        """Sample stacks for the duration of the block and save them in work_dir"""
+        if not enabled:
+            yield
+            return
+        sampler = StackSampler(self.interval_ms / 1000.0)
+        with self._lock:
+            self.active += 1
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            with self._lock:
+                self.active -= 1
+            try:
+                save_profile(work_dir, label, sampler)
+            except OSError as e:
+                logger.warning(f"Could not save profile for {label}: {e}")
+
+
+def save_profile(work_dir: str, label: str, sampler: StackSampler) -> None:
+    with open(os.path.join(work_dir, PROFILE_FILE), 'w') as f:
+        f.write(sampler.collapsed())
+    with open(os.path.join(work_dir, PROFILE_META_FILE), 'w') as f:
+        json.dump({
+            'label': label,
+            'interval_ms': sampler.interval * 1000,
+            'samples': sampler.samples,
+            'duration_seconds': round(sampler.duration, 3),
+            'created_at': datetime.now().isoformat()
+        }, f)
+    logger.info(f"Saved profile for {label}: {sampler.samples} samples over {sampler.duration:.1f}s")
+
+
+def load_profile(work_dir: str) -> Optional[Tuple[Dict[str, Any], str]]:
+    """Metadata and collapsed stacks of a saved profile, or None"""
+    try:
+        with open(os.path.join(work_dir, PROFILE_META_FILE), 'r') as f:
+            meta = json.load(f)
+        with open(os.path.join(work_dir, PROFILE_FILE), 'r') as f:
+            return meta, f.read()
+    except (OSError, ValueError):
+        return None
+
+
+def hottest_frames(collapsed: str, limit: int = 25) -> List[Dict[str, Any]]:
+    """Functions ranked by self samples (the leaf of each stack)"""
+    self_counts: Dict[str, int] = {}
+    for line in collapsed.splitlines():
+        stack, _, count = line.rpartition(' ')
+        leaf = stack.rsplit(';', 1)[-1]
+        self_counts[leaf] = self_counts.get(leaf, 0) + int(count)
+    ranked = sorted(self_counts.items(), key=lambda item: -item[1])[:limit]
+    return [{'frame': frame, 'samples': count} for frame, count in ranked]
@@ -0,0 +1,156 @@
+import os
+import re
+import html
+import sqlite3
+import threading
+import logging
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Page separator used by text extraction so page numbers survive into the index
+PAGE_SEPARATOR = '\f'
+
+SNIPPET_TOKENS = 12
+# Highlight markers FTS5 puts around matches; stripped from indexed text so only matches carry them
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+MAX_RESULTS = 200
+
+
+def highlight_snippet(snippet: str) -> str:
+    """HTML-escape a snippet's document text, then turn the highlight markers into <b> tags"""
+    return html.escape(snippet).replace(HIGHLIGHT_START, '<b>').replace(HIGHLIGHT_END, '</b>')
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """Turn free text into a safe FTS5 query (all terms must match)
+
+    A trailing ``*`` on a term is kept as a prefix search.
+    """
+    terms = re.findall(r'\w+\*?', query)
+    if not terms:
+        return None
+    parts = []
+    for term in terms:
+        if term.endswith('*'):
+            parts.append(f'"{term[:-1]}"*')
+        else:
+            parts.append(f'"{term}"')
+    return ' '.join(parts)
+
+
+class SearchIndex:
+    """Incremental SQLite FTS5 index of extracted document text, one row per page
+
+    FTS5 cannot index its UNINDEXED columns, so the ordinary ``page_files``
+    table maps file and bundle ids to page rowids; replacing or removing a
+    document deletes its pages by rowid instead of scanning the index.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5("
+            "text, bundle_id UNINDEXED, file_id UNINDEXED, filename UNINDEXED, page UNINDEXED, "
+            "tokenize = 'porter unicode61')"
+        )
+        with self._conn:
+            created = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'page_files'"
+            ).fetchone() is None
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS page_files ("
+                "page_rowid INTEGER PRIMARY KEY, file_id TEXT NOT NULL, bundle_id TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_page_files_file ON page_files(file_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_page_files_bundle ON page_files(bundle_id)")
+            if created:
+                # Indexes built before page_files existed
+                self._conn.execute("INSERT INTO page_files SELECT rowid, file_id, bundle_id FROM pages")
+
+    def index_document(self, bundle_id: str, file_id: str, filename: str, text_content: str) -> int:
+        """Index a document's text page by page, replacing any previous entry for file_id"""
+        pages = text_content.split(PAGE_SEPARATOR) if text_content else []
+        rows = [
+            (page_text.replace(HIGHLIGHT_START, '').replace(HIGHLIGHT_END, ''), bundle_id, file_id, filename, page_num)
+            for page_num, page_text in enumerate(pages, start=1)
+            if page_text.strip()
+        ]
+        with self._lock, self._conn:
+            self._delete_pages("file_id", file_id)
+            for row in rows:
+                rowid = self._conn.execute(
+                    "INSERT INTO pages (text, bundle_id, file_id, filename, page) VALUES (?, ?, ?, ?, ?)", row
+                ).lastrowid
+                self._conn.execute("INSERT INTO page_files VALUES (?, ?, ?)", (rowid, file_id, bundle_id))
+        return len(rows)
+
+    def remove_document(self, file_id: str) -> None:
+        """Drop every indexed page of one document"""
+        with self._lock, self._conn:
+            self._delete_pages("file_id", file_id)
+
+    def remove_bundle(self, bundle_id: str) -> None:
+        """Drop every indexed page that belongs to a bundle"""
+        with self._lock, self._conn:
+            self._delete_pages("bundle_id", bundle_id)
+
+    def _delete_pages(self, column: str, value: str) -> None:
+        """Delete pages found through page_files; the caller holds the lock and transaction"""
+        rowids = [(r[0],) for r in self._conn.execute(
+            f"SELECT page_rowid FROM page_files WHERE {column} = ?", (value,)
+        )]
+        if rowids:
+            self._conn.executemany("DELETE FROM pages WHERE rowid = ?", rowids)
+            self._conn.execute(f"DELETE FROM page_files WHERE {column} = ?", (value,))
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        bundle_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Return best-matching pages with highlighted snippets, ranked by BM25
+
+        Snippets are HTML: document text is escaped and matches are wrapped in <b>.
+        """
+        match = build_match_query(query)
+        if match is None:
+            return []
+        limit = max(1, min(int(limit), MAX_RESULTS))
+        sql = (
+            "SELECT bundle_id, file_id, filename, page, "
+            f"snippet(pages, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', {SNIPPET_TOKENS}) AS snippet, "
+            "bm25(pages) AS score "
+            "FROM pages WHERE pages MATCH ?"
+        )
+        params: List[Any] = [match]
+        if bundle_id:
+            sql += " AND bundle_id = ?"
+            params.append(bundle_id)
+        sql += " ORDER BY score LIMIT ? OFFSET ?"
+        params.extend([limit, max(0, int(offset))])
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(r, snippet=highlight_snippet(r['snippet'])) for r in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_search_index(path: Optional[str] = None, default_dir: Optional[str] = None) -> SearchIndex:
+    """Open the search index at SEARCH_INDEX_PATH, or search.db in default_dir"""
+    path = path or os.environ.get('SEARCH_INDEX_PATH')
+    if not path:
+        path = os.path.join(default_dir or os.getcwd(), "search.db")
+    return SearchIndex(path)
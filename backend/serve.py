@@ -0,0 +1,174 @@
+"""Pre-forked production server for the bundler API.
+
+The parent process imports the app, warms the heavy libraries (PyMuPDF,
+ReportLab, OpenCV, the classifier and summarizer), freezes the heap and
+binds the listening socket. It then forks WEB_WORKERS uvicorn workers that
+share those pages copy-on-write and accept on the same socket. A worker
+exits after WORKER_MAX_REQUESTS requests (plus jitter), draining its
+background builds first, and the parent forks a replacement.
+
+Each worker has its own build scheduler, so BUILD_MAX_CONCURRENT applies
+per worker. Set PROGRESS_REDIS_URL when running more than one worker so
+WebSocket progress reaches clients connected to a different worker.
+
+Usage (from backend/):
+    WEB_WORKERS=4 python serve.py
+"""
+import io
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import random
+import logging
+import uvicorn
+
+logger = logging.getLogger("serve")
+
+HOST = os.environ.get('HOST', '0.0.0.0')
+PORT = int(os.environ.get('PORT', '8000'))
+WEB_WORKERS = int(os.environ.get('WEB_WORKERS', '1'))
+# Recycle a worker after this many requests (0 never); jitter keeps workers from restarting together
+WORKER_MAX_REQUESTS = int(os.environ.get('WORKER_MAX_REQUESTS', '1000'))
+WORKER_MAX_REQUESTS_JITTER = int(os.environ.get('WORKER_MAX_REQUESTS_JITTER', '100'))
+WORKER_GRACEFUL_TIMEOUT = int(os.environ.get('WORKER_GRACEFUL_TIMEOUT', '30'))
+LISTEN_BACKLOG = int(os.environ.get('LISTEN_BACKLOG', '2048'))
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'info')
+# Workers that die sooner than this after starting are restarted with a delay
+MIN_WORKER_UPTIME = 5.0
+
+WARM_TEXT = (
+    "This agreement is made between the parties. The invoice amount due is payable within thirty days. "
+    "The court will hear the brief on Monday. Please find the report and analysis attached. "
+)
+
+
+def warm_up():
+    """Import the app and run the first-use paths of the heavy libraries once"""
+    import fitz
+    import numpy as np
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph
+    import main
+    from ocr_preprocess import preprocess_for_ocr
+
+    start = time.perf_counter()
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), "warm up")
+        doc.tobytes()
+    SimpleDocTemplate(io.BytesIO()).build([Paragraph("warm up", getSampleStyleSheet()['Normal'])])
+    preprocess_for_ocr(np.full((64, 64), 255, dtype=np.uint8), 'fast', 300)
+
+    # Only the local classifier and summarizer: the LLM backend (if configured) is left untouched,
+    # so no model request or failure back-off state is created before the workers fork
+    main.ai_classifier.classify_batch([WARM_TEXT])
+    main.ai_classifier.summarizer.summarize(WARM_TEXT * 3)
+    main.SSN_PATTERN.findall(WARM_TEXT)
+    main.PHONE_PATTERN.findall(WARM_TEXT)
+
+    # The parent never serves; workers open their own SQLite handles after fork
+    main.catalog.close()
+    main.search_index.close()
+    logger.info(f"Warmed up in {time.perf_counter() - start:.2f}s")
+    return main
+
+
+def run_worker(app_module, index: int, sock: socket.socket):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    os.environ['WORKER_INDEX'] = str(index)
+    app_module.reopen_after_fork()
+    limit = None
+    if WORKER_MAX_REQUESTS > 0:
+        limit = WORKER_MAX_REQUESTS + random.randint(0, WORKER_MAX_REQUESTS_JITTER)
+    config = uvicorn.Config(app_module.app, log_level=LOG_LEVEL, limit_max_requests=limit,
+                            timeout_graceful_shutdown=WORKER_GRACEFUL_TIMEOUT)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """Forks the workers and replaces any that exit until asked to stop"""
+
+    def __init__(self, app_module, sock: socket.socket, workers: int):
+        self.app_module = app_module
+        self.sock = sock
+        self.worker_count = workers
+        self.workers = {}
+        self.stopping = False
+
+    def spawn(self, index: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app_module, index, self.sock)
+            except BaseException:
+                logger.exception(f"Worker {index} crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = (index, time.monotonic())
+        logger.info(f"Started worker {index} (pid {pid})")
+
+    def stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"Stopping {len(self.workers)} workers")
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for index in range(self.worker_count):
+            self.spawn(index)
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index, started = self.workers.pop(pid, (None, 0.0))
+            if index is None or self.stopping:
+                continue
+            if time.monotonic() - started < MIN_WORKER_UPTIME:
+                logger.error(f"Worker {index} (pid {pid}) exited right after starting; restarting in 1s")
+                time.sleep(1)
+            else:
+                logger.info(f"Worker {index} (pid {pid}) exited with status {status}; starting a replacement")
+            self.spawn(index)
+
+
+def main_cli():
+    logging.basicConfig(level=logging.INFO)
+    if not hasattr(os, 'fork'):
+        logger.warning("os.fork is unavailable; serving with a single worker")
+        uvicorn.run("main:app", host=HOST, port=PORT, log_level=LOG_LEVEL)
+        return
+    if WEB_WORKERS > 1 and not os.environ.get('PROGRESS_REDIS_URL'):
+        logger.warning("PROGRESS_REDIS_URL is not set: WebSocket progress only reaches clients "
+                       "connected to the worker running their build")
+
+    app_module = warm_up()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, PORT))
+    sock.listen(LISTEN_BACKLOG)
+    sock.set_inheritable(True)
+
+    # Keep the warmed objects out of the collector so workers do not touch (and copy) their pages
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Serving on http://{HOST}:{PORT} with {WEB_WORKERS} workers")
+    Supervisor(app_module, sock, max(1, WEB_WORKERS)).run()
+    sock.close()
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main_cli()
@@ -6,6 +6,7 @@ import uuid
 import tempfile
 import json
 from datetime import datetime
+from bundle_catalog import create_catalog
 from typing import List, Optional, Dict, Any
 import logging
 
@@ -29,6 +30,9 @@ TMP = tempfile.gettempdir()
 UPLOAD_DIR = os.path.join(TMP, "smart_pdf_bundler")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Persistent bundle catalog (SQLite by default, see BUNDLE_CATALOG_URL)
+catalog = create_catalog(default_dir=UPLOAD_DIR)
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
@@ -122,6 +126,22 @@ async def create_bundle(
             "status": "completed"
         }
         
+        catalog.record_bundle({
+            "id": bundle_id,
+            "name": cover_data.get("title") or None,
+            "theme": theme,
+            "status": "completed",
+            "cover_info": cover_data,
+            "created_at": bundle_info["created_at"]
+        }, [
+            {
+                "id": f["id"],
+                "filename": f["original_name"] or f["filename"],
+                "size": f["size"]
+            }
+            for f in processed_files
+        ])
+        
         return {
             "success": True,
             "bundle_id": bundle_id,
@@ -134,22 +154,17 @@ async def create_bundle(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/bundles")
-async def list_bundles():
-    """List all created bundles"""
+async def list_bundles(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    q: Optional[str] = None
+):
+    """List created bundles, newest first, with cursor pagination"""
     try:
-        # This would normally query a database
-        # For now, return a sample response
-        return {
-            "bundles": [
-                {
-                    "id": "sample-bundle-1",
-                    "name": "Sample Bundle",
-                    "file_count": 3,
-                    "created_at": datetime.now().isoformat(),
-                    "status": "completed"
-                }
-            ]
-        }
+        return catalog.list_bundles(limit=limit, cursor=cursor, status=status, query=q)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing bundles: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,127 @@
+import re
+import time
+import logging
+from typing import List, Optional
+import numpy as np
+from search_index import PAGE_SEPARATOR
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n\s*\n|\f')
+WORD_PATTERN = re.compile(r'[a-z0-9]{3,}')
+
+# OCR output often has no punctuation; long runs are chunked into pseudo-sentences
+MAX_SENTENCE_WORDS = 40
+MIN_SENTENCE_WORDS = 4
+
+STOP_WORDS = frozenset("""
+the and for are but not you all any can had her was one our out has him his how its
+may new now old see two who did get let put say she too use that with have this will
+your from they been were said each which their there what when than them then these
+would other into more some such only also over very just like upon shall page
+""".split())
+
+
+def make_snippet(text: str, max_chars: int = 80) -> str:
+    """Trim text to max_chars at a word boundary for one-line listings"""
+    text = ' '.join(text.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(' ', 1)[0]
+    return cut.rstrip(',;:') + '...'
+
+
+class ExtractiveSummarizer:
+    """TF-IDF sentence scorer with a bounded input size and time budget.
+
+    Only the first ``max_chars`` of a document are considered (sampled across
+    pages when page separators are present), so cost is linear in that cap
+    rather than in the document size.
+    """
+
+    def __init__(self, max_sentences: int = 3, max_chars: int = 20000,
+                 cost_limit_ms: float = 50.0, sample_pages: int = 6):
+        self.max_sentences = max_sentences
+        self.max_chars = max_chars
+        self.cost_limit_ms = cost_limit_ms
+        self.sample_pages = sample_pages
+
+    def summarize(self, text_content: str, max_sentences: Optional[int] = None) -> str:
+        """Return the highest-scoring sentences in document order"""
+        sentences = self.select_sentences(text_content, max_sentences)
+        if not sentences:
+            # Too short or unpunctuated to split; fall back to a bounded prefix
+            return make_snippet(text_content[:2000], 300)
+        return ' '.join(sentences)
+
+    def select_sentences(self, text_content: str, max_sentences: Optional[int] = None) -> List[str]:
+        """Pick the top sentences by length-normalised TF-IDF score"""
+        limit = max_sentences or self.max_sentences
+        deadline = time.perf_counter() + self.cost_limit_ms / 1000.0
+
+        sentences, term_ids, sentence_ids = self._tokenize(self._sample_text(text_content), deadline)
+        if len(sentences) <= limit or not term_ids:
+            return sentences[:limit]
+
+        terms = np.asarray(term_ids, dtype=np.int64)
+        owners = np.asarray(sentence_ids, dtype=np.int64)
+        n_sentences = len(sentences)
+        n_terms = int(terms.max()) + 1
+
+        # Unique (sentence, term) pairs give term frequencies and document frequencies
+        pairs, tf = np.unique(owners * n_terms + terms, return_counts=True)
+        pair_sentences = pairs // n_terms
+        pair_terms = pairs % n_terms
+        df = np.bincount(pair_terms, minlength=n_terms)
+        idf = np.log((1.0 + n_sentences) / (1.0 + df)) + 1.0
+
+        weights = np.bincount(pair_sentences, weights=tf * idf[pair_terms], minlength=n_sentences)
+        lengths = np.bincount(owners, minlength=n_sentences).astype(np.float64)
+        scores = weights / np.sqrt(np.maximum(lengths, 1.0))
+        # Mild lead bias: opening sentences usually state what a legal document is
+        scores *= 1.0 + 0.25 * (1.0 - np.arange(n_sentences) / n_sentences)
+
+        top = np.sort(np.argpartition(-scores, limit - 1)[:limit])
+        return [sentences[i] for i in top]
+
+    def _sample_text(self, text_content: str) -> str:
+        """Cap the text to max_chars, spreading the budget over sampled pages"""
+        if len(text_content) <= self.max_chars:
+            return text_content
+        if PAGE_SEPARATOR not in text_content:
+            return text_content[:self.max_chars]
+
+        pages = text_content.split(PAGE_SEPARATOR)
+        count = min(len(pages), self.sample_pages)
+        indices = sorted(set(np.linspace(0, len(pages) - 1, count).astype(int).tolist()))
+        per_page = self.max_chars // len(indices)
+        return PAGE_SEPARATOR.join(pages[i][:per_page] for i in indices)
+
+    def _tokenize(self, text: str, deadline: float):
+        """Split into sentences and map words to integer ids, stopping at the deadline"""
+        sentences: List[str] = []
+        term_ids: List[int] = []
+        sentence_ids: List[int] = []
+        vocabulary = {}
+
+        for raw in SENTENCE_SPLIT.split(text):
+            words = raw.split()
+            if len(words) < MIN_SENTENCE_WORDS:
+                continue
+            for start in range(0, len(words), MAX_SENTENCE_WORDS):
+                chunk = words[start:start + MAX_SENTENCE_WORDS]
+                if len(chunk) < MIN_SENTENCE_WORDS:
+                    continue
+                sentence = ' '.join(chunk)
+                index = len(sentences)
+                sentences.append(sentence)
+                for word in WORD_PATTERN.findall(sentence.lower()):
+                    if word in STOP_WORDS:
+                        continue
+                    term_ids.append(vocabulary.setdefault(word, len(vocabulary)))
+                    sentence_ids.append(index)
+            if time.perf_counter() > deadline:
+                logger.debug(f"Summarizer cost limit reached after {len(sentences)} sentences")
+                break
+
+        return sentences, term_ids, sentence_ids
@@ -0,0 +1,66 @@
+import fitz
+
+from advanced_pdf_processor import AdvancedPDFProcessor
+
+
+def make_pdf(tmp_path):
+    path = str(tmp_path / 'form.pdf')
+    with fitz.open() as doc:
+        doc.new_page()
+        doc.save(path)
+    return path
+
+
+def field(name, field_type, y, **extra):
+    return dict(kind='field', page=0, x=72, y=y, width=20, height=20, name=name, type=field_type, **extra)
+
+
+def test_checked_radio_and_checkbox_are_saved_on(tmp_path):
+    processor = AdvancedPDFProcessor()
+    try:
+        output = processor.apply_annotations(make_pdf(tmp_path), [
+            field('agree', 'radio', 72, checked=True),
+            field('other', 'radio', 112),
+            field('copy', 'checkbox', 152, checked=True)
+        ])
+        with fitz.open(output) as doc:
+            values = {w.field_name: w.field_value for w in doc[0].widgets()}
+    finally:
+        processor.cleanup_temp_files()
+    assert values == {'agree': 'Yes', 'other': 'Off', 'copy': 'Yes'}
+
+
+def test_one_bad_annotation_does_not_abort_the_batch(tmp_path):
+    processor = AdvancedPDFProcessor()
+    errors = []
+    try:
+        output = processor.apply_annotations(make_pdf(tmp_path), [
+            field('name', 'text', 72, default_value='Jane'),
+            {'kind': 'sticker', 'page': 0, 'x': 72, 'y': 112, 'width': 20, 'height': 20},
+            {'kind': 'signature', 'page': 0, 'x': 72, 'y': 152, 'width': 20, 'height': 20, 'image': 'not base64!'}
+        ], errors=errors)
+        with fitz.open(output) as doc:
+            values = {w.field_name: w.field_value for w in doc[0].widgets()}
+    finally:
+        processor.cleanup_temp_files()
+    assert values == {'name': 'Jane'}
+    assert [(e['index'], e['kind']) for e in errors] == [(1, 'sticker'), (2, 'signature')]
+
+
+def test_headers_and_footers_follow_the_page_size(tmp_path):
+    path = str(tmp_path / 'letter.pdf')
+    with fitz.open() as doc:
+        doc.new_page(width=612, height=792)
+        doc.new_page(width=612, height=792)
+        doc.save(path)
+    processor = AdvancedPDFProcessor()
+    try:
+        output = processor.add_headers_and_footers(
+            path, {'title': 'Trial Bundle', 'firm': 'Acme LLP'}, {'primary': '#3B82F6'})
+        with fitz.open(output) as doc:
+            header = doc[1].get_text(clip=fitz.Rect(0, 0, 612, 30))
+            footer = doc[1].get_text(clip=fitz.Rect(0, 762, 612, 792))
+    finally:
+        processor.cleanup_temp_files()
+    assert 'Trial Bundle' in header and '2/2' in header
+    assert 'Acme LLP' in footer
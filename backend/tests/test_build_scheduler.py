@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+
+from build_scheduler import BuildScheduler, SchedulerSaturated
+
+
+def test_oversized_job_is_admitted_when_idle():
+    async def scenario():
+        scheduler = BuildScheduler(max_concurrent=1, reserved_small_slots=0, max_queued_cost=100)
+        big = scheduler.submit('a', 500)
+        assert big.dispatched
+
+        waiting = scheduler.submit('a', 500)
+        assert not waiting.dispatched
+        with pytest.raises(SchedulerSaturated):
+            scheduler.submit('b', 500)
+
+        scheduler.release(big)
+        assert waiting.dispatched
+        scheduler.release(waiting)
+        assert scheduler.stats()['admitted'] == 2
+
+    asyncio.run(scenario())
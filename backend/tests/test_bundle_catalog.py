@@ -0,0 +1,38 @@
+from bundle_catalog import SQLiteBundleCatalog
+
+
+def make_catalog(count):
+    catalog = SQLiteBundleCatalog(':memory:')
+    for i in range(count):
+        catalog.record_bundle({
+            'id': f"bundle-{i}",
+            'status': 'processing',
+            'created_at': f"2024-01-01T00:00:{i:02d}"
+        }, [])
+    return catalog
+
+
+def test_completing_a_bundle_keeps_its_created_at():
+    catalog = make_catalog(1)
+    catalog.record_bundle({'id': 'bundle-0', 'status': 'completed', 'total_pages': 7},
+                          [{'filename': 'a.pdf', 'page_count': 7}])
+
+    bundle = catalog.get_bundle('bundle-0')
+    assert bundle['status'] == 'completed'
+    assert bundle['total_pages'] == 7
+    assert bundle['created_at'] == "2024-01-01T00:00:00"
+    assert [f['filename'] for f in bundle['files']] == ['a.pdf']
+
+
+def test_pagination_is_stable_while_a_bundle_completes():
+    catalog = make_catalog(6)
+    page = catalog.list_bundles(limit=2)
+    seen = [b['id'] for b in page['bundles']]
+
+    # A bundle on a later page completes while the client is paginating
+    catalog.record_bundle({'id': 'bundle-1', 'status': 'completed'}, [])
+    while page['next_cursor']:
+        page = catalog.list_bundles(limit=2, cursor=page['next_cursor'])
+        seen += [b['id'] for b in page['bundles']]
+
+    assert seen == [f"bundle-{i}" for i in range(5, -1, -1)]
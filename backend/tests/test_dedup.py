@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from dedup import DuplicateDetector
+
+WORDS = [f"clause{i}" for i in range(200)]
+
+
+def text(replace_every: int = 0) -> str:
+    """The base document, or a copy with every n-th word changed"""
+    return ' '.join(f"edited{i}" if replace_every and i % replace_every == 0 else word
+                    for i, word in enumerate(WORDS))
+
+
+def check(detector, index, content, content_type='text/plain'):
+    data = content.encode()
+    return detector.check(index, f"doc{index}.txt", content_type, hashlib.sha256(data).hexdigest(), data)
+
+
+def test_exact_copy_matches_the_first_file():
+    detector = DuplicateDetector()
+    assert check(detector, 0, text()) is None
+    assert check(detector, 1, text()) == {'index': 0, 'match': 'exact', 'similarity': 1.0}
+
+
+def test_near_duplicate_threshold():
+    detector = DuplicateDetector()
+    assert check(detector, 0, text()) is None
+    near = check(detector, 1, text(replace_every=150))
+    assert near['index'] == 0 and near['match'] == 'near'
+    assert near['similarity'] >= 0.85
+    # Changing every fifth word leaves well under the threshold of shingles in common
+    assert check(detector, 2, text(replace_every=5)) is None
+
+    strict = DuplicateDetector(threshold=1.0)
+    check(strict, 0, text())
+    assert check(strict, 1, text(replace_every=5)) is None
+
+
+def test_copy_of_a_near_duplicate_points_at_the_canonical_copy():
+    detector = DuplicateDetector()
+    check(detector, 0, text())
+    near = check(detector, 1, text(replace_every=150))
+    assert check(detector, 2, text(replace_every=150)) == near
+
+
+def test_without_near_matching_only_exact_copies_match():
+    detector = DuplicateDetector(near=False)
+    assert check(detector, 0, text()) is None
+    assert check(detector, 1, text(replace_every=150)) is None
+    assert check(detector, 2, text())['match'] == 'exact'
+
+
+def test_files_without_text_are_compared_after_extraction():
+    detector = DuplicateDetector()
+    check(detector, 0, text())
+    assert check(detector, 1, 'scan', content_type='image/png') is None
+    assert detector.needs_text(1)
+    match = detector.check_text(1, text(replace_every=150), 'scan-hash')
+    assert match['index'] == 0 and match['match'] == 'near'
+    assert not detector.needs_text(1)
+
+
+@pytest.mark.parametrize('policy, expected', [
+    ('keep', [('a.txt', None, True), ('b.txt', 'a.txt', True), ('c.txt', None, True)]),
+    ('reference', [('a.txt', None, True), ('b.txt', 'a.txt', False), ('c.txt', 'a.txt', False)]),
+    ('collapse', [('a.txt', None, True)]),
+])
+def test_duplicate_policies(tmp_path, policy, expected):
+    import main
+
+    saved_files = []
+    for name, content in (('a.txt', text()), ('b.txt', text()), ('c.txt', text(replace_every=150))):
+        path = tmp_path / name
+        path.write_text(content)
+        saved_files.append({'path': str(path), 'content_type': 'text/plain',
+                            'content_hash': hashlib.sha256(content.encode()).hexdigest()})
+    bundler = main.AIEnhancedPDFBundler(str(tmp_path), index_text=False)
+
+    batch = asyncio.run(main.process_saved_files(bundler, 'dedup-test', saved_files, {}, dedup_policy=policy))
+
+    assert [(r.filename, r.duplicate_of, bool(r.pdf_path) and r.page_count > 0) for r in batch.records] == expected
+    # Bundled copies reuse the canonical PDF rather than converting the file again
+    if policy == 'keep':
+        assert batch.records[1].pdf_path == batch.records[0].pdf_path
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import pytest
+
+import llm_backend
+from llm_backend import LLMBackend
+
+CATEGORIES = ('invoice', 'contract', 'legal_brief', 'other')
+
+
+class StubBackend(LLMBackend):
+    """Answers each numbered document with its own text, so one-word texts classify as themselves"""
+
+    def __init__(self, **options):
+        super().__init__('http://model.invalid', 'stub', CATEGORIES, **options)
+        self.prompts = []
+        self.fail = False
+
+    async def generate(self, client, prompt, json_output):
+        self.prompts.append(prompt)
+        if self.fail:
+            raise ConnectionError("model server down")
+        lines = prompt.split('\n')
+        documents = [lines[i + 1] for i, line in enumerate(lines) if line.startswith('Document ') and line.endswith(':')]
+        return json.dumps({'labels': documents})
+
+
+def test_concurrent_classifications_share_one_prompt():
+    async def scenario():
+        backend = StubBackend(batch_size=8, batch_wait_ms=50)
+        labels = await asyncio.gather(
+            backend.classify('invoice'), backend.classify('contract'), backend.classify('poem'))
+        await backend.close()
+        return backend, labels
+
+    backend, labels = asyncio.run(scenario())
+    assert labels == ['invoice', 'contract', None]
+    assert len(backend.prompts) == 1
+    assert backend.stats['model_calls'] == 1
+
+
+def test_full_batch_is_sent_without_waiting():
+    async def scenario():
+        backend = StubBackend(batch_size=2, batch_wait_ms=10000)
+        labels = await asyncio.wait_for(backend.classify_many(['invoice', 'contract', 'other', 'legal_brief']), 5)
+        await backend.close()
+        return backend, labels
+
+    backend, labels = asyncio.run(scenario())
+    assert labels == ['invoice', 'contract', 'other', 'legal_brief']
+    assert len(backend.prompts) == 2
+
+
+def test_identical_texts_are_coalesced_then_cached():
+    async def scenario():
+        backend = StubBackend(batch_wait_ms=10)
+        first = await asyncio.gather(backend.classify('contract'), backend.classify('contract'))
+        again = await backend.classify('contract')
+        await backend.close()
+        return backend, first, again
+
+    backend, first, again = asyncio.run(scenario())
+    assert first == ['contract', 'contract'] and again == 'contract'
+    assert len(backend.prompts) == 1
+    assert backend.prompts[0].count('Document ') == 1
+    assert backend.stats['coalesced'] == 1
+    assert backend.stats['cache_hits'] == 1
+
+
+@pytest.mark.parametrize('response, expected', [
+    ('not json', [None, None]),
+    ('{"labels": "invoice"}', [None, None]),
+    ('{"answer": ["invoice", "contract"]}', [None, None]),
+    ('{"labels": ["Invoice", "poem"]}', ['invoice', None]),
+    ('["legal brief"]', ['legal_brief', None]),
+    ('{"labels": ["contract", "invoice", "other"]}', ['contract', 'invoice']),
+    ('{"labels": [null, 7]}', [None, None]),
+])
+def test_parse_labels(response, expected):
+    assert StubBackend()._parse_labels(response, 2) == expected
+
+
+def test_failure_skips_the_server_until_retry(monkeypatch):
+    monkeypatch.setattr(llm_backend, 'RETRY_AFTER_SECONDS', 0.2)
+
+    async def scenario():
+        backend = StubBackend(batch_wait_ms=1)
+        backend.fail = True
+        failed = await backend.classify('invoice')
+        backend.fail = False
+        skipped = await backend.classify('invoice')
+        calls_while_down = len(backend.prompts)
+        await asyncio.sleep(0.25)
+        recovered = await backend.classify('invoice')
+        await backend.close()
+        return backend, failed, skipped, calls_while_down, recovered
+
+    backend, failed, skipped, calls_while_down, recovered = asyncio.run(scenario())
+    assert failed is None and skipped is None
+    assert calls_while_down == 1
+    assert backend.stats['failures'] == 1
+    assert recovered == 'invoice'
+    assert len(backend.prompts) == 2
@@ -0,0 +1,43 @@
+from search_index import SearchIndex, PAGE_SEPARATOR
+
+
+def test_reindexing_a_document_replaces_its_pages():
+    index = SearchIndex(':memory:')
+    index.index_document('b1', 'f1', 'a.pdf', PAGE_SEPARATOR.join(["invoice due", "contract terms"]))
+    index.index_document('b1', 'f2', 'b.pdf', "invoice paid")
+    index.index_document('b1', 'f1', 'a.pdf', "memo only")
+
+    assert [r['file_id'] for r in index.search('invoice')] == ['f2']
+    assert [(r['file_id'], r['page']) for r in index.search('memo')] == [('f1', 1)]
+
+
+def test_removing_documents_and_bundles():
+    index = SearchIndex(':memory:')
+    index.index_document('b1', 'f1', 'a.pdf', "invoice one")
+    index.index_document('b1', 'f2', 'b.pdf', "invoice two")
+    index.index_document('b2', 'f3', 'c.pdf', "invoice three")
+
+    index.remove_document('f2')
+    assert sorted(r['file_id'] for r in index.search('invoice')) == ['f1', 'f3']
+    index.remove_bundle('b1')
+    assert [r['file_id'] for r in index.search('invoice')] == ['f3']
+
+
+def test_existing_index_gains_the_file_map(tmp_path):
+    path = str(tmp_path / 'search.db')
+    index = SearchIndex(path)
+    index.index_document('b1', 'f1', 'a.pdf', "invoice one")
+    index._conn.execute("DROP TABLE page_files")
+    index.close()
+
+    index = SearchIndex(path)
+    index.remove_bundle('b1')
+    assert index.search('invoice') == []
+
+
+def test_snippets_escape_document_markup():
+    index = SearchIndex(':memory:')
+    index.index_document('b1', 'f1', 'a.pdf', "Hello <world> & friends. This agreement \x02binds\x03 us.")
+
+    [result] = index.search('agreement')
+    assert result['snippet'] == "Hello &lt;world&gt; &amp; friends. This <b>agreement</b> binds us."
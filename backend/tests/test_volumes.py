@@ -0,0 +1,73 @@
+import asyncio
+import io
+
+import fitz
+import numpy as np
+from PIL import Image
+
+from file_records import FileBatch, FileRecord
+from volumes import plan_volumes, compile_volume
+
+
+def test_volumes_break_at_the_byte_cap():
+    assert plan_volumes([40, 60, 50, 50], 100) == [[0, 1], [2, 3]]
+    assert plan_volumes([40, 61, 39], 100) == [[0], [1, 2]]
+    assert plan_volumes([10] * 5, 1000) == [[0, 1, 2, 3, 4]]
+    assert plan_volumes([], 100) == [[]]
+
+
+def test_document_over_the_cap_gets_a_volume_of_its_own():
+    assert plan_volumes([250, 30, 30], 100) == [[0], [1, 2]]
+    assert plan_volumes([30, 250, 30], 100) == [[0], [1], [2]]
+    assert plan_volumes([30, 30, 250], 100) == [[0, 1], [2]]
+
+
+def make_pdf(path, pages, noise_px=0, seed=0):
+    """A PDF of ``pages`` pages; incompressible noise images of noise_px square make it large"""
+    rng = np.random.default_rng(seed)
+    with fitz.open() as doc:
+        for number in range(pages):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Document {seed} page {number + 1}")
+            if noise_px:
+                buffer = io.BytesIO()
+                Image.fromarray(rng.integers(0, 255, (noise_px, noise_px, 3), dtype=np.uint8)).save(buffer, 'PNG')
+                page.insert_image(fitz.Rect(72, 100, 500, 528), stream=buffer.getvalue())
+        doc.save(str(path))
+    return str(path)
+
+
+def test_compile_volume_numbers_document_pages_through_the_bundle(tmp_path):
+    front = [make_pdf(tmp_path / 'cover.pdf', 1), make_pdf(tmp_path / 'toc.pdf', 1)]
+    parts = [make_pdf(tmp_path / 'a.pdf', 2, seed=1), make_pdf(tmp_path / 'b.pdf', 1, seed=2)]
+    output = str(tmp_path / 'vol.pdf')
+
+    result = compile_volume(front, parts, output, first_page=8)
+
+    with fitz.open(output) as doc:
+        labels = [page.get_label() for page in doc]
+    assert labels == ['i', 'ii', '8', '9', '10']
+    assert result['pages'] == 5 and result['bytes'] > 0
+
+
+def test_bundle_volumes_stay_under_the_cap_except_an_oversized_document(tmp_path):
+    import main
+
+    specs = [('small1', 1, 120), ('small2', 2, 120), ('huge', 2, 700), ('small3', 1, 120)]
+    records = [
+        FileRecord(make_pdf(tmp_path / f"{name}.pdf", pages, noise, seed), filename=f"{name}.pdf",
+                   page_count=pages, classification='other')
+        for seed, (name, pages, noise) in enumerate(specs)
+    ]
+    max_bytes = main.VOLUME_FRONT_MATTER_BYTES + 400 * 1024
+
+    volumes = asyncio.run(main.compile_bundle_volumes(
+        str(tmp_path), {'title': 'Volumes'}, 'professional', FileBatch(records), max_bytes,
+        linearize=False, parallel=False))
+
+    assert [volume['file_count'] for volume in volumes] == [2, 1, 1]
+    for volume in volumes:
+        assert volume['bytes'] <= max_bytes or volume['file_count'] == 1
+    assert volumes[1]['bytes'] > max_bytes
+    # Page numbers run on across volumes
+    assert [(volume['first_page'], volume['last_page']) for volume in volumes] == [(1, 3), (4, 5), (6, 6)]
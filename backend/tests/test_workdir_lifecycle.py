@@ -0,0 +1,52 @@
+import os
+import time
+import uuid
+
+from workdir_lifecycle import WorkDirManager
+
+
+def make_entry(root, age=0.0):
+    key = str(uuid.uuid4())
+    path = os.path.join(root, key)
+    os.makedirs(path)
+    with open(os.path.join(path, 'data'), 'wb') as f:
+        f.write(b'x' * 10)
+    old = time.time() - age
+    os.utime(path, (old, old))
+    return key, path
+
+
+def managers(tmp_path, ttl):
+    """A worker holding leases and the worker that sweeps, sharing a lease directory"""
+    root, leases = str(tmp_path / 'work'), str(tmp_path / 'leases')
+    worker = WorkDirManager(10 ** 9, ttl, lease_dir=leases)
+    sweeper = WorkDirManager(10 ** 9, ttl, lease_dir=leases)
+    worker.add_root(root)
+    sweeper.add_root(root)
+    return root, worker, sweeper
+
+
+def test_sweeper_respects_another_workers_lease(tmp_path):
+    root, worker, sweeper = managers(tmp_path, ttl=0)
+    key, path = make_entry(root, age=10)
+
+    worker.acquire(key)
+    assert sweeper.sweep()['evicted'] == 0
+    assert os.path.isdir(path)
+
+    worker.release(key)
+    time.sleep(0.01)
+    assert sweeper.sweep()['evicted'] == 1
+    assert not os.path.exists(path)
+    assert os.listdir(str(tmp_path / 'leases')) == []
+
+
+def test_sweeper_sees_another_workers_accesses(tmp_path):
+    root, worker, sweeper = managers(tmp_path, ttl=60)
+    read_key, read_path = make_entry(root, age=120)
+    idle_key, idle_path = make_entry(root, age=120)
+
+    worker.touch(read_key)
+    assert sweeper.sweep()['evicted'] == 1
+    assert os.path.isdir(read_path)
+    assert not os.path.exists(idle_path)
@@ -0,0 +1,115 @@
+"""Train the document classifier offline from labelled bundles.
+
+Training data is either a directory of bundle folders in the batch_bundler
+layout, where each folder's ``bundle.json`` labels its files:
+
+    {"cover_info": {...}, "labels": {"invoice-0412.pdf": "invoice", "nda.docx": "contract"}}
+
+or a JSONL file with one ``{"text": ..., "label": ...}`` or
+``{"path": ..., "label": ...}`` object per line (paths relative to the file).
+Unlabelled files are ignored. Text is extracted with the same format
+handlers as the API. A stratified share of the documents is held out to
+report accuracy against the keyword rules; the saved model is then refit
+on all of them.
+
+Usage (from backend/):
+    python train_classifier.py ./labelled --output models/classifier.npz
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+from sklearn.metrics import accuracy_score, classification_report
+from sklearn.model_selection import train_test_split
+
+from document_classifier import LinearDocumentClassifier, RuleClassifier, DEFAULT_FEATURES
+from format_handlers import FormatRegistry, sniff_mime
+
+BUNDLE_SPEC_FILE = "bundle.json"
+
+format_registry = FormatRegistry.default()
+
+
+def extract_text(path: str) -> str:
+    with open(path, 'rb') as f:
+        head = f.read(8192)
+    return format_registry.handler_for(sniff_mime(os.path.basename(path), head)).extract_text(path)
+
+
+def labelled_paths(source: str) -> Tuple[List[str], List[str], List[str], List[str]]:
+    """(texts, text labels, paths, path labels) from a JSONL file or bundle folders"""
+    texts, text_labels, paths, path_labels = [], [], [], []
+    if os.path.isfile(source):
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if 'text' in item:
+                    texts.append(item['text'])
+                    text_labels.append(item['label'])
+                else:
+                    paths.append(os.path.join(base_dir, item['path']))
+                    path_labels.append(item['label'])
+        return texts, text_labels, paths, path_labels
+
+    for entry in sorted(os.scandir(source), key=lambda e: e.name):
+        spec_path = os.path.join(entry.path, BUNDLE_SPEC_FILE)
+        if not entry.is_dir() or not os.path.exists(spec_path):
+            continue
+        with open(spec_path, 'r') as f:
+            labels = json.load(f).get('labels') or {}
+        for name, label in labels.items():
+            paths.append(os.path.join(entry.path, name))
+            path_labels.append(label)
+    return texts, text_labels, paths, path_labels
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', help="directory of labelled bundle folders, or a JSONL file")
+    parser.add_argument('--output', default=os.path.join('models', 'classifier.npz'))
+    parser.add_argument('--test-size', type=float, default=0.2, help="share held out for evaluation (0 to skip)")
+    parser.add_argument('--features', type=int, default=DEFAULT_FEATURES, help="hashed feature space size")
+    parser.add_argument('--c', type=float, default=10.0, help="inverse regularisation strength")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="text extraction processes")
+    args = parser.parse_args()
+
+    texts, labels, paths, path_labels = labelled_paths(args.source)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        texts += list(pool.map(extract_text, paths, chunksize=16))
+    labels += path_labels
+    print(f"Extracted {len(paths)} files in {time.perf_counter() - start:.1f}s; "
+          f"{len(texts)} labelled documents in {len(set(labels))} classes")
+
+    if args.test_size > 0:
+        train_texts, test_texts, train_labels, test_labels = train_test_split(
+            texts, labels, test_size=args.test_size, stratify=labels, random_state=0
+        )
+        model = LinearDocumentClassifier.train(train_texts, train_labels, args.features, c=args.c)
+        predicted = [label for label, _ in model.predict(test_texts)]
+        rules = [label for label, _ in RuleClassifier().predict(test_texts)]
+        model.info['holdout_accuracy'] = round(accuracy_score(test_labels, predicted), 4)
+        model.info['rules_holdout_accuracy'] = round(accuracy_score(test_labels, rules), 4)
+        print(classification_report(test_labels, predicted, zero_division=0))
+        print(f"Holdout accuracy: model {model.info['holdout_accuracy']:.3f}, "
+              f"keyword rules {model.info['rules_holdout_accuracy']:.3f}")
+        holdout_info = {key: model.info[key] for key in ('holdout_accuracy', 'rules_holdout_accuracy')}
+    else:
+        holdout_info = {}
+
+    model = LinearDocumentClassifier.train(texts, labels, args.features, c=args.c)
+    model.info.update(holdout_info)
+
+    model.save(args.output)
+    print(f"Saved {args.output} ({os.path.getsize(args.output) / (1024 * 1024):.1f} MB)")
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main_cli()
@@ -0,0 +1,65 @@
+import os
+import sys
+import json
+from typing import List, Dict, Any
+import fitz  # PyMuPDF
+
+VOLUME_FILE = "{kind}.vol{number:02d}.pdf"
+
+
+def volume_filename(number: int, kind: str = 'bundle') -> str:
+    """Work-directory file name of a volume ('bundle') or of its 'cover' and 'toc' pages"""
+    return VOLUME_FILE.format(kind=kind, number=number)
+
+
+def plan_volumes(sizes: List[int], max_bytes: int) -> List[List[int]]:
+    """Split parts, kept in order, into the fewest volumes whose estimated size fits max_bytes
+
+    Volumes only break between documents. Filling each volume greedily is
+    optimal for an ordered split; a document larger than max_bytes on its
+    own gets a volume to itself.
+    """
+    volumes: List[List[int]] = []
+    current: List[int] = []
+    current_bytes = 0
+    for index, size in enumerate(sizes):
+        if current and current_bytes + size > max_bytes:
+            volumes.append(current)
+            current, current_bytes = [], 0
+        current.append(index)
+        current_bytes += size
+    if current or not volumes:
+        volumes.append(current)
+    return volumes
+
+
+def compile_volume(front_matter: List[str], parts: List[str], output_path: str, first_page: int) -> Dict[str, Any]:
+    """Merge one volume and label its pages
+
+    Front matter pages are numbered i, ii, ...; document pages carry the
+    bundle-wide page numbers starting at first_page, so a viewer's page box
+    matches the TOC in every volume. Only this volume's documents are held
+    in memory.
+    """
+    merger = fitz.open()
+    for path in front_matter:
+        with fitz.open(path) as src:
+            merger.insert_pdf(src)
+    front_pages = len(merger)
+    for path in parts:
+        if os.path.exists(path):
+            with fitz.open(path) as src:
+                merger.insert_pdf(src)
+    labels = [{'startpage': 0, 'prefix': '', 'style': 'r', 'firstpagenum': 1}]
+    if len(merger) > front_pages:
+        labels.append({'startpage': front_pages, 'prefix': '', 'style': 'D', 'firstpagenum': first_page})
+    merger.set_page_labels(labels)
+    merger.save(output_path)
+    pages = len(merger)
+    merger.close()
+    return {'pages': pages, 'bytes': os.path.getsize(output_path)}
+
+
+if __name__ == '__main__':
+    # Run by main.compile_bundle_volumes, one process per volume, with the compile_volume arguments on stdin
+    json.dump(compile_volume(**json.load(sys.stdin)), sys.stdout)
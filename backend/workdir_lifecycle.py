@@ -0,0 +1,323 @@
+import os
+import time
+import uuid
+import shutil
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process only, leases stay in memory
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LEASE_SUFFIX = '.lease'
+
+
+def directory_size(path: str) -> int:
+    """Total size in bytes of regular files below path"""
+    total = 0
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except FileNotFoundError:
+                        continue
+        except FileNotFoundError:
+            continue
+    return total
+
+
+def is_uuid(name: str) -> bool:
+    try:
+        uuid.UUID(name)
+        return True
+    except ValueError:
+        return False
+
+
+class WorkDirManager:
+    """Reference-counted lifecycle for per-bundle and per-file work directories.
+
+    Every UUID-named directory directly below a registered root is an entry.
+    Entries that are leased (in use by a build or a download) are never
+    removed. Unleased entries are evicted once idle for longer than the TTL,
+    and then least-recently-used first while total usage exceeds the quota.
+
+    Worker processes share their leases through ``lease_dir``: a leased entry
+    has ``<key>.lease`` there with a shared flock held by every process using
+    it, and the file's mtime is the entry's last access. The sweeper, which
+    runs in one worker, skips entries whose lease file it cannot lock
+    exclusively, and holds that lock while evicting. The kernel drops the
+    flocks of a crashed worker, so its leases never go stale.
+    """
+
+    def __init__(self, quota_bytes: int, ttl_seconds: float, sweep_interval: float = 60.0,
+                 lease_dir: Optional[str] = None):
+        self.quota_bytes = quota_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self.lease_dir = lease_dir if fcntl is not None else None
+        if self.lease_dir:
+            os.makedirs(self.lease_dir, exist_ok=True)
+        self._lease_fds: Dict[str, int] = {}
+        self._roots: Dict[str, tuple] = {}
+        self._refcounts: Dict[str, int] = {}
+        self._last_access: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self._dirty: set = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.evictions = 0
+
+    def add_root(self, root: str, on_evict: Optional[Callable[[str, str], None]] = None,
+                 in_use: Optional[Callable[[str], bool]] = None) -> None:
+        """Manage UUID directories under root; on_evict(key, path) replaces the default rmtree
+
+        in_use(path) can protect entries that other processes are using, which
+        this process's leases know nothing about.
+        """
+        os.makedirs(root, exist_ok=True)
+        self._roots[os.path.abspath(root)] = (on_evict, in_use)
+
+    def acquire(self, key: str) -> None:
+        """Pin an entry so the sweeper will not evict it"""
+        with self._lock:
+            self._refcounts[key] = self._refcounts.get(key, 0) + 1
+            self._last_access[key] = time.time()
+            self._dirty.add(key)
+            if self.lease_dir and key not in self._lease_fds:
+                self._lease_fds[key] = self._hold_lease(key)
+
+    def release(self, key: str) -> None:
+        """Drop one pin; the entry becomes evictable when none remain"""
+        with self._lock:
+            count = self._refcounts.get(key, 0) - 1
+            if count > 0:
+                self._refcounts[key] = count
+            else:
+                self._refcounts.pop(key, None)
+                fd = self._lease_fds.pop(key, None)
+                if fd is not None:
+                    self._stamp_lease(key)
+                    os.close(fd)
+            self._last_access[key] = time.time()
+            self._dirty.add(key)
+
+    @contextmanager
+    def lease(self, *keys: str):
+        """Hold entries for the duration of a with-block"""
+        for key in keys:
+            self.acquire(key)
+        try:
+            yield
+        finally:
+            for key in keys:
+                self.release(key)
+
+    def touch(self, key: str) -> None:
+        """Record a read access for LRU ordering"""
+        with self._lock:
+            self._last_access[key] = time.time()
+        if self.lease_dir:
+            self._stamp_lease(key)
+
+    def sweep(self) -> Dict[str, Any]:
+        """Evict expired entries, then LRU entries until usage fits the quota"""
+        now = time.time()
+        entries = self._scan()
+
+        with self._lock:
+            for key, entry in entries.items():
+                if key not in self._sizes or key in self._dirty:
+                    self._sizes[key] = directory_size(entry['path'])
+                # Other workers record their accesses on the lease file
+                self._last_access[key] = max(self._last_access.get(key, entry['mtime']), entry['lease_mtime'])
+            self._dirty.clear()
+            for key in list(self._sizes):
+                if key not in entries:
+                    self._sizes.pop(key, None)
+                    self._last_access.pop(key, None)
+
+            leased = {
+                key for key, entry in entries.items()
+                if self._refcounts.get(key, 0) > 0 or self._leased_elsewhere(key)
+                or (entry['in_use'] and entry['in_use'](entry['path']))
+            }
+            candidates = sorted((key for key in entries if key not in leased),
+                                key=lambda k: self._last_access.get(k, 0))
+            total = sum(self._sizes.get(k, 0) for k in entries)
+            victims = []
+            for key in candidates:
+                expired = now - self._last_access.get(key, 0) > self.ttl_seconds
+                if expired or total > self.quota_bytes:
+                    victims.append(key)
+                    total -= self._sizes.get(key, 0)
+
+        for key in victims:
+            self._evict(key, entries[key])
+        if self.lease_dir:
+            self._prune_leases(entries, now)
+
+        return {
+            'entries': len(entries) - len(victims),
+            'evicted': len(victims),
+            'bytes': total,
+            'quota_bytes': self.quota_bytes,
+            'leased': len(leased)
+        }
+
+    def start(self) -> None:
+        """Run sweep() periodically on a daemon thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="workdir-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                result = self.sweep()
+                if result['evicted']:
+                    logger.info(f"Work directory sweep: {result}")
+            except Exception as e:
+                logger.error(f"Work directory sweep failed: {e}")
+
+    def _scan(self) -> Dict[str, Dict[str, Any]]:
+        entries = {}
+        for root, (on_evict, in_use) in self._roots.items():
+            try:
+                with os.scandir(root) as children:
+                    for child in children:
+                        if child.is_dir(follow_symlinks=False) and is_uuid(child.name):
+                            entries[child.name] = {
+                                'path': child.path,
+                                'mtime': child.stat(follow_symlinks=False).st_mtime,
+                                'lease_mtime': self._lease_mtime(child.name),
+                                'on_evict': on_evict,
+                                'in_use': in_use
+                            }
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def _evict(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            # A build may have leased the entry since the candidates were chosen
+            if self._refcounts.get(key, 0) > 0:
+                return
+            lease_fd = self._claim_lease(key)
+            if lease_fd == -1:
+                return
+            self._sizes.pop(key, None)
+            self._last_access.pop(key, None)
+        try:
+            if entry['on_evict'] is not None:
+                entry['on_evict'](key, entry['path'])
+            else:
+                shutil.rmtree(entry['path'], ignore_errors=True)
+            self.evictions += 1
+        except Exception as e:
+            logger.warning(f"Failed to evict work directory {entry['path']}: {e}")
+        finally:
+            if lease_fd is not None:
+                self._remove_lease(key, lease_fd)
+
+    def _lease_path(self, key: str) -> str:
+        return os.path.join(self.lease_dir, key + LEASE_SUFFIX)
+
+    def _hold_lease(self, key: str) -> int:
+        """Open the entry's lease file with a shared lock, waiting out an eviction in progress"""
+        path = self._lease_path(key)
+        while True:
+            fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            # An eviction unlinks the file it locked; lock a fresh one instead
+            if os.fstat(fd).st_nlink:
+                os.utime(path)
+                return fd
+            os.close(fd)
+
+    def _claim_lease(self, key: str) -> Optional[int]:
+        """Exclusive lock on the lease file: its fd, None without one, -1 if a worker holds it"""
+        if not self.lease_dir:
+            return None
+        try:
+            fd = os.open(self._lease_path(key), os.O_RDWR)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return -1
+        return fd
+
+    def _leased_elsewhere(self, key: str) -> bool:
+        fd = self._claim_lease(key)
+        if fd is None or fd == -1:
+            return fd == -1
+        os.close(fd)
+        return False
+
+    def _remove_lease(self, key: str, fd: int) -> None:
+        try:
+            os.unlink(self._lease_path(key))
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+    def _stamp_lease(self, key: str) -> None:
+        """Record an access on the lease file for the sweeper in another worker"""
+        path = self._lease_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o644))
+            except OSError as e:
+                logger.debug(f"Could not record access to {key}: {e}")
+
+    def _lease_mtime(self, key: str) -> float:
+        if not self.lease_dir:
+            return 0.0
+        try:
+            return os.stat(self._lease_path(key)).st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def _prune_leases(self, entries: Dict[str, Dict[str, Any]], now: float) -> None:
+        """Drop idle lease files whose entry was deleted by other means"""
+        try:
+            with os.scandir(self.lease_dir) as children:
+                names = [c.name for c in children if c.name.endswith(LEASE_SUFFIX)]
+        except FileNotFoundError:
+            return
+        for name in names:
+            key = name[:-len(LEASE_SUFFIX)]
+            if key in entries or now - self._lease_mtime(key) <= self.ttl_seconds:
+                continue
+            with self._lock:
+                if key in self._lease_fds:
+                    continue
+                fd = self._claim_lease(key)
+            if fd is not None and fd != -1:
+                self._remove_lease(key, fd)
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { Eye, Download, FileText, Loader2, Play, Pause, Sparkles, Zap, CheckCircle, Copy, Share2 } from 'lucide-react';
 import Confetti from 'react-confetti';
@@ -12,6 +12,8 @@ export default function LivePreview({ previewUrl, files, coverInfo, theme, onGen
   const [progressMessage, setProgressMessage] = useState('');
   const [downloadUrl, setDownloadUrl] = useState(null);
   const [wsConnection, setWsConnection] = useState(null);
+  // Server-side ids of files already uploaded and processed this session
+  const uploadedIds = useRef(new WeakMap());
 
   // WebSocket connection for real-time progress
   useEffect(() => {
@@ -45,6 +47,9 @@ export default function LivePreview({ previewUrl, files, coverInfo, theme, onGen
         setProgress(10);
         setProgressMessage('AI analysis started...');
         break;
+      case 'preview_ready':
+        setProgressMessage('Cover and contents ready, processing documents...');
+        break;
       case 'file_processing':
         setProgress(20 + (data.progress * 0.3));
         setProgressMessage(`Processing ${data.filename}...`);
@@ -89,15 +94,38 @@ export default function LivePreview({ previewUrl, files, coverInfo, theme, onGen
     setProgressMessage('Initializing...');
     
     try {
-      const formData = new FormData();
-      files.forEach(file => formData.append('files', file));
-      formData.append('coverInfo', JSON.stringify(coverInfo));
-      formData.append('theme', theme);
-      formData.append('client_id', clientId);
-      
-      const response = await fetch('/api/bundle', {
+      // Upload and process each file once; later previews reuse the ids
+      const fileIds = [];
+      for (const file of files) {
+        let fileId = uploadedIds.current.get(file);
+        if (!fileId) {
+          const formData = new FormData();
+          formData.append('file', file);
+          formData.append('session_id', clientId);
+          formData.append('client_id', clientId);
+
+          const uploadResponse = await fetch('/api/upload', {
+            method: 'POST',
+            body: formData
+          });
+          if (!uploadResponse.ok) {
+            throw new Error(`Failed to upload ${file.name}`);
+          }
+          fileId = (await uploadResponse.json()).file_id;
+          uploadedIds.current.set(file, fileId);
+        }
+        fileIds.push(fileId);
+      }
+
+      const response = await fetch('/api/bundle/build', {
         method: 'POST',
-        body: formData
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          file_ids: fileIds,
+          cover_info: coverInfo,
+          theme,
+          client_id: clientId
+        })
       });
 
       if (!response.ok) {
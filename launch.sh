@@ -53,9 +53,13 @@ if [ requirements.txt -nt venv/pyvenv.cfg ]; then
     pip install -r requirements.txt
 fi
 
-# Start backend server
+# Start backend server (WEB_WORKERS > 1 runs the pre-forked server in serve.py, without auto-reload)
 echo "🚀 Backend starting on http://localhost:8000"
-uvicorn main:app --reload --host 0.0.0.0 --port 8000 &
+if [ "${WEB_WORKERS:-1}" -gt 1 ]; then
+    PORT=8000 WEB_WORKERS=$WEB_WORKERS python serve.py &
+else
+    uvicorn main:app --reload --host 0.0.0.0 --port 8000 &
+fi
 BACKEND_PID=$!
 
 # Wait a moment for backend to start